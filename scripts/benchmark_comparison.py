@@ -1,25 +1,41 @@
+import os
+import time
 from qdrant_client import QdrantClient, models
-from sentence_transformers import SentenceTransformer
-from fastembed import SparseTextEmbedding
+from fastembed import SparseTextEmbedding, TextEmbedding
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # Configuración
 COLLECTION_NAME = "video_knowledge_hybrid"
-DENSE_MODEL_ID = "all-MiniLM-L6-v2"
+# Same MiniLM weights as before, run through FastEmbed's ONNX runtime
+DENSE_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
 SPARSE_MODEL_ID = "Qdrant/bm25"
 
+# Weighted RRF [dense, sparse], same knobs as VectorDatabase
+RRF_WEIGHTS = [
+    float(os.getenv("HYBRID_DENSE_WEIGHT", "1.0")),
+    float(os.getenv("HYBRID_SPARSE_WEIGHT", "2.0")),
+]
+
+# Search the INT8-quantized dense index, rescoring with the original vectors
+DENSE_SEARCH_PARAMS = models.SearchParams(
+    quantization=models.QuantizationSearchParams(
+        ignore=False, rescore=True, oversampling=2.0
+    )
+)
+
 
 def main():
     print("--- ⚖️ INICIANDO COMPARATIVA: DENSE VS HYBRID ---")
 
     # 1. Direct Connection (Bypass of your class to have total control)
-    client = QdrantClient(host="localhost", port=6333)
+    # gRPC transport: cheaper framing per search than REST
+    client = QdrantClient(host="localhost", port=6333, grpc_port=6334, prefer_grpc=True)
 
     # 2. Load Models
     print("🤖 Loading models for the test...")
-    dense_model = SentenceTransformer(DENSE_MODEL_ID)
+    dense_model = TextEmbedding(model_name=DENSE_MODEL_ID)
     sparse_model = SparseTextEmbedding(model_name=SPARSE_MODEL_ID)
 
     # 3. TEST QUERIES (Based on your logs)
@@ -31,20 +47,63 @@ def main():
         "selector",  # Technical term
     ]
 
-    for query_text in test_queries:
-        print(f"\n\n🔎 PREGUNTA: '{query_text}'")
+    # Generate vectors for ALL queries in one batched forward pass per model
+    q_dense_all = list(dense_model.embed(test_queries, batch_size=32))
+    q_sparse_all = list(sparse_model.embed(test_queries, batch_size=32))
 
-        # Generate vectors
-        q_dense = dense_model.encode(query_text).tolist()
-        q_sparse = list(sparse_model.embed([query_text]))[0]
+    # Build BOTH probes for every query and ship them in ONE round-trip
+    requests = []
+    for q_dense_vec, q_sparse in zip(q_dense_all, q_sparse_all):
+        q_dense = q_dense_vec.tolist()
 
         # --- ROUND 1: ONLY DENSO (What you had before) ---
-        dense_results = client.query_points(
-            collection_name=COLLECTION_NAME,
-            query=q_dense,
-            using="text-dense",  # Force using only the semantic vector
-            limit=3,
-        ).points
+        requests.append(
+            models.QueryRequest(
+                query=q_dense,
+                using="text-dense",  # Force using only the semantic vector
+                limit=3,
+                params=DENSE_SEARCH_PARAMS,
+                with_payload=True,
+            )
+        )
+
+        # --- ROUND 2: HYBRID (What you have now) ---
+        requests.append(
+            models.QueryRequest(
+                prefetch=[
+                    models.Prefetch(
+                        query=q_dense,
+                        using="text-dense",
+                        limit=10,
+                        params=DENSE_SEARCH_PARAMS,
+                    ),
+                    models.Prefetch(
+                        query=models.SparseVector(
+                            indices=q_sparse.indices.tolist(),
+                            values=q_sparse.values.tolist(),
+                        ),
+                        using="text-sparse",
+                        limit=10,
+                    ),
+                ],
+                # La magia del RRF (weighted towards the sparse channel)
+                query=models.RrfQuery(rrf=models.Rrf(weights=RRF_WEIGHTS)),
+                limit=3,
+                with_payload=True,
+            )
+        )
+
+    t0 = time.perf_counter()
+    responses = client.query_batch_points(
+        collection_name=COLLECTION_NAME, requests=requests
+    )
+    batch_ms = (time.perf_counter() - t0) * 1000
+    print(f"⏱️ {len(requests)} probes answered in one batch: {batch_ms:.1f} ms")
+
+    for idx, query_text in enumerate(test_queries):
+        print(f"\n\n🔎 PREGUNTA: '{query_text}'")
+        dense_results = responses[2 * idx].points
+        hybrid_results = responses[2 * idx + 1].points
 
         print("  🔴 [DENSE ONLY] Top 3:")
         for i, hit in enumerate(dense_results):
@@ -52,25 +111,7 @@ def main():
                 f"     {i+1}. Score: {hit.score:.4f} | Texto: {hit.payload['text'][:60]}..."
             )
 
-        # --- ROUND 2: HYBRID (What you have now) ---
-        hybrid_results = client.query_points(
-            collection_name=COLLECTION_NAME,
-            prefetch=[
-                models.Prefetch(query=q_dense, using="text-dense", limit=10),
-                models.Prefetch(
-                    query=models.SparseVector(
-                        indices=q_sparse.indices.tolist(),
-                        values=q_sparse.values.tolist(),
-                    ),
-                    using="text-sparse",
-                    limit=10,
-                ),
-            ],
-            query=models.FusionQuery(fusion=models.Fusion.RRF),  # La magia del RRF
-            limit=3,
-        ).points
-
-        print("  🟢 [HYBRID RRF] Top 3:")
+        print(f"  🟢 [HYBRID RRF {RRF_WEIGHTS}] Top 3:")
         for i, hit in enumerate(hybrid_results):
             # Note: RRF does not give a similarity score 0-1, it gives a ranking score
             print(
@@ -0,0 +1,68 @@
+import shutil
+import sys
+from pathlib import Path
+
+from fastembed import TextEmbedding
+from huggingface_hub import snapshot_download
+from onnxruntime.quantization import QuantType, quantize_dynamic
+
+# Builds a local dynamic-INT8 copy of the dense encoder, quantized on the
+# machine that will run it so ONNX Runtime picks that CPU's INT8 GEMM kernels
+# (AVX512-VNNI / AVX2). Needs `pip install -r requirements-dev.txt` (onnx,
+# quantization tooling only).
+#
+# Usage:
+#   python scripts/export_minilm_int8.py [output_dir]
+#   DENSE_MODEL_INT8=true DENSE_MODEL_PATH=<output_dir> streamlit run ...
+
+DENSE_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_OUTPUT_DIR = "models/minilm-int8"
+TOKENIZER_FILES = [
+    "config.json",
+    "tokenizer.json",
+    "tokenizer_config.json",
+    "special_tokens_map.json",
+]
+
+
+def main() -> None:
+    output_dir = Path(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_OUTPUT_DIR)
+
+    # 1. Fetch the same fp32 ONNX export FastEmbed uses, located through its
+    # public model description (HF repo + file) rather than loader internals
+    print(f"📥 Resolving fp32 ONNX export of {DENSE_MODEL_ID}...")
+    description = next(
+        m for m in TextEmbedding.list_supported_models() if m["model"] == DENSE_MODEL_ID
+    )
+    model_dir = Path(
+        snapshot_download(
+            repo_id=description["sources"]["hf"],
+            allow_patterns=[description["model_file"], *TOKENIZER_FILES],
+        )
+    )
+    fp32_file = model_dir / description["model_file"]
+
+    # 2. Tokenizer/config travel unchanged next to the quantized graph
+    (output_dir / "onnx").mkdir(parents=True, exist_ok=True)
+    for name in TOKENIZER_FILES:
+        if (model_dir / name).exists():
+            shutil.copy2(model_dir / name, output_dir / name)
+
+    # 3. Dynamic quantization: int8 weights, activations quantized at runtime
+    int8_file = output_dir / "onnx" / "model_quantized.onnx"
+    print(f"⚙️ Quantizing {fp32_file.name} -> {int8_file}...")
+    quantize_dynamic(
+        model_input=str(fp32_file),
+        model_output=str(int8_file),
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+
+    fp32_mb = fp32_file.stat().st_size / 1e6
+    int8_mb = int8_file.stat().st_size / 1e6
+    print(f"✅ Done: {fp32_mb:.1f} MB -> {int8_mb:.1f} MB")
+    print(f"   Use it with DENSE_MODEL_INT8=true DENSE_MODEL_PATH={output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from rapidocr import RapidOCR
+from rapidocr.inference_engine.base import FileInfo, InferSession
+
+# Builds local dynamic-INT8 copies of RapidOCR's text detector and recognizer,
+# quantized on the machine that will run them so ONNX Runtime picks that CPU's
+# INT8 kernels (AVX512-VNNI / AVX2). Needs `pip install -r requirements-dev.txt`
+# (onnx, quantization tooling only). The recognizer keeps its character list
+# (model metadata).
+#
+# Usage:
+#   python scripts/export_ocr_int8.py [output_dir] [--det-model X] [--rec-model Y]
+#   OCR_MODEL_INT8_DIR=<output_dir> python -m src.main_ingest ...
+
+DEFAULT_OUTPUT_DIR = "models/ocr-int8"
+# Must match OCR_INT8_DET_FILE / OCR_INT8_REC_FILE in ocr_service.py
+OUTPUTS = {"det": "det_int8.onnx", "rec": "rec_int8.onnx"}
+
+
+def resolve_default_models() -> dict[str, Path]:
+    """
+    fp32 det/rec files RapidOCR itself loads, read from its config: an
+    explicit `model_path`, else the default model for the configured
+    version/language under `model_root_dir` (downloaded once if missing).
+    """
+    engine = RapidOCR()
+    # Sessions (and downloads) are lazy; the recognizer only loads once some
+    # text is detected, so run one probe image through the pipeline
+    probe = np.full((96, 320, 3), 255, dtype=np.uint8)
+    cv2.putText(probe, "int8 OCR", (10, 64), cv2.FONT_HERSHEY_SIMPLEX, 1.5, 0, 3)
+    engine(probe)
+
+    models = {}
+    for task, cfg in (("det", engine.cfg.Det), ("rec", engine.cfg.Rec)):
+        if cfg.model_path:
+            models[task] = Path(cfg.model_path)
+            continue
+        model_info = InferSession.get_model_url(
+            FileInfo(
+                engine_type=cfg.engine_type,
+                ocr_version=cfg.ocr_version,
+                task_type=cfg.task_type,
+                lang_type=cfg.lang_type,
+                model_type=cfg.model_type,
+            )
+        )
+        root_dir = Path(engine.cfg.Global.model_root_dir)
+        models[task] = root_dir / Path(model_info["model_dir"]).name
+    return models
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output_dir", nargs="?", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--det-model", type=Path, help="fp32 detector ONNX file")
+    parser.add_argument("--rec-model", type=Path, help="fp32 recognizer ONNX file")
+    args = parser.parse_args(argv)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # 1. fp32 sources: explicit paths win, otherwise RapidOCR's defaults
+    models = {"det": args.det_model, "rec": args.rec_model}
+    if None in models.values():
+        print("📥 Resolving RapidOCR's default fp32 models...")
+        defaults = resolve_default_models()
+        models = {task: path or defaults[task] for task, path in models.items()}
+
+    for task, fp32_file in models.items():
+        int8_file = output_dir / OUTPUTS[task]
+
+        # 2. Dynamic quantization: int8 weights, activations quantized at runtime
+        print(f"⚙️ Quantizing {fp32_file.name} -> {int8_file}...")
+        quantize_dynamic(
+            model_input=str(fp32_file),
+            model_output=str(int8_file),
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+        )
+
+        fp32_mb = fp32_file.stat().st_size / 1e6
+        int8_mb = int8_file.stat().st_size / 1e6
+        print(f"✅ {task}: {fp32_mb:.1f} MB -> {int8_mb:.1f} MB")
+
+    print(f"   Use them with OCR_MODEL_INT8_DIR={output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_FRAME_NUMBER_RE = re.compile(r"frame_(\d+)")
+
 
 class VisualIngestionService:
     """
@@ -109,8 +111,13 @@ class VisualIngestionService:
         """
         try:
             basename = os.path.basename(filename)
-            # Regex to capture the digits after 'frame_'
-            match = re.search(r"frame_(\d+)", basename)
+            # Fast path for our own naming ('frame_' + digits + extension)
+            if basename.startswith("frame_"):
+                digits = basename[6:].partition(".")[0]
+                if digits.isdigit():
+                    return float(digits)
+            # Regex to capture the digits after 'frame_' anywhere in the name
+            match = _FRAME_NUMBER_RE.search(basename)
             if match:
                 return float(match.group(1))
             return 0.0
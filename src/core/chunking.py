@@ -23,37 +23,36 @@ class ChunkingProcessor:
         Implements 'Structured Aggregation' as per architectural validation.
         """
         chunks = []
-        current_segments = []
-        current_text_len = 0
+        n = len(segments)
+        # Extract texts once; each chunk then joins a slice of this list
+        texts = [s["text"] for s in segments]
 
+        # Forward-only sliding window over indices: [i, j) is the current chunk.
+        # The next window starts `overlap_segments` before j, but always at least
+        # one segment after i, so every step makes progress (O(N) overall).
         i = 0
-        while i < len(segments):
-            seg = segments[i]
-            current_segments.append(seg)
-            current_text_len += len(seg["text"])
-
-            # If chunk is large enough or it's the last segment, emit chunk
-            if current_text_len >= self.min_chunk_size or i == len(segments) - 1:
-                # The start time is the 'start' of the first segment in group
-                # The end time is the 'end' of the last segment in group
-                chunk_data = {
-                    "text": " ".join([s["text"] for s in current_segments]).strip(),
-                    "start": current_segments[0]["start"],
-                    "end": current_segments[-1]["end"],
-                }
-                chunks.append(chunk_data)
-
-                # Reset for next chunk, but keep overlap for context preservation
-                if i < len(segments) - 1:
-                    # Move back index to create overlap
-                    i -= self.overlap_segments
-                    if i < 0:
-                        i = 0  # Safety check
-
-                current_segments = []
-                current_text_len = 0
-
-            i += 1
+        while i < n:
+            j = i
+            current_text_len = 0
+            # Grow the chunk until it is large enough or segments run out
+            while j < n and current_text_len < self.min_chunk_size:
+                current_text_len += len(texts[j])
+                j += 1
+
+            # The start time is the 'start' of the first segment in group
+            # The end time is the 'end' of the last segment in group
+            chunk_data = {
+                "text": " ".join(texts[i:j]).strip(),
+                "start": segments[i]["start"],
+                "end": segments[j - 1]["end"],
+            }
+            chunks.append(chunk_data)
+
+            if j >= n:
+                break
+
+            # Keep overlap for context preservation
+            i = max(i + 1, j - self.overlap_segments)
 
         print(
             f"📦 Grouped {len(segments)} segments into {len(chunks)} contextual chunks."
@@ -1,19 +1,141 @@
 import os
 import asyncio
+import hashlib
+import json
+import threading
+import weakref
 import cv2
+import httpx
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from openai import AsyncOpenAI, OpenAI
+from openai.types.shared_params import ResponseFormatJSONSchema
 from dotenv import load_dotenv
-from typing import Tuple, Dict, Any, Optional
-from src.database.vector_store import VectorDatabase
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+from typing import Iterator, Tuple, Dict, Any, Optional
+from src.database.vector_store import VectorDatabase, index_generation
 from src.core.transcriber import VideoTranscriber
 from src.core.chunking import ChunkingProcessor
+from src.core.semantic_cache import SemanticQueryCache
+from src.video_processing.frame_extractor import DEDUP_HAMMING_THRESHOLD, dhash64
 from src.video_processing.ocr_service import OCRService
 
 # Load environment variables for the API Key
 load_dotenv()
 
+# Shared HTTP/2 keep-alive pool for every OpenAI client in the process.
+# Avoids a fresh TLS handshake per RAGEngine and multiplexes concurrent calls.
+_HTTP_CLIENT: Optional[httpx.Client] = None
+
+
+def _shared_http_client() -> httpx.Client:
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        _HTTP_CLIENT = httpx.Client(
+            transport=httpx.HTTPTransport(
+                http2=True,
+                retries=2,
+                limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=60),
+            ),
+            timeout=30.0,
+        )
+    return _HTTP_CLIENT
+
+
+def _new_async_http_client() -> httpx.AsyncClient:
+    """Pooled HTTP/2 client for AsyncOpenAI (one per event loop, see RAGEngine)."""
+    return httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=2,
+            limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=60),
+        ),
+        timeout=30.0,
+    )
+
+
+# Refined for reasoning & visual accuracy
+SYSTEM_PROMPT = (
+    "You are an Expert Technical Tutor. "
+    "Answer based on the provided video segments.\n"
+    "RULES:\n"
+    "1. FORMATTING: Always use Markdown code blocks "
+    "for code found in the context.\n"
+    "2. VISUAL SUPREMACY: If information comes from a "
+    "<source_type>VISUAL</source_type> tag, "
+    "prioritize it for syntax/code accuracy.\n"
+    "3. CITATIONS: Cite the specific timestamp (e.g., 04:15) "
+    "for every claim.\n"
+    "4. UNKNOWN: If the answer is not in the context, say you don't know."
+)
+
+# XML-like structure for one retrieved segment (compiled once, filled per slice)
+CONTEXT_SLICE_TEMPLATE = """
+    <context_slice id="{id}">
+        <source_type>{source_type}</source_type>
+        <timestamp>{timestamp}</timestamp>
+        <content>{content}</content>
+    </context_slice>
+"""
+
+# Adaptive retrieval: re-query wider when hits collapse into too few windows
+MIN_DISTINCT_WINDOWS = 3
+FALLBACK_SEARCH_LIMIT = 25
+
+NO_CONTEXT_ANSWER = "No encontré información relevante en el vídeo."
+
+SOURCE_TYPE_TAGS = {"audio": "AUDIO", "visual": "VISUAL"}
+
+# Where OCR'd frames are saved so the UI can show them next to the answer
+FRAME_CACHE_DIR = "data/tmp"
+# Thumbnail quality: ~40% smaller and faster to encode than OpenCV's default
+# 95, still crisp for slide text. (WebP is smaller but ~20x slower to encode.)
+FRAME_JPEG_QUALITY = 80
+
+# Max frames decoded ahead of the OCR workers (queued + running)
+OCR_QUEUE_DEPTH = 16
+
+# Multi-question mode: one completion answers every numbered question
+BATCH_PROMPT_SUFFIX = (
+    "\n5. MULTIPLE QUESTIONS: Answer each numbered question independently. "
+    'Return JSON {"answers": [...]} with one Markdown answer per question, '
+    "in the same order."
+)
+BATCH_RESPONSE_FORMAT: ResponseFormatJSONSchema = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "batched_answers",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"answers": {"type": "array", "items": {"type": "string"}}},
+            "required": ["answers"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Response-level cache: (video_id, model, prompt_hash) -> answer.
+# Module-level so it survives across RAGEngine instances (the UI builds one per
+# question). Bounded LRU to keep memory flat on long sessions.
+_ANSWER_CACHE: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+ANSWER_CACHE_SIZE = 256
+# UI session threads and the executor share it; move_to_end/popitem race
+_ANSWER_CACHE_LOCK = threading.Lock()
+
+# Paraphrase-level cache: near-identical questions (cosine >= 0.95) about the
+# same video reuse the prior (answer, sources) without touching Qdrant or OpenAI.
+# Entries are scoped to the index generation (any upsert in this process makes
+# them miss) and expire after a TTL for re-indexing done by other processes.
+SEMANTIC_CACHE_TTL_S = 600.0
+_SEMANTIC_CACHE = SemanticQueryCache(
+    threshold=0.95, max_entries=1024, ttl_s=SEMANTIC_CACHE_TTL_S
+)
+# (video scope, query vector, index generation at retrieval time)
+SemanticKey = Tuple[str, np.ndarray, int]
+
 
 class RAGEngine:
     """
@@ -22,23 +144,80 @@ class RAGEngine:
     Updated to support Multimodal Context (Audio + Visual) & Concurrent Ingestion.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        search_limit: Optional[int] = None,
+        max_context_segments: int = 7,
+        time_window_secs: int = 10,
+        score_threshold: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            search_limit (int): Segments retrieved from Qdrant per question.
+                Defaults to RAG_RETRIEVAL_LIMIT (10).
+            max_context_segments (int): Max source buttons returned to the UI.
+            time_window_secs (int): One source button per window of this size.
+            score_threshold (float): Min dense cosine for candidates.
+                Defaults to RAG_SCORE_THRESHOLD (0.3).
+        """
+        if search_limit is None:
+            search_limit = int(os.getenv("RAG_RETRIEVAL_LIMIT", "10"))
+        if score_threshold is None:
+            score_threshold = float(os.getenv("RAG_SCORE_THRESHOLD", "0.3"))
+        self.search_limit = search_limit
+        self.score_threshold = score_threshold
+        self.max_context_segments = max_context_segments
+        self.time_window_secs = time_window_secs
+
         # We use gpt-4o-mini: high reasoning capability at a very low cost
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"), http_client=_shared_http_client()
+        )
+        # Async client for coroutine callers. Connection pools are bound to
+        # the loop that opened them, so one client is kept per event loop.
+        self._async_clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, AsyncOpenAI
+        ] = weakref.WeakKeyDictionary()
         self.db = VectorDatabase()
         self.model = "gpt-4o-mini"
 
         # Components for Ingestion
-        self.transcriber = VideoTranscriber()
+        # Re-ingesting a video (retries, refreshed visuals) skips Whisper
+        self.transcriber = VideoTranscriber(transcript_cache=True)
         self.chunker = ChunkingProcessor(min_chunk_size=600)
-        self.ocr_service = OCRService()
 
-        # Executor for CPU-bound tasks (Whisper, RapidOCR)
+        # Executor for CPU-bound tasks (Whisper, downloads, retrieval)
         # OPTIMIZATION: Use all available cores to maximize throughput
         max_workers = os.cpu_count() or 4
         print(f"🚀 Initializing RAGEngine with {max_workers} worker threads")
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
 
+        # OCR gets its own small pool: every ONNX session spawns intra-op
+        # threads, so N concurrent calls x cpu_count threads each would thrash.
+        # Split the cores between the concurrent calls instead.
+        ocr_workers = int(os.getenv("OCR_CONCURRENCY", str(max(2, max_workers // 2))))
+        self.ocr_workers = ocr_workers
+        self.ocr_service = OCRService(
+            intra_op_num_threads=max(1, max_workers // ocr_workers)
+        )
+        self.ocr_executor = ThreadPoolExecutor(max_workers=ocr_workers)
+
+        # Lazily-built, reused yt-dlp instance for video downloads, one per
+        # thread (yt-dlp isn't thread-safe; a shared lock would queue every
+        # user's download behind the slowest one)
+        self._ydl_video_local = threading.local()
+
+        self._warm_up_models()
+
+    def _warm_up_models(self) -> None:
+        """
+        Runs one dummy inference through the OCR ONNX sessions so ORT arena
+        allocation and kernel selection happen at startup instead of stalling
+        the first frame. The vector store warms its encoders when loading them.
+        """
+        print("🔥 Warming up ONNX sessions (OCR)...")
+        self.ocr_service.extract_text_from_array(np.zeros((64, 64, 3), dtype=np.uint8))
+
     async def ingest_video(
         self, youtube_url: str, include_visuals: bool = True
     ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
@@ -46,78 +225,105 @@ class RAGEngine:
         High-Performance Concurrent Ingestion Pipeline.
         Orchestrates:
         1. Download & Transcribe (Audio)
-        2. Frame Extraction & OCR (Visual) [Optional]
-        All running in parallel.
+        2. Download, Frame Extraction & OCR (Visual) [Optional]
+        Each modality is an independent pipeline; both run in parallel.
         """
         print(f"🚀 Starting Concurrent Ingestion for: {youtube_url}")
+        video_id = self._extract_video_id(youtube_url)
         if not include_visuals:
             print("ℹ️  Audio-Only Mode Enabled: Skipping visual processing.")
 
         loop = asyncio.get_running_loop()
 
-        # Phase 1: Parallel Downloads (IO-bound but fast)
-        # We start both downloads concurrently if visual is needed.
-
-        future_audio = loop.run_in_executor(
-            self.executor, self.transcriber.download_audio, youtube_url
-        )
-
-        future_video = None
+        # Phase 1+2: One pipeline per modality (download -> process), gathered
+        # together. Transcription starts as soon as the audio lands instead of
+        # waiting behind the (larger) video download.
+        visual_chunks: list[Dict[str, Any]] = []
+        video_path: Optional[str] = None
         if include_visuals:
-            future_video = loop.run_in_executor(
-                self.executor, self._download_video_best, youtube_url
+            audio_res, video_res = await asyncio.gather(
+                self._audio_pipeline(youtube_url), self._video_pipeline(youtube_url)
             )
-
-        print("⏳ Waiting for downloads...")
-        if future_video:
-            (audio_res, video_path) = await asyncio.gather(future_audio, future_video)
-            audio_path, video_title = audio_res
+            audio_path, video_title, audio_chunks = audio_res
+            video_path, visual_chunks = video_res
         else:
-            audio_path, video_title = await future_audio
-            video_path = None
-
-        print(f"✅ Downloads Ready. Audio: {audio_path}, Video: {video_path}")
-
-        # Phase 2: Scatter-Gather (Parallel Execution)
-        # task_audio: Transcribe Audio
-        # task_visual: Process Video Frames (OCR) - Now fully parallelized internally
-
-        task_audio = loop.run_in_executor(
-            self.executor, self._process_audio_task, audio_path
-        )
-
-        task_visual = None
-        if include_visuals and video_path:
-            # We run _process_video_task in the executor to avoid blocking the loop
-            # during the frame extraction phase, even though it spawns its own tasks.
-            task_visual = loop.run_in_executor(
-                self.executor, self._process_video_task, video_path
+            audio_path, video_title, audio_chunks = await self._audio_pipeline(
+                youtube_url
             )
 
-        # Wait for both to complete
-        if task_visual:
-            audio_chunks, visual_chunks = await asyncio.gather(task_audio, task_visual)
-        else:
-            audio_chunks = await task_audio
-            visual_chunks = []
-
         # Phase 3: Aggregation & Storage
         all_chunks = audio_chunks + visual_chunks
         print(f"💾 Upserting {len(all_chunks)} combined chunks to VectorDB...")
 
-        video_id = youtube_url.split("v=")[-1].split("&")[0]
-        video_id = youtube_url.split("v=")[-1].split("&")[0]
         await loop.run_in_executor(
             self.executor, self.db.upsert_chunks, all_chunks, video_id
         )
+        # Old answers for this video are now stale; other scopes miss on their
+        # next lookup because the upsert bumped the index generation
+        _SEMANTIC_CACHE.invalidate(video_id)
         print("✅ Ingestion Complete!")
 
         return video_path, audio_path, video_title
 
+    @staticmethod
+    def _extract_video_id(url: str) -> str:
+        """
+        YouTube video id from watch (?v=), youtu.be/, /shorts/, /embed/ and
+        /live/ URLs. Unknown formats fall back to the legacy "v=" split.
+        """
+        parsed = urlparse(url)
+        host = (parsed.hostname or "").lower()
+        path_parts = [part for part in parsed.path.split("/") if part]
+
+        if host.endswith("youtu.be") and path_parts:
+            return path_parts[0]
+
+        query_ids = parse_qs(parsed.query).get("v")
+        if query_ids:
+            return query_ids[0]
+
+        if len(path_parts) >= 2 and path_parts[0] in ("shorts", "embed", "live"):
+            return path_parts[1]
+
+        return url.split("v=")[-1].split("&")[0]
+
+    async def _audio_pipeline(
+        self, youtube_url: str
+    ) -> Tuple[str, str, list[Dict[str, Any]]]:
+        """Downloads the audio track and transcribes it as soon as it lands."""
+        loop = asyncio.get_running_loop()
+        audio_path, video_title = await loop.run_in_executor(
+            self.executor, self.transcriber.download_audio, youtube_url
+        )
+        print(f"✅ Audio Ready: {audio_path}")
+        audio_chunks = await loop.run_in_executor(
+            self.executor, self._process_audio_task, audio_path
+        )
+        return audio_path, video_title, audio_chunks
+
+    async def _video_pipeline(
+        self, youtube_url: str
+    ) -> Tuple[Optional[str], list[Dict[str, Any]]]:
+        """Downloads the video stream and runs frame extraction + OCR on it."""
+        loop = asyncio.get_running_loop()
+        video_path = await loop.run_in_executor(
+            self.executor, self._download_video_best, youtube_url
+        )
+        print(f"✅ Video Ready: {video_path}")
+        if not video_path:
+            return None, []
+
+        # Runs in the executor to keep the loop free during frame extraction,
+        # even though it fans OCR out to its own pool.
+        visual_chunks = await loop.run_in_executor(
+            self.executor, self._process_video_task, video_path
+        )
+        return video_path, visual_chunks
+
     def _process_audio_task(self, audio_path: str) -> list[Dict[str, Any]]:
         """Wrapper for audio transcription and chunking."""
         print("🔊 Starting Audio Transcription...")
-        segments = self.transcriber.transcribe(audio_path)
+        segments = self.transcriber.transcribe_cached(audio_path)
         chunks = self.chunker.create_chunks(segments)
         print(f"🔊 Audio processing complete: {len(chunks)} chunks.")
         return chunks
@@ -126,55 +332,123 @@ class RAGEngine:
         """
         High-Performance Video Processing Loop.
 
-        Phase 1 (Sequential):
-        - Iterate video frames.
+        Phase 1 (Sequential, pipelined with Phase 2):
+        - Iterate video frames (`_iter_unique_frames`).
         - Downscale & Deduplicate (Fast CPU ops).
-        - Save valid frames to temp storage.
+        - Hand each unique in-memory frame to the OCR executor, blocking once
+          OCR_QUEUE_DEPTH frames are pending.
 
         Phase 2 (Parallel):
-        - Submit all valid frames to ThreadPoolExecutor for OCR.
+        - Collect OCR results as they complete, then sort by timestamp.
         - This saturates the CPU as RapidOCR releases GIL for ONNX runtime.
         """
         print(f"👁️ Starting Visual Processing: {video_path}")
         chunks = []
-        cap = cv2.VideoCapture(video_path)
+        cap = self._open_video(video_path)
 
         if not cap.isOpened():
             print(f"❌ Could not open video: {video_path}")
             return []
 
-        fps = cap.get(cv2.CAP_PROP_FPS)
+        # Some containers report 0 FPS; fall back to a common rate
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
         # Performance Tuning: Increase interval to reduce total OCR workload.
         # User feedback: "Extraction is too long".
         # 15 seconds (User Request)
         step_seconds = 15
-        step_frames = int(fps * step_seconds)
-
-        current_frame_pos = (
-            0  # Use a different name to avoid confusion with frame_count
+        step_frames = max(1, int(fps * step_seconds))
+
+        # Frames are only written to disk when OCR finds text (UI thumbnails)
+        os.makedirs(FRAME_CACHE_DIR, exist_ok=True)
+        ocr_futures = []
+        # Bounded hand-off between the decode stage and the OCR workers:
+        # decode stalls once this many frames are queued/running, so the
+        # stages overlap while in-memory frames (~2.7MB each at 720p) stay capped.
+        in_flight = threading.BoundedSemaphore(
+            max(OCR_QUEUE_DEPTH, self.ocr_workers * 2)
         )
-        last_processed_frame_hash = None
-
-        # Store tasks for Phase 2
-        ocr_tasks = []
-        temp_files_to_clean = []
 
         print(f"👁️ Phase 1: Extracting & Filtering Frames (Every {step_seconds}s)...")
 
+        try:
+            for frame, timestamp in self._iter_unique_frames(cap, fps, step_frames):
+                # OCR starts right away on the in-memory frame, overlapping
+                # with the decode of the rest of the video.
+                in_flight.acquire()
+                future = self.ocr_executor.submit(self._ocr_frame, frame, timestamp)
+                future.add_done_callback(lambda _: in_flight.release())
+                ocr_futures.append(future)
+        finally:
+            cap.release()
+        print(f"👁️ Phase 1 Complete. Found {len(ocr_futures)} unique frames.")
+        print("👁️ Phase 2: Collecting Parallel OCR results...")
+
+        # Chunks are built as soon as each OCR call lands; the order is
+        # restored by timestamp once everything is in.
+        for future in as_completed(ocr_futures):
+            chunk = future.result()
+            if chunk:
+                chunks.append(chunk)
+        chunks.sort(key=lambda c: c["metadata"]["timestamp"])
+
+        print(f"👁️ Phase 2 Complete. Generated {len(chunks)} visual chunks.")
+        return chunks
+
+    @staticmethod
+    def _open_video(video_path: str) -> cv2.VideoCapture:
+        """
+        Opens the video with FFmpeg hardware decoding when available
+        (VAAPI / NVDEC / VideoToolbox / D3D11). Frames still come back as BGR
+        ndarrays; OpenCV falls back to software decode per stream on its own,
+        and we fall back to the plain constructor if the backend rejects the
+        acceleration params outright.
+        """
+        try:
+            cap = cv2.VideoCapture(
+                video_path,
+                cv2.CAP_FFMPEG,
+                # No CAP_PROP_HW_DEVICE: FFmpeg rejects a device index with ANY
+                [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY],
+            )
+            if cap.isOpened():
+                return cap
+            cap.release()
+        except cv2.error as e:
+            print(f"⚠️ Hardware-accelerated decode unavailable: {e}")
+        return cv2.VideoCapture(video_path)
+
+    @staticmethod
+    def _iter_unique_frames(
+        cap: cv2.VideoCapture, fps: float, step_frames: int
+    ) -> Iterator[Tuple[np.ndarray, float]]:
+        """
+        Decode stage: yields (frame, timestamp) for every sampled frame that
+        is not a near-duplicate of the previously yielded one.
+        """
+        last_processed_frame_hash: Optional[int] = None
+
+        # Sequential decode: grab() advances the stream without the keyframe
+        # re-seek cap.set(CAP_PROP_POS_FRAMES) triggers on every sample, and
+        # retrieve() only pays for the frame conversion on sampled frames.
+        frame_idx = -1
         frame_count = 0
-        while cap.isOpened():
-            cap.set(cv2.CAP_PROP_POS_FRAMES, current_frame_pos)
-            ret, frame = cap.read()
+        while True:
+            if not cap.grab():
+                break
+            frame_idx += 1
+            if frame_idx % step_frames != 0:
+                continue
+
+            ret, frame = cap.retrieve()
             if not ret:
                 break
 
+            timestamp = frame_idx / fps
+
             frame_count += 1
             if frame_count % 5 == 0:
-                timestamp = current_frame_pos / fps
                 print(f"   ... Scanning frame {frame_count} at {timestamp:.1f}s ...")
 
-            timestamp = current_frame_pos / fps
-
             # --- OPTIMIZATION 1: Downscaling ---
             h, w = frame.shape[:2]
             if h > 720:
@@ -182,85 +456,40 @@ class RAGEngine:
                 new_w = int(w * scale)
                 frame = cv2.resize(frame, (new_w, 720))
 
-            # --- OPTIMIZATION 2: Smart Deduplication ---
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            small = cv2.resize(gray, (8, 8))
-            current_hash = small
+            # --- OPTIMIZATION 2: Smart Deduplication (dHash) ---
+            current_hash = dhash64(frame)
 
             is_duplicate = False
             if last_processed_frame_hash is not None:
-                score = np.mean(np.abs(current_hash - last_processed_frame_hash))  # type:ignore[unreachable]
-                if score < 5.0:
+                distance = (current_hash ^ last_processed_frame_hash).bit_count()
+                if distance < DEDUP_HAMMING_THRESHOLD:
                     is_duplicate = True
 
             if not is_duplicate:
-                # Prepare for OCR
-                temp_path = f"data/tmp/temp_frame_{timestamp:.2f}.jpg"
-                cv2.imwrite(temp_path, frame)
-                temp_files_to_clean.append(temp_path)
-
-                # We collect data needed for the task
-                ocr_tasks.append({"path": temp_path, "timestamp": timestamp})
-
                 last_processed_frame_hash = current_hash
+                yield frame, timestamp
 
-            current_frame_pos += step_frames
-
-        cap.release()
-        print(f"👁️ Phase 1 Complete. Found {len(ocr_tasks)} unique frames.")
-        print("👁️ Phase 2: Running Parallel OCR...")
-
-        # Phase 2: Parallel OCR
-        # We use a helper function to make it pickle-able/map-able
-        #  if we switched to ProcessPool,
-        # but for ThreadPool with GIL-releasing libs (like onnxruntime), this is fine.
-        # However, 'self.ocr_service.extract_text' is bound method.
-        # Ideally we run it in the executor.
-
-        # Since we are already INSIDE a thread (this method called via run_in_executor),
-        # we can submit new tasks to the SAME executor or a new one?
-        # RAGEngine.executor is used for High-level orchestration.
-        # It's better to reuse it or have a dedicated one.
-        # Using `self.executor.map` within a task running
-        # in `self.executor` might cause deadlock
-        # if max_workers is low and we occupy one slot waiting for others.
-        # But we set max_workers to cpu_count.
-        # To be safe, let's just map synchronously here if we are already in a thread,
-        # OR better: use `concurrent.futures.wait`
-        # on futures submitted to `self.executor`.
-
-        # Deadlock Risk: If we have 4 cores, and we use
-        # one for Audio and one for Video (this function),
-        # we have 2 left. If we submit 100 OCR tasks, they will run 2 at a time.
-        # We wait for them. This is fine. NO DEADLOCK.
-
-        futures = []
-        for task in ocr_tasks:
-            # We submit the EXTRACT TEXT task
-            future = self.executor.submit(self.ocr_service.extract_text, task["path"])
-            futures.append((future, task))  # Keep track of metadata
-
-        for future, task in futures:
-            # Result is blocking, but we are in a thread so it's fine.
-            text = future.result()
-            if text:
-                chunks.append(
-                    {
-                        "page_content": text,
-                        "metadata": {
-                            "source": "visual",
-                            "timestamp": task["timestamp"],
-                            "frame_path": task["path"],
-                        },
-                    }
-                )
-
-        # Cleanup
-        # for path in temp_files_to_clean:
-        #    if os.path.exists(path): os.remove(path)
-
-        print(f"👁️ Phase 2 Complete. Generated {len(chunks)} visual chunks.")
-        return chunks
+    def _ocr_frame(
+        self, frame: np.ndarray, timestamp: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        OCR worker: runs RapidOCR on the decoded frame and, only if it holds
+        text, persists a JPEG for the UI's frame preview.
+        """
+        text = self.ocr_service.extract_text_from_array(frame)
+        if not text:
+            return None
+
+        frame_path = f"{FRAME_CACHE_DIR}/temp_frame_{timestamp:.2f}.jpg"
+        cv2.imwrite(frame_path, frame, [cv2.IMWRITE_JPEG_QUALITY, FRAME_JPEG_QUALITY])
+        return {
+            "page_content": text,
+            "metadata": {
+                "source": "visual",
+                "timestamp": timestamp,
+                "frame_path": frame_path,
+            },
+        }
 
     def _download_video_best(self, url: str) -> str:
         """
@@ -271,18 +500,23 @@ class RAGEngine:
         # For this refactor, let's assume we use yt-dlp directly.
         import yt_dlp
 
-        # FIX: Force h264 (avc1) codec to ensure OpenCV compatibility.
-        # AV1 (av01) or VP9 often fail on systems without HW acceleration
-        ydl_opts = {
-            "format": "bestvideo[ext=mp4][vcodec^=avc]+bestaudio[ext=m4a]/"
-            "best[ext=mp4]/best",
-            "outtmpl": "data/videos/%(id)s.%(ext)s",
-            "quiet": True,
-            "no_warnings": True,
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            return ydl.prepare_filename(info)
+        # One YoutubeDL per executor thread, built on first use: skips the
+        # extractor registry / cookiejar setup on later ingestions.
+        ydl = getattr(self._ydl_video_local, "ydl", None)
+        if ydl is None:
+            # FIX: Force h264 (avc1) codec to ensure OpenCV compatibility.
+            # AV1 (av01) or VP9 often fail on systems without HW acceleration
+            ydl_opts = {
+                "format": "bestvideo[ext=mp4][vcodec^=avc]+bestaudio[ext=m4a]/"
+                "best[ext=mp4]/best",
+                "outtmpl": "data/videos/%(id)s.%(ext)s",
+                "quiet": True,
+                "no_warnings": True,
+            }
+            ydl = self._ydl_video_local.ydl = yt_dlp.YoutubeDL(ydl_opts)
+
+        info = ydl.extract_info(url, download=True)
+        return ydl.prepare_filename(info)
 
     def answer_question(
         self, question: str, video_id: str
@@ -291,13 +525,172 @@ class RAGEngine:
         Main logic: Retrieve chunks, build context, and generate a cited answer.
         Handles both text/audio segments and visual/OCR segments.
         """
+        semantic_key, ready, user_prompt, context_segments = self._prepare_question(
+            question, video_id
+        )
+        if ready is not None:
+            return ready, context_segments
+
+        # 4. GENERATION: Call OpenAI API (or reuse a cached answer)
+        answer = self._cached_completion(video_id, SYSTEM_PROMPT, user_prompt)
+        self._remember_semantic(semantic_key, answer, context_segments)
+
+        # Return the generated answer AND the filtered segments for the buttons
+        # The segments now contain 'frame_path' if they are visual
+        return answer, context_segments
+
+    async def answer_question_async(
+        self, question: str, video_id: str
+    ) -> tuple[str, list[Dict[str, Any]]]:
+        """
+        Coroutine version of `answer_question` for async callers.
+        Retrieval (query encode + Qdrant) runs on the executor and the LLM
+        call is awaited on the pooled AsyncOpenAI client, so the event loop
+        stays free for the whole round-trip.
+        """
+        loop = asyncio.get_running_loop()
+        semantic_key, ready, user_prompt, context_segments = await loop.run_in_executor(
+            self.executor, self._prepare_question, question, video_id
+        )
+        if ready is not None:
+            return ready, context_segments
+
+        answer = await self._cached_completion_async(
+            video_id, SYSTEM_PROMPT, user_prompt
+        )
+        self._remember_semantic(semantic_key, answer, context_segments)
+        return answer, context_segments
+
+    def answer_question_stream(
+        self, question: str, video_id: str, speculative: bool = False
+    ) -> tuple[Iterator[str], list[Dict[str, Any]]]:
+        """
+        Streaming variant of `answer_question`.
+        Retrieval runs eagerly so the sources are available immediately; the
+        answer is returned as an iterator of text deltas that the UI can
+        render as they arrive (time-to-first-token instead of full latency).
+
+        With `speculative=True` the LLM request starts from the top hits while
+        the full retrieval is still in flight (see `_speculative_stream`).
+        """
+        if speculative:
+            return self._speculative_stream(question, video_id)
+
+        semantic_key, ready, user_prompt, context_segments = self._prepare_question(
+            question, video_id
+        )
+        if ready is not None:
+            return iter([ready]), context_segments
+
+        tokens = self._stream_completion(
+            video_id, user_prompt, semantic_key, context_segments
+        )
+        return tokens, context_segments
+
+    def _speculative_stream(
+        self, question: str, video_id: str, head_limit: int = 3
+    ) -> tuple[Iterator[str], list[Dict[str, Any]]]:
+        """
+        Overlaps the retrieval tail with LLM prefill.
+        A small top-k search and the full search run concurrently; as soon as
+        the top-k returns, the completion is opened on that context. The
+        speculative stream is kept only if every source selected from the
+        full results is among the top-k hits (the answer then covers exactly
+        the sources shown); otherwise it is closed and restarted on full
+        context. A kept answer only enters the semantic cache when the full
+        search added nothing beyond the top-k, i.e. it is the full-context one.
+        """
+        semantic_key, cached = self._semantic_lookup(question, video_id)
+        if cached is not None:
+            print("⚡ Semantic cache hit. Reusing previous answer.")
+            return iter([cached[0]]), cached[1]
+        query_vector = semantic_key[1]
+
+        search = partial(
+            self.db.search,
+            question,
+            video_id=video_id,
+            query_vector=query_vector,
+            score_threshold=self.score_threshold,
+        )
+        future_head = self.executor.submit(search, limit=head_limit)
+        future_full = self.executor.submit(search, limit=self.search_limit)
+
+        head = future_head.result()
+        if not head:
+            # Same query and filter: the full search can't find more
+            future_full.cancel()
+            return iter([NO_CONTEXT_ANSWER]), []
+
+        head_prompt = self._user_prompt(question, head)
+        speculative_response = self._open_stream(head_prompt)
+
+        full = future_full.result()
+        context_segments = self._select_button_segments(full)
+
+        head_keys = {self._segment_key(seg) for seg in head}
+        if all(self._segment_key(seg) in head_keys for seg in context_segments):
+            print("⚡ Speculative answer kept (all sources in the top hits).")
+            # Answer cache is keyed by the head prompt, so it stays exact; the
+            # paraphrase cache only takes answers built on the full context
+            full_context = all(self._segment_key(seg) in head_keys for seg in full)
+            cache_key = self._answer_cache_key(video_id, SYSTEM_PROMPT, head_prompt)
+            tokens = self._consume_stream(
+                speculative_response,
+                cache_key,
+                semantic_key if full_context else None,
+                context_segments,
+            )
+            return tokens, context_segments
+
+        print("🔁 Speculative context diverged. Restarting on full context.")
+        speculative_response.close()
+        tokens = self._stream_completion(
+            video_id,
+            self._user_prompt(question, full),
+            semantic_key,
+            context_segments,
+        )
+        return tokens, context_segments
+
+    def _prepare_question(
+        self, question: str, video_id: str
+    ) -> tuple[SemanticKey, Optional[str], str, list[Dict[str, Any]]]:
+        """
+        Retrieval + prompt building shared by the blocking and streaming paths.
+        Returns (semantic_key, ready_answer, user_prompt, context_segments);
+        `ready_answer` is set when no LLM call is needed (cache hit / no data).
+        """
         if not video_id:
             print("⚠️ No Video ID provided for search context. Results might be mixed.")
 
+        # 0. SEMANTIC CACHE: Paraphrased repeats skip retrieval and generation
+        semantic_key, cached = self._semantic_lookup(question, video_id)
+        if cached is not None:
+            print("⚡ Semantic cache hit. Reusing previous answer.")
+            return semantic_key, cached[0], "", cached[1]
+        query_vector = semantic_key[1]
+
         # 1. RETRIEVAL: Find top matches in Qdrant
-        # TUNING: Increased limit from 5 to 10 to handle multi-part questions better.
-        # This ensures we get context for "Question A & B" if they are far apart.
-        raw_context_segments = self.db.search(question, limit=15, video_id=video_id)
+        # TUNING: limit 10 (RAG_RETRIEVAL_LIMIT) covers 7 distinct buttons on
+        # well-clustered collections; it is widened below only when needed.
+        search = partial(
+            self.db.search,
+            question,
+            video_id=video_id,
+            query_vector=query_vector,
+            score_threshold=self.score_threshold,
+        )
+        raw_context_segments = search(limit=self.search_limit)
+
+        # Safety net: a full page collapsing into < 3 time windows means the
+        # hits cluster in one spot; widen the net to recover distinct sources.
+        if (
+            len(raw_context_segments) >= self.search_limit
+            and self._distinct_windows(raw_context_segments) < MIN_DISTINCT_WINDOWS
+        ):
+            print("🔁 Few distinct time windows. Re-querying with a wider limit...")
+            raw_context_segments = search(limit=FALLBACK_SEARCH_LIMIT)
         print(
             f"🔎 Raw segments found: {len(raw_context_segments)} for video {video_id}"
         )
@@ -311,72 +704,238 @@ class RAGEngine:
             )
 
         if not raw_context_segments:
-            return "No encontré información relevante en el vídeo.", []
+            return semantic_key, NO_CONTEXT_ANSWER, "", []
 
         # 1.1 FILTERING LOGIC (For UI Buttons Only)
-        # We filter buttons to avoid overcrowding the UI
-        # We use ALL segments for the LLM context.
-        context_segments = []
-        seen_time_windows = set()
-
-        for seg in raw_context_segments:
-            # Relaxed window to 10s to allow more granular buttons
-            time_window = int(seg["start"] // 10)
-            if time_window not in seen_time_windows:
-                context_segments.append(seg)
-                seen_time_windows.add(time_window)
+        context_segments = self._select_button_segments(raw_context_segments)
 
-            if len(context_segments) >= 7:
-                break
+        # 2-3. CONTEXT PREPARATION + PROMPT ENGINEERING
+        user_prompt = self._user_prompt(question, raw_context_segments)
+        return semantic_key, None, user_prompt, context_segments
 
-        context_segments.sort(key=lambda x: x["start"])
+    def _semantic_lookup(
+        self, question: str, video_id: str
+    ) -> tuple[SemanticKey, Optional[Any]]:
+        """Embeds the question and probes the paraphrase cache."""
+        # Read before retrieval: an upsert landing mid-answer makes it stale
+        generation = index_generation()
+        query_vector = self.db.encode_query(question)
+        semantic_key = (video_id or "", query_vector, generation)
+        return semantic_key, _SEMANTIC_CACHE.lookup(*semantic_key)
+
+    @staticmethod
+    def _remember_semantic(
+        semantic_key: SemanticKey,
+        answer: str,
+        context_segments: list[Dict[str, Any]],
+    ) -> None:
+        scope, query_vector, generation = semantic_key
+        _SEMANTIC_CACHE.add(scope, query_vector, (answer, context_segments), generation)
+
+    def _user_prompt(self, question: str, segments: list[Dict[str, Any]]) -> str:
+        # Multimodal Aware - XML Structured context
+        context_text = self._build_context(segments)
+        return (
+            f"User Question: {question}\n\n"
+            f"Video Content (XML Structured):\n{context_text}"
+        )
 
-        # 1.2 PROMPT CONTEXT LOGIC (All relevant segments)
-        # Sort all retrieved segments by time for the LLM to read a coherent story
-        prompt_segments = sorted(raw_context_segments, key=lambda x: x["start"])
+    async def answer_questions(
+        self, questions: list[str], video_id: str
+    ) -> list[tuple[str, list[Dict[str, Any]]]]:
+        """
+        Answers several questions about the same video.
+        Retrieval is one batched search; when the retrieved contexts overlap
+        heavily (>= 50%), all questions share ONE chat completion over the
+        merged context (structured JSON output). Otherwise each question
+        falls back to the regular `answer_question` path.
+        """
+        if not questions:
+            return []
 
-        # 2. CONTEXT PREPARATION (Multimodal Aware - XML Structured)
-        context_text = "<video_context>\n"
-        for i, seg in enumerate(prompt_segments):
-            start_m, start_s = divmod(int(seg["start"]), 60)
+        loop = asyncio.get_running_loop()
 
-            # Handle cases where 'end' might be missing
-            _end_time = seg.get("end", seg["start"])
+        # 1. RETRIEVAL: All questions embedded in one batched forward pass,
+        # then searched in ONE Qdrant round-trip (query_batch_points)
+        query_vectors = await loop.run_in_executor(
+            self.executor, self.db.encode_queries, questions
+        )
+        results = await loop.run_in_executor(
+            self.executor,
+            partial(
+                self.db.search_many,
+                questions,
+                limit=self.search_limit,
+                video_id=video_id,
+                query_vectors=query_vectors,
+                score_threshold=self.score_threshold,
+            ),
+        )
 
-            # Label the source type explicitly
-            source_type = seg.get("type", "audio").upper()
+        if len(questions) > 1 and all(results) and self._contexts_overlap(results):
+            batched = await self._answer_batched(questions, results, video_id)
+            if batched is not None:
+                return batched
 
-            # Build XML-like structure for the segment
-            context_text += f"""
-    <context_slice id="{i + 1}">
-        <source_type>{source_type}</source_type>
-        <timestamp>{start_m:02d}:{start_s:02d}</timestamp>
-        <content>{seg["text"]}</content>
-    </context_slice>
-"""
-        context_text += "</video_context>"
-
-        # 3. PROMPT ENGINEERING (Refined for reasoning & visual accuracy)
-        system_prompt = (
-            "You are an Expert Technical Tutor. "
-            "Answer based on the provided video segments.\n"
-            "RULES:\n"
-            "1. FORMATTING: Always use Markdown code blocks "
-            "for code found in the context.\n"
-            "2. VISUAL SUPREMACY: If information comes from a "
-            "<source_type>VISUAL</source_type> tag, "
-            "prioritize it for syntax/code accuracy.\n"
-            "3. CITATIONS: Cite the specific timestamp (e.g., 04:15) "
-            "for every claim.\n"
-            "4. UNKNOWN: If the answer is not in the context, say you don't know."
+        # Fallback: independent questions, answered concurrently
+        return list(
+            await asyncio.gather(
+                *[self.answer_question_async(q, video_id) for q in questions]
+            )
         )
 
+    async def _answer_batched(
+        self,
+        questions: list[str],
+        results: list[list[Dict[str, Any]]],
+        video_id: str,
+    ) -> Optional[list[tuple[str, list[Dict[str, Any]]]]]:
+        """
+        Single completion for all questions over the deduplicated union of
+        their contexts. Returns None if the model output can't be mapped back.
+        """
+        merged: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+        for segments in results:
+            for seg in segments:
+                merged.setdefault(self._segment_key(seg), seg)
+
+        context_text = self._build_context(list(merged.values()))
+        numbered = "\n".join(f"{i + 1}. {q}" for i, q in enumerate(questions))
         user_prompt = (
-            f"User Question: {question}\n\n"
+            f"User Questions:\n{numbered}\n\n"
             f"Video Content (XML Structured):\n{context_text}"
         )
 
-        # 4. GENERATION: Call OpenAI API
+        print(f"🧩 Batching {len(questions)} questions into one completion...")
+        response = await self._async_client().chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT + BATCH_PROMPT_SUFFIX},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0,
+            response_format=BATCH_RESPONSE_FORMAT,
+        )
+
+        try:
+            answers = json.loads(response.choices[0].message.content or "")["answers"]
+        except (ValueError, KeyError, TypeError):
+            return None
+        if not isinstance(answers, list) or len(answers) != len(questions):
+            return None
+
+        return [
+            (str(answer), self._select_button_segments(segments))
+            for answer, segments in zip(answers, results)
+        ]
+
+    @staticmethod
+    def _segment_key(seg: Dict[str, Any]) -> Tuple[Any, ...]:
+        # Payloads carry no point id, so (type, start, text) identifies a segment
+        return (seg.get("type"), seg.get("start"), seg.get("text"))
+
+    def _contexts_overlap(
+        self, results: list[list[Dict[str, Any]]], min_overlap: float = 0.5
+    ) -> bool:
+        """True if every question shares >= min_overlap of its context with the rest."""
+        key_sets = [{self._segment_key(s) for s in segments} for segments in results]
+        for i, keys in enumerate(key_sets):
+            others = set().union(*(k for j, k in enumerate(key_sets) if j != i))
+            if len(keys & others) / len(keys) < min_overlap:
+                return False
+        return True
+
+    def _distinct_windows(self, segments: list[Dict[str, Any]]) -> int:
+        return len({int(seg["start"] // self.time_window_secs) for seg in segments})
+
+    def _select_button_segments(
+        self, raw_context_segments: list[Dict[str, Any]]
+    ) -> list[Dict[str, Any]]:
+        """
+        We filter buttons to avoid overcrowding the UI.
+        We use ALL segments for the LLM context.
+        """
+        # Insertion-ordered dict: first (= most relevant) hit per time window.
+        # Single pass that stops once enough windows are filled.
+        by_window: Dict[int, Dict[str, Any]] = {}
+        for seg in raw_context_segments:
+            # Relaxed window (10s default) to allow more granular buttons
+            by_window.setdefault(int(seg["start"] // self.time_window_secs), seg)
+            if len(by_window) >= self.max_context_segments:
+                break
+
+        # Chronological order for the UI
+        return sorted(by_window.values(), key=lambda x: x["start"])
+
+    @staticmethod
+    def _build_context(segments: list[Dict[str, Any]]) -> str:
+        """XML-structured context block, in chronological order."""
+        starts = np.fromiter(
+            (seg["start"] for seg in segments), dtype=np.float64, count=len(segments)
+        )
+        # Sort all retrieved segments by time for the LLM to read a coherent story
+        order = np.argsort(starts, kind="stable")
+
+        # MM:SS for every slice in one vectorized pass
+        minutes, seconds = np.divmod(starts[order].astype(np.int64), 60)
+
+        # Collect pieces and join once instead of repeated `+=` copies
+        parts = ["<video_context>\n"]
+        for i, (idx, start_m, start_s) in enumerate(zip(order, minutes, seconds)):
+            seg = segments[idx]
+            source_type = seg.get("type", "audio")
+            parts.append(
+                CONTEXT_SLICE_TEMPLATE.format(
+                    id=i + 1,
+                    # Label the source type explicitly
+                    source_type=SOURCE_TYPE_TAGS.get(source_type)
+                    or source_type.upper(),
+                    timestamp=f"{start_m:02d}:{start_s:02d}",
+                    content=seg["text"],
+                )
+            )
+        parts.append("</video_context>")
+        return "".join(parts)
+
+    def _answer_cache_key(
+        self, video_id: str, system_prompt: str, user_prompt: str
+    ) -> Tuple[str, str, str]:
+        prompt_hash = hashlib.sha256(
+            (system_prompt + user_prompt).encode("utf-8")
+        ).hexdigest()
+        return (video_id or "", self.model, prompt_hash)
+
+    @staticmethod
+    def _lookup_answer(cache_key: Tuple[str, str, str]) -> Optional[str]:
+        with _ANSWER_CACHE_LOCK:
+            cached = _ANSWER_CACHE.get(cache_key)
+            if cached is not None:
+                _ANSWER_CACHE.move_to_end(cache_key)
+        if cached is not None:
+            print("⚡ Answer cache hit. Skipping OpenAI call.")
+        return cached
+
+    @staticmethod
+    def _remember_answer(cache_key: Tuple[str, str, str], answer: str) -> None:
+        with _ANSWER_CACHE_LOCK:
+            _ANSWER_CACHE[cache_key] = answer
+            if len(_ANSWER_CACHE) > ANSWER_CACHE_SIZE:
+                _ANSWER_CACHE.popitem(last=False)
+
+    def _cached_completion(
+        self, video_id: str, system_prompt: str, user_prompt: str
+    ) -> str:
+        """
+        Calls the chat completion API, memoizing the answer per prompt.
+        With temperature=0 the same prompt yields the same answer, so repeat
+        questions skip the network round-trip and token cost entirely.
+        """
+        cache_key = self._answer_cache_key(video_id, system_prompt, user_prompt)
+
+        cached = self._lookup_answer(cache_key)
+        if cached is not None:
+            return cached
+
         response = self.client.chat.completions.create(
             model=self.model,
             messages=[
@@ -385,7 +944,100 @@ class RAGEngine:
             ],
             temperature=0,  # Zero temperature ensures consistent, factual answers
         )
+        answer = response.choices[0].message.content or ""
 
-        # Return the generated answer AND the filtered segments for the buttons
-        # The segments now contain 'frame_path' if they are visual
-        return response.choices[0].message.content, context_segments
+        self._remember_answer(cache_key, answer)
+        return answer
+
+    async def _cached_completion_async(
+        self, video_id: str, system_prompt: str, user_prompt: str
+    ) -> str:
+        """`_cached_completion` over the async client (same answer cache)."""
+        cache_key = self._answer_cache_key(video_id, system_prompt, user_prompt)
+
+        cached = self._lookup_answer(cache_key)
+        if cached is not None:
+            return cached
+
+        response = await self._async_client().chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0,
+        )
+        answer = response.choices[0].message.content or ""
+
+        self._remember_answer(cache_key, answer)
+        return answer
+
+    def _async_client(self) -> AsyncOpenAI:
+        """Returns the AsyncOpenAI client bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=_new_async_http_client(),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    def _stream_completion(
+        self,
+        video_id: str,
+        user_prompt: str,
+        semantic_key: SemanticKey,
+        context_segments: list[Dict[str, Any]],
+    ) -> Iterator[str]:
+        """Yields answer deltas with stream=True (or the cached answer at once)."""
+        cache_key = self._answer_cache_key(video_id, SYSTEM_PROMPT, user_prompt)
+
+        cached = self._lookup_answer(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        response = self._open_stream(user_prompt)
+        yield from self._consume_stream(
+            response, cache_key, semantic_key, context_segments
+        )
+
+    def _open_stream(self, user_prompt: str) -> Any:
+        """Sends the request; the server starts prefill before we read a token."""
+        return self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0,
+            stream=True,
+        )
+
+    def _consume_stream(
+        self,
+        response: Any,
+        cache_key: Tuple[str, str, str],
+        semantic_key: Optional[SemanticKey],
+        context_segments: list[Dict[str, Any]],
+    ) -> Iterator[str]:
+        """
+        Yields answer deltas. Once the stream is fully consumed the answer is
+        stored in both caches, like the blocking path (the semantic cache is
+        skipped when `semantic_key` is None).
+        """
+        parts = []
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        answer = "".join(parts)
+        self._remember_answer(cache_key, answer)
+        if semantic_key is not None:
+            self._remember_semantic(semantic_key, answer, context_segments)
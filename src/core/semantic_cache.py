@@ -0,0 +1,115 @@
+"""
+Semantic (paraphrase-aware) query cache for the RAG engine.
+Stores prior query embeddings per video and returns the cached result when a
+new question lands close enough in embedding space, skipping retrieval and
+generation entirely.
+Entries are tagged with the index generation they were answered against and
+expire after a TTL, so re-ingested content is never served from old answers.
+"""
+
+import threading
+import time
+from typing import Any, Optional
+
+import numpy as np
+
+# Per video: (index generation, unit-norm embedding matrix (N, dim),
+# parallel values, parallel insertion times (monotonic seconds))
+_Entry = tuple[int, np.ndarray, list[Any], np.ndarray]
+
+
+class SemanticQueryCache:
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 1024,
+        ttl_s: Optional[float] = None,
+    ):
+        """
+        Args:
+            threshold (float): Minimum cosine similarity to count as a hit.
+            max_entries (int): Entries kept per video before FIFO eviction.
+            ttl_s (float, optional): Seconds an entry stays valid. Covers
+                re-indexing done by another process (e.g. `main_ingest`),
+                which never bumps this process's index generation.
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._store: dict[str, _Entry] = {}
+        # UI session threads, the executor and the async path all share it
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(
+        self, video_id: str, vector: np.ndarray, generation: int = 0
+    ) -> Optional[Any]:
+        """
+        Returns the cached value of the most similar prior query, or None.
+        One matmul against the video's matrix scores every stored query.
+        Entries from another index generation are dropped on sight.
+        """
+        query = self._normalize(vector)
+        with self._lock:
+            entry = self._store.get(video_id)
+            if entry is None:
+                return None
+
+            entry_generation, matrix, values, added_at = entry
+            if entry_generation != generation:
+                del self._store[video_id]
+                return None
+
+            scores = matrix @ query
+            if self.ttl_s is not None:
+                expired = time.monotonic() - added_at > self.ttl_s
+                scores = np.where(expired, -np.inf, scores)
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                return values[best]
+            return None
+
+    def add(
+        self, video_id: str, vector: np.ndarray, value: Any, generation: int = 0
+    ) -> None:
+        """
+        Stores a query embedding with its result, evicting the oldest (FIFO).
+        A result computed against an older generation than the stored one is
+        discarded; a newer one replaces the video's stale entries.
+        """
+        row = self._normalize(vector)[np.newaxis, :]
+        now = np.array([time.monotonic()])
+        with self._lock:
+            entry = self._store.get(video_id)
+
+            if entry is None or entry[0] < generation:
+                self._store[video_id] = (generation, row, [value], now)
+                return
+            if entry[0] > generation:
+                return
+
+            _, matrix, values, added_at = entry
+            matrix = np.vstack([matrix, row])
+            values = values + [value]
+            added_at = np.concatenate([added_at, now])
+            if len(values) > self.max_entries:
+                matrix = matrix[-self.max_entries :]
+                values = values[-self.max_entries :]
+                added_at = added_at[-self.max_entries :]
+            self._store[video_id] = (generation, matrix, values, added_at)
+
+    def invalidate(self, video_id: Optional[str] = None) -> None:
+        """Drops one video's entries, or every entry when `video_id` is None."""
+        with self._lock:
+            if video_id is None:
+                self._store.clear()
+            else:
+                self._store.pop(video_id, None)
+
+    def clear(self) -> None:
+        self.invalidate()
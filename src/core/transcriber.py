@@ -1,12 +1,19 @@
+import hashlib
+import json
 import os
+import threading
 from faster_whisper import WhisperModel
 import yt_dlp
 from dotenv import load_dotenv
-from typing import Any
+from typing import Any, Iterator, Optional
 
 # Load environment variables
 load_dotenv()
 
+# We force 'es' (Spanish) for testing, but can be set to None for auto-detection
+WHISPER_LANGUAGE = "es"
+DEFAULT_TRANSCRIPT_CACHE_DIR = "data/cache/transcripts"
+
 
 class VideoTranscriber:
     """
@@ -14,12 +21,30 @@ class VideoTranscriber:
     Optimized for CPU usage via CTranslate2 (faster-whisper).
     """
 
-    def __init__(self) -> None:
+    def __init__(self, transcript_cache: Optional[bool] = None) -> None:
+        """
+        Args:
+            transcript_cache (bool, optional): Enables the on-disk transcript
+                cache used by `transcribe_cached`. When omitted, it is enabled
+                when TRANSCRIPT_CACHE=1 (off by default).
+        """
         # Load configuration from .env
         self.model_size = os.getenv("WHISPER_MODEL_SIZE", "tiny")
         self.device = os.getenv("WHISPER_DEVICE", "cpu")
         self.compute_type = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
-        self.beam_size = int(os.getenv("WHISPER_BEAM_SIZE", "1"))
+        # Greedy decoding is enough for the small models; wider beams only pay
+        # off on medium/large. WHISPER_BEAM_SIZE still overrides either way.
+        default_beam = "1" if self.model_size in ("tiny", "base", "small") else "5"
+        self.beam_size = int(os.getenv("WHISPER_BEAM_SIZE", default_beam))
+        self.verbose = os.getenv("VERBOSE", "false").lower() == "true"
+        # Opt-in (TRANSCRIPT_CACHE=1 or the constructor flag): `transcribe_cached`
+        # memoizes transcripts on disk, keyed by audio content + decoding settings.
+        # It is the only transcript cache; the Streamlit app and RAGEngine's
+        # ingest path enable it.
+        if transcript_cache is None:
+            transcript_cache = os.getenv("TRANSCRIPT_CACHE", "0") == "1"
+        self.transcript_cache = transcript_cache
+        self.transcript_cache_dir = DEFAULT_TRANSCRIPT_CACHE_DIR
 
         print(
             f"🚀 Loading Whisper model '{self.model_size}' on {self.device} "
@@ -31,6 +56,12 @@ class VideoTranscriber:
             self.model_size, device=self.device, compute_type=self.compute_type
         )
 
+        # yt-dlp instances are built lazily and reused (extractor registry and
+        # cookiejar setup cost hundreds of ms). yt-dlp isn't thread-safe, so
+        # each thread keeps its own per output dir: concurrent downloads run
+        # in parallel instead of queueing behind one lock.
+        self._ydl_local = threading.local()
+
     def download_audio(
         self, youtube_url: str, output_path: str = "data/tmp"
     ) -> tuple[str, str]:
@@ -70,15 +101,27 @@ class VideoTranscriber:
         print(f"📥 Downloading audio from: {youtube_url}")
 
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(youtube_url, download=True)
-                filename = f"{output_path}/{info['id']}.mp3"
-                return filename, info.get("title", "Unknown Title")
+            ydl = self._ydl_for(output_path, ydl_opts)
+            info = ydl.extract_info(youtube_url, download=True)
+            filename = f"{output_path}/{info['id']}.mp3"
+            return filename, info.get("title", "Unknown Title")
         except Exception as e:
             # Capturamos el error para que la UI no explote con un traceback feo
             print(f"❌ YouTube Download Error: {e}")
             raise e
 
+    def _ydl_for(self, output_path: str, ydl_opts: dict[str, Any]) -> yt_dlp.YoutubeDL:
+        """This thread's YoutubeDL for `output_path`, built on first use."""
+        by_output: Optional[dict[str, yt_dlp.YoutubeDL]] = getattr(
+            self._ydl_local, "by_output", None
+        )
+        if by_output is None:
+            by_output = self._ydl_local.by_output = {}
+        ydl = by_output.get(output_path)
+        if ydl is None:
+            ydl = by_output[output_path] = yt_dlp.YoutubeDL(ydl_opts)
+        return ydl
+
     def transcribe(self, audio_path: str) -> list[dict[str, Any]]:
         """
         Transcribes an audio file and returns segments with precise timestamps.
@@ -90,31 +133,120 @@ class VideoTranscriber:
             list[dict[str, Any]]: A list of segments containing keys like
                 'start', 'end', and 'text'.
         """
+        # Convert the generator to a list to persist data
+        # CRITICAL: We preserve start/end times here for the RAG citation feature later.
+        # Citation feature is key. It may make it harder but it's a must.
+        # No per-segment print: console I/O would back-pressure the lazy decoder.
+        results = list(self.transcribe_stream(audio_path))
+
+        if self.verbose:
+            for seg in results:
+                print(f"[{seg['start']:.2f}s -> {seg['end']:.2f}s] {seg['text']}")
+        print(f"🎙️ Transcription complete: {len(results)} segments.")
+
+        return results
+
+    def transcribe_stream(self, audio_path: str) -> Iterator[dict[str, Any]]:
+        """
+        Same segments as `transcribe`, yielded as Whisper decodes them, so a
+        consumer can start working before the whole file is transcribed.
+
+        Args:
+            audio_path (str): Path to the .mp3 file.
+        """
         print(f"🎙️ Transcribing {audio_path}... (Running locally on CPU)")
 
         # Optimized inference with Faster-Whisper
-        # We force 'es' (Spanish) for testing, but can be set to None for auto-detection
         segments, _ = self.model.transcribe(
             audio_path,
             beam_size=self.beam_size,
-            language="es",
+            language=WHISPER_LANGUAGE,
             vad_filter=True,  # Filters out silence to speed up processing
             vad_parameters=dict(min_silence_duration_ms=500),
+            # Each window decodes independently: no prompt carry-over to slow
+            # down decoding or feed repetition loops between windows.
+            condition_on_previous_text=False,
         )
 
-        results = []
-        # Convert the generator to a list to persist data
-        # CRITICAL: We preserve start/end times here for the RAG citation feature later.
-        # Citation feature is key. It may make it harder but it's a must.
+        # faster-whisper's generator is lazy: each step decodes one more window
         for segment in segments:
-            results.append(
-                {"start": segment.start, "end": segment.end, "text": segment.text}
-            )
-            # Real-time feedback in console
-            print(f"[{segment.start:.2f}s -> {segment.end:.2f}s] {segment.text}")
+            yield {"start": segment.start, "end": segment.end, "text": segment.text}
 
+    def transcribe_cached(self, audio_path: str) -> list[dict[str, Any]]:
+        """
+        `transcribe`, memoized on disk when TRANSCRIPT_CACHE=1: re-ingesting
+        the same audio (retries, dev iterations) skips Whisper entirely.
+
+        Args:
+            audio_path (str): Path to the .mp3 file.
+        """
+        if not self.transcript_cache:
+            return self.transcribe(audio_path)
+
+        cache_path = self._transcript_cache_path(audio_path)
+        cached = self._load_transcript(cache_path)
+        if cached is not None:
+            return cached
+
+        results = self.transcribe(audio_path)
+        self._store_transcript(cache_path, results)
         return results
 
+    def transcribe_stream_cached(self, audio_path: str) -> Iterator[dict[str, Any]]:
+        """
+        `transcribe_stream` with the same TRANSCRIPT_CACHE memoization as
+        `transcribe_cached`: hits replay the stored segments, misses are
+        stored once the stream has been fully consumed.
+
+        Args:
+            audio_path (str): Path to the .mp3 file.
+        """
+        if not self.transcript_cache:
+            yield from self.transcribe_stream(audio_path)
+            return
+
+        cache_path = self._transcript_cache_path(audio_path)
+        cached = self._load_transcript(cache_path)
+        if cached is not None:
+            yield from cached
+            return
+
+        results = []
+        for segment in self.transcribe_stream(audio_path):
+            results.append(segment)
+            yield segment
+        self._store_transcript(cache_path, results)
+
+    def _transcript_cache_path(self, audio_path: str) -> str:
+        return os.path.join(
+            self.transcript_cache_dir, f"{self._transcript_key(audio_path)}.json"
+        )
+
+    @staticmethod
+    def _load_transcript(cache_path: str) -> Optional[list[dict[str, Any]]]:
+        if not os.path.exists(cache_path):
+            return None
+        with open(cache_path, encoding="utf-8") as f:
+            results = json.load(f)
+        print(f"⏩ Transcript cache hit: {len(results)} segments.")
+        return results
+
+    def _store_transcript(self, cache_path: str, results: list[dict[str, Any]]) -> None:
+        # Write-then-rename: an interrupted run never leaves a truncated entry
+        os.makedirs(self.transcript_cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+
+    def _transcript_key(self, audio_path: str) -> str:
+        """blake2b of the audio bytes plus every setting that changes the output."""
+        with open(audio_path, "rb") as f:
+            digest = hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16))
+        settings = f"{self.model_size}/{self.compute_type}/{self.beam_size}"
+        digest.update(f"{settings}/{WHISPER_LANGUAGE}".encode())
+        return digest.hexdigest()
+
     # Just to keep the server clean
     @staticmethod
     def cleanup_temp_files(file_path: str) -> None:
@@ -0,0 +1,124 @@
+"""
+Persistent (SQLite) embedding cache for the vector store.
+Keyed by (model id, blake2b(text)) so re-ingesting a video, or any chunk text
+seen before, skips the encoder forward pass entirely. Dense vectors are kept
+as float16 (half the bytes); sparse vectors as uint32 indices + float32 values.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# SQLite's default bound-parameter limit is 999 on older builds
+_MAX_VARS = 900
+
+SparseArrays = Tuple[np.ndarray, np.ndarray]
+
+
+class EmbeddingCache:
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): SQLite file. Parent directories are created on demand.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # One shared connection; ingestion and queries run on executor
+        # threads, so access is serialized with a lock.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS dense ("
+                "model TEXT, h BLOB, vec BLOB, PRIMARY KEY (model, h)"
+                ") WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sparse ("
+                "model TEXT, h BLOB, idx BLOB, val BLOB, PRIMARY KEY (model, h)"
+                ") WITHOUT ROWID"
+            )
+
+    @staticmethod
+    def _hash(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _lookup(
+        self, table: str, columns: str, model: str, hashes: List[bytes]
+    ) -> Dict[bytes, Tuple[bytes, ...]]:
+        rows = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for i in range(0, len(unique), _MAX_VARS):
+                batch = unique[i : i + _MAX_VARS]
+                marks = ",".join("?" * len(batch))
+                query = (
+                    f"SELECT h, {columns} FROM {table} "
+                    f"WHERE model = ? AND h IN ({marks})"
+                )
+                for row in self._conn.execute(query, [model, *batch]):
+                    rows[row[0]] = row[1:]
+        return rows
+
+    def get_dense(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached float32 vectors aligned with `texts` (None on a miss)."""
+        hashes = [self._hash(t) for t in texts]
+        rows = self._lookup("dense", "vec", model, hashes)
+        return [
+            np.frombuffer(rows[h][0], dtype=np.float16).astype(np.float32)
+            if h in rows
+            else None
+            for h in hashes
+        ]
+
+    def put_dense(
+        self, model: str, texts: List[str], vectors: Iterable[np.ndarray]
+    ) -> None:
+        records = [
+            (model, self._hash(t), np.asarray(v, dtype=np.float16).tobytes())
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO dense VALUES (?, ?, ?)", records
+            )
+
+    def get_sparse(self, model: str, texts: List[str]) -> List[Optional[SparseArrays]]:
+        """Cached (indices, values) pairs aligned with `texts` (None on a miss)."""
+        hashes = [self._hash(t) for t in texts]
+        rows = self._lookup("sparse", "idx, val", model, hashes)
+        return [
+            (
+                np.frombuffer(rows[h][0], dtype=np.uint32),
+                np.frombuffer(rows[h][1], dtype=np.float32),
+            )
+            if h in rows
+            else None
+            for h in hashes
+        ]
+
+    def put_sparse(
+        self, model: str, texts: List[str], vectors: Iterable[SparseArrays]
+    ) -> None:
+        records = [
+            (
+                model,
+                self._hash(t),
+                np.asarray(indices, dtype=np.uint32).tobytes(),
+                np.asarray(values, dtype=np.float32).tobytes(),
+            )
+            for t, (indices, values) in zip(texts, vectors)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sparse VALUES (?, ?, ?, ?)", records
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,13 +1,176 @@
+import hashlib
 import os
-import uuid
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+import numpy as np
+import xxhash
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from qdrant_client import QdrantClient, models
-from sentence_transformers import SentenceTransformer
-from fastembed import SparseTextEmbedding
+from fastembed import SparseTextEmbedding, TextEmbedding
+from fastembed.common.model_description import ModelSource, PoolingType
 from dotenv import load_dotenv
+from src.database.embedding_cache import EmbeddingCache, SparseArrays
 
 load_dotenv()
 
+# Same MiniLM weights as sentence-transformers, served by FastEmbed's ONNX runtime
+DENSE_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+# Opt-in (DENSE_MODEL_INT8=true): the same MiniLM exported to ONNX with dynamic
+# int8 weights. ~4x smaller and faster on CPU; embeddings differ slightly from
+# fp32, so re-ingest videos after switching. DENSE_MODEL_PATH can point to a
+# copy quantized on this machine with scripts/export_minilm_int8.py.
+DENSE_MODEL_INT8_ID = "Xenova/all-MiniLM-L6-v2"
+DENSE_MODEL_INT8_FILE = "onnx/model_quantized.onnx"
+SPARSE_MODEL_ID = "Qdrant/bm25"
+EMBED_BATCH_SIZE = 64
+DEFAULT_EMBEDDING_CACHE_PATH = "data/cache/embeddings.sqlite3"
+UPSERT_BATCH_SIZE = 256
+
+# Only the payload fields read by the RAG engine and the UI are fetched
+_PAYLOAD_FIELDS = ["text", "start", "end", "type", "frame_path"]
+
+# Payload fields with an index: `video_id` backs the per-video filter in
+# `search`; `type` (audio/visual) and `start` (time windows) keep filters on
+# modality or timestamp index-backed too.
+PAYLOAD_INDEXES = {
+    "video_id": models.PayloadSchemaType.KEYWORD,
+    "type": models.PayloadSchemaType.KEYWORD,
+    "start": models.PayloadSchemaType.FLOAT,
+}
+
+# INT8 scalar quantization: 4x smaller dense index kept in RAM, with the
+# original fp32 vectors used to rescore an oversampled candidate set.
+DENSE_QUANTIZATION = models.ScalarQuantization(
+    scalar=models.ScalarQuantizationConfig(
+        type=models.ScalarType.INT8, quantile=0.99, always_ram=True
+    )
+)
+# Graph settings pinned explicitly so index quality doesn't drift with
+# server defaults; m=16 / ef_construct=128 suits 384-dim MiniLM vectors.
+DENSE_HNSW_CONFIG = models.HnswConfigDiff(m=16, ef_construct=128)
+# Qdrant's default optimizer threshold (KB of vectors per segment before it
+# gets an HNSW index); bulk mode sets it to 0 (no indexing), then restores the
+# collection's own value, or this one when the collection leaves it unset.
+DEFAULT_INDEXING_THRESHOLD = 20000
+DENSE_SEARCH_PARAMS = models.SearchParams(
+    quantization=models.QuantizationSearchParams(
+        ignore=False, rescore=True, oversampling=2.0
+    )
+)
+
+# LRU of query embeddings keyed by (model id, query text). Module-level so
+# repeat questions hit it even when the UI builds a new VectorDatabase.
+_QUERY_EMBEDDING_CACHE: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+_QUERY_EMBEDDING_LOCK = threading.Lock()
+QUERY_EMBEDDING_CACHE_SIZE = 4096
+
+# Short-lived cache of final search results keyed by (collection, model,
+# query, limit, video_id, score_threshold) -> (expires_at, payloads). Repeat
+# searches within the TTL skip encoding and the Qdrant round-trip; any upsert
+# clears it so new chunks are never hidden behind a stale entry.
+_SearchEntry = Tuple[float, List[Dict[str, Any]]]
+_SEARCH_RESULT_CACHE: "OrderedDict[Tuple[Any, ...], _SearchEntry]" = OrderedDict()
+_SEARCH_RESULT_LOCK = threading.Lock()
+SEARCH_RESULT_CACHE_SIZE = 512
+SEARCH_RESULT_TTL_S = 60.0
+
+# Bumped (under _SEARCH_RESULT_LOCK) by every upsert in this process. Caches
+# built on top of search results, like the RAG engine's paraphrase cache,
+# tag entries with it so re-indexed content is never answered from old hits.
+_INDEX_GENERATION = 0
+
+# Dense encoding runs here while the calling thread does the sparse (BM25)
+# side; ONNX Runtime releases the GIL, so the two overlap instead of adding up.
+_ENCODE_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="encode")
+
+
+def _resolve_dense_model_id() -> str:
+    """Picks the dense encoder, registering the int8 ONNX variant on first use."""
+    if os.getenv("DENSE_MODEL_INT8", "false").lower() != "true":
+        return DENSE_MODEL_ID
+
+    registered = {m["model"] for m in TextEmbedding.list_supported_models()}
+    if DENSE_MODEL_INT8_ID not in registered:
+        TextEmbedding.add_custom_model(
+            model=DENSE_MODEL_INT8_ID,
+            pooling=PoolingType.MEAN,
+            normalization=True,
+            sources=ModelSource(hf=DENSE_MODEL_INT8_ID),
+            dim=384,
+            model_file=DENSE_MODEL_INT8_FILE,
+        )
+    return DENSE_MODEL_INT8_ID
+
+
+@lru_cache(maxsize=1)
+def _dense_cache_model_key(model_id: str, model_path: Optional[str] = None) -> str:
+    """
+    Persistent embedding-cache key for the dense encoder. A local export
+    (DENSE_MODEL_PATH) shares the hub model's id but not its weights, so the
+    key also carries a digest of its ONNX file: vectors from the Xenova
+    weights, or from an earlier export, are never served for it.
+    """
+    if not model_path:
+        return model_id
+
+    onnx_file = os.path.join(model_path, DENSE_MODEL_INT8_FILE)
+    if not os.path.exists(onnx_file):
+        return f"{model_id}@{os.path.abspath(model_path)}"
+    with open(onnx_file, "rb") as f:
+        digest = hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16))
+    return f"{model_id}@{digest.hexdigest()}"
+
+
+# Process-wide model singletons: the UI and the RAG engine may build several
+# VectorDatabase instances, and each would otherwise reload the ONNX weights.
+@lru_cache(maxsize=1)
+def _load_dense_model(
+    model_id: str, model_path: Optional[str] = None, threads: Optional[int] = None
+) -> Any:
+    kwargs: Dict[str, Any] = {}
+    if model_path:
+        # Locally quantized export (scripts/export_minilm_int8.py)
+        kwargs["specific_model_path"] = model_path
+    print(f"🤖 Loading Dense model ({model_id}, ONNX, {threads} threads)...")
+    model = TextEmbedding(model_name=model_id, threads=threads, **kwargs)
+    _warm_up(model)
+    return model
+
+
+@lru_cache(maxsize=1)
+def _load_sparse_model() -> Any:
+    print(f"🤖 Loading Sparse model ({SPARSE_MODEL_ID})...")
+    model = SparseTextEmbedding(model_name=SPARSE_MODEL_ID)
+    _warm_up(model)
+    return model
+
+
+def _warm_up(model: Any) -> None:
+    """
+    One dummy encode right after loading, so ORT arena allocation and kernel
+    selection (and BM25 stemmer setup) don't land on the first real query.
+    Runs once per process because the loaders are cached; VECTOR_WARMUP=0
+    disables it. Bypasses the query-embedding cache on purpose.
+    """
+    if os.getenv("VECTOR_WARMUP", "1") == "1":
+        list(model.embed(["warmup"], batch_size=1))
+
+
+def index_generation() -> int:
+    """Counter of upserts seen by this process (changes whenever data does)."""
+    return _INDEX_GENERATION
+
+
+def _invalidate_search_results() -> None:
+    global _INDEX_GENERATION
+    with _SEARCH_RESULT_LOCK:
+        _SEARCH_RESULT_CACHE.clear()
+        _INDEX_GENERATION += 1
+
 
 class VectorDatabase:
     """
@@ -18,17 +181,59 @@ class VectorDatabase:
     def __init__(self, collection_name: str = "video_knowledge_hybrid"):
         self.collection_name = collection_name
 
-        print("🤖 Loading Dense model (all-MiniLM-L6-v2)...")
-        self.dense_model = SentenceTransformer("all-MiniLM-L6-v2")
+        self.dense_model_id = _resolve_dense_model_id()
+        local_int8_dir = None
+        if self.dense_model_id == DENSE_MODEL_INT8_ID:
+            local_int8_dir = os.getenv("DENSE_MODEL_PATH") or None
+        # Explicit ONNX Runtime thread budget: by default a session spins one
+        # thread per core, oversubscribing the CPU while OCR workers, Whisper
+        # and the sparse encoder run alongside it.
+        embed_threads = int(
+            os.getenv("EMBED_THREADS", str(max(1, (os.cpu_count() or 2) // 2)))
+        )
+        self.dense_model = _load_dense_model(
+            self.dense_model_id, local_int8_dir, embed_threads
+        )
+        self.dense_cache_key = _dense_cache_model_key(
+            self.dense_model_id, local_int8_dir
+        )
+        self.sparse_model = _load_sparse_model()
+        # Opt-in data-parallel document encoding (FastEmbed worker processes,
+        # 0 = one per core) for very large ingests; each worker loads its own
+        # model copy, so it only pays off past a few thousand chunks.
+        # Query encoding always stays in-process.
+        parallel = os.getenv("EMBED_PARALLEL")
+        self.embed_parallel = int(parallel) if parallel else None
+
+        # Persistent document-embedding cache; EMBEDDING_CACHE_PATH="" disables it
+        cache_path = os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_EMBEDDING_CACHE_PATH)
+        self.embedding_cache = EmbeddingCache(cache_path) if cache_path else None
 
-        print("🤖 Loading Sparse model (Qdrant/bm25)...")
-        self.sparse_model = SparseTextEmbedding(model_name="Qdrant/bm25")
+        # Weighted RRF: [dense, sparse]. Boosting sparse helps exact-token queries
+        # (names, dates, identifiers) that the dense channel tends to miss.
+        self.rrf_weights = [
+            float(os.getenv("HYBRID_DENSE_WEIGHT", "1.0")),
+            float(os.getenv("HYBRID_SPARSE_WEIGHT", "2.0")),
+        ]
 
         qdrant_host = os.getenv("QDRANT_HOST", "localhost")
         qdrant_port = int(os.getenv("QDRANT_PORT", 6333))
+        qdrant_grpc_port = int(os.getenv("QDRANT_GRPC_PORT", 6334))
 
-        print(f"🌐 Database Mode: Client-Server ({qdrant_host}:{qdrant_port})")
-        self.client = QdrantClient(host=qdrant_host, port=qdrant_port)
+        # gRPC (HTTP/2, protobuf) for data-plane calls: less framing and JSON
+        # overhead per search/upsert than REST. REST port kept as fallback.
+        print(
+            f"🌐 Database Mode: Client-Server "
+            f"({qdrant_host}:{qdrant_grpc_port} gRPC, {qdrant_port} REST)"
+        )
+        self.client = QdrantClient(
+            host=qdrant_host,
+            port=qdrant_port,
+            grpc_port=qdrant_grpc_port,
+            prefer_grpc=True,
+        )
+        # Threshold `finalize_bulk_mode` puts back (None: nothing to restore)
+        self._bulk_restore_threshold: Optional[int] = None
 
         self._ensure_collection()
 
@@ -39,21 +244,135 @@ class VectorDatabase:
                 collection_name=self.collection_name,
                 vectors_config={
                     "text-dense": models.VectorParams(
-                        size=384, distance=models.Distance.COSINE
+                        size=384,
+                        # Qdrant L2-normalizes COSINE vectors once at upsert
+                        # and scores with a plain dot product, so DOT would
+                        # save nothing per comparison (FastEmbed output is
+                        # already unit-norm) and only break older collections.
+                        distance=models.Distance.COSINE,
+                        hnsw_config=DENSE_HNSW_CONFIG,
+                        # Originals (used only to rescore INT8 candidates)
+                        # stored at half precision: half the disk and page cache
+                        datatype=models.Datatype.FLOAT16,
+                        # ...and memory-mapped from disk: HNSW traversal only
+                        # touches the in-RAM INT8 copies (always_ram), so RAM
+                        # holds ~1/4 of the dense bytes plus the rescored pages
+                        on_disk=True,
                     )
                 },
                 sparse_vectors_config={
                     "text-sparse": models.SparseVectorParams(
-                        index=models.SparseIndexParams(on_disk=False)
+                        index=models.SparseIndexParams(on_disk=False),
+                        modifier=models.Modifier.IDF,
                     )
                 },
+                quantization_config=DENSE_QUANTIZATION,
             )
         else:
             print(f"✅ Collection '{self.collection_name}' ready.")
 
-    def upsert_chunks(self, chunks: List[Dict[str, Any]], video_id: str) -> None:
+        # One collection-info round-trip shared by the backfill checks
+        info = self.client.get_collection(self.collection_name)
+        self._ensure_payload_indexes(info)
+        self._ensure_sparse_idf(info)
+        self._ensure_dense_on_disk(info)
+
+    def _ensure_dense_on_disk(self, info: models.CollectionInfo) -> None:
+        """Backfills on-disk originals for collections created in RAM."""
+        vectors = info.config.params.vectors
+        dense_config = vectors.get("text-dense") if isinstance(vectors, dict) else None
+        if dense_config is None or dense_config.on_disk:
+            return
+
+        print("🛠️ Moving original 'text-dense' vectors on disk...")
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            vectors_config={"text-dense": models.VectorParamsDiff(on_disk=True)},
+        )
+
+    def _ensure_sparse_idf(self, info: models.CollectionInfo) -> None:
         """
-        Generates vectors and uploads them in batch.
+        BM25 vectors from FastEmbed carry only the term-frequency part; the
+        IDF factor is kept by Qdrant from its own index statistics, so it
+        never has to be computed (or shipped) client-side.
+        Also backfills collections created without the modifier.
+        """
+        sparse_config = (info.config.params.sparse_vectors or {}).get("text-sparse")
+        if sparse_config is None or sparse_config.modifier == models.Modifier.IDF:
+            return
+
+        print("🛠️ Enabling IDF on 'text-sparse'...")
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            sparse_vectors_config={
+                "text-sparse": models.SparseVectorParams(modifier=models.Modifier.IDF)
+            },
+        )
+
+    def _ensure_payload_indexes(self, info: models.CollectionInfo) -> None:
+        """
+        Payload indexes for the filterable fields (see PAYLOAD_INDEXES), so
+        filters are resolved from the index during HNSW traversal instead of
+        a payload scan. Also backfills collections created before an index.
+        """
+        existing = info.payload_schema or {}
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            if field_name in existing:
+                continue
+
+            print(f"🛠️ Creating payload index on '{field_name}'...")
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+            )
+
+    def prepare_bulk_mode(self) -> None:
+        """
+        Stops HNSW indexing for a bulk load: while the threshold is 0, the
+        optimizer builds no graph per incoming segment, so upserts don't
+        compete with embedding/OCR for CPU. Searches still work (unindexed
+        segments are scanned). Always pair with `finalize_bulk_mode`.
+        """
+        info = self.client.get_collection(self.collection_name)
+        threshold = info.config.optimizer_config.indexing_threshold
+        if threshold == 0:
+            # An overlapping load paused it and will restore the real value;
+            # restoring anything from here would clobber it mid-load
+            print("⏸️ Bulk mode: HNSW indexing already paused by another load.")
+            self._bulk_restore_threshold = None
+            return
+
+        self._bulk_restore_threshold = (
+            threshold if threshold is not None else DEFAULT_INDEXING_THRESHOLD
+        )
+        print("⏸️ Bulk mode: HNSW indexing paused.")
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0),
+        )
+
+    def finalize_bulk_mode(self) -> None:
+        """Restores indexing; Qdrant then builds the graph once over all points."""
+        threshold = self._bulk_restore_threshold
+        if threshold is None:
+            return
+
+        self._bulk_restore_threshold = None
+        print("▶️ Bulk mode off: HNSW indexing resumed.")
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=threshold),
+        )
+
+    def upsert_chunks(
+        self,
+        chunks: List[Dict[str, Any]],
+        video_id: str,
+        batch_size: int = UPSERT_BATCH_SIZE,
+    ) -> None:
+        """
+        Generates vectors and uploads them in batches of `batch_size` points.
         Handles polymorphism:
         - Audio Chunks: {'text': '...', 'start': 0.0, ...}
         - Visual Chunks: {'page_content': '...', 'metadata': {...}}
@@ -62,80 +381,451 @@ class VectorDatabase:
             print("⚠️ No chunks to upsert.")
             return
 
-        # --- 1. DATA NORMALIZATION ---
-        texts_to_vectorize = []
+        # --- 1. DATA NORMALIZATION + PAYLOAD CONSTRUCTION ---
+        texts_to_vectorize, payloads = self._prepare_chunks(chunks, video_id)
+
+        if not payloads:
+            print("⚠️ No chunks with text to upsert.")
+            return
+
+        print(f"🧠 Vectorizing {len(texts_to_vectorize)} chunks (Hybrid Mode)...")
+
+        # --- 2. EMBEDDING GENERATION ---
+        # One batched call per encoder.
+        dense_matrix, sparse_embeddings = self._embed_hybrid(texts_to_vectorize)
+
+        # --- 3. POINT ASSEMBLY ---
+        # Lazy: only one batch of list-boxed vectors is alive at a time
+        points = self._iter_points(payloads, video_id, dense_matrix, sparse_embeddings)
+
+        # --- 4. BATCHED UPLOAD ---
+        # Intermediate batches don't block on the server's WAL flush; only the
+        # last one waits, so every point is searchable once this returns.
+        total = len(payloads)
+        for offset in range(0, total, batch_size):
+            batch = list(islice(points, batch_size))
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=batch,
+                wait=offset + batch_size >= total,
+            )
+        _invalidate_search_results()
+        print(f"✅ Indexed {total} hybrid vectors for video {video_id}.")
+
+    def upsert_stream(
+        self,
+        chunks: Iterable[Dict[str, Any]],
+        video_id: str,
+        batch_size: int = EMBED_BATCH_SIZE,
+    ) -> int:
+        """
+        `upsert_chunks` for chunks that arrive over time (e.g. Whisper
+        segments as they are decoded). Every `batch_size` chunks are embedded
+        and uploaded on a worker thread while the producer keeps going, so
+        production overlaps with encoding + upload and memory stays O(batch).
+        Point ids match `upsert_chunks`, so either path overwrites the other.
+
+        Returns:
+            int: Number of points indexed.
+        """
+        chunk_iter = iter(chunks)
+        total = 0
+        # One batch held back so the last upload can be the one that waits
+        held: Optional[Tuple[List[str], List[Dict[str, Any]], int]] = None
+        in_flight: Optional[Future[None]] = None
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="upsert") as pool:
+            while batch := list(islice(chunk_iter, batch_size)):
+                texts, payloads = self._prepare_chunks(batch, video_id)
+                if not payloads:
+                    continue
+                if held is not None:
+                    if in_flight is not None:
+                        in_flight.result()
+                    in_flight = pool.submit(self._upload_batch, *held, video_id)
+                held = (texts, payloads, total)
+                total += len(payloads)
+
+            if in_flight is not None:
+                in_flight.result()
+        if held is None:
+            print("⚠️ No chunks with text to upsert.")
+            return 0
+
+        self._upload_batch(*held, video_id, wait=True)
+        _invalidate_search_results()
+        print(f"✅ Indexed {total} hybrid vectors for video {video_id}.")
+        return total
+
+    def _upload_batch(
+        self,
+        texts: List[str],
+        payloads: List[Dict[str, Any]],
+        start: int,
+        video_id: str,
+        wait: bool = False,
+    ) -> None:
+        """Embeds and upserts one batch; `start` is its first global chunk index."""
+        dense_matrix, sparse_embeddings = self._embed_hybrid(texts)
+        points = self._iter_points(
+            payloads, video_id, dense_matrix, sparse_embeddings, start
+        )
+        self.client.upsert(
+            collection_name=self.collection_name, points=list(points), wait=wait
+        )
+
+    def _prepare_chunks(
+        self, chunks: Iterable[Dict[str, Any]], video_id: str
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Single pass: each chunk's type is resolved once, producing the text
+        to encode and its payload side by side (parallel lists).
+        """
+        # Blank, None-text and malformed chunks are dropped here so they never
+        # reach the encoders (nor an AttributeError on .strip())
+        texts_to_vectorize: List[str] = []
+        payloads: List[Dict[str, Any]] = []
 
         for chunk in chunks:
             # Type A: Visual Chunk (LangChain style)
             if "page_content" in chunk:
-                texts_to_vectorize.append(chunk["page_content"])
+                text_content = chunk["page_content"]
+                if not (text_content and text_content.strip()):
+                    continue
+                meta = chunk["metadata"]
+                payload = {
+                    "video_id": video_id,
+                    "text": text_content,
+                    "type": "visual",  # <--- ESTO ES LA CLAVE
+                    "start": meta.get("timestamp", 0.0),
+                    # Duplicate-collapsed frames cover a time range
+                    "end": meta.get("end_timestamp", meta.get("timestamp", 0.0)),
+                    "frame_path": meta.get("frame_path", ""),  # <--- Y ESTO
+                }
             # Type B: Audio Chunk (Simple dict)
             elif "text" in chunk:
-                texts_to_vectorize.append(chunk["text"])
+                text_content = chunk["text"]
+                if not (text_content and text_content.strip()):
+                    continue
+                payload = {
+                    "video_id": video_id,
+                    "text": text_content,
+                    "type": "audio",
+                    "start": chunk.get("start", 0.0),
+                    "end": chunk.get("end", 0.0),
+                }
             else:
                 print(f"⚠️ Skipping malformed chunk keys: {chunk.keys()}")
-                texts_to_vectorize.append("")
+                continue
 
-        print(f"🧠 Vectorizing {len(texts_to_vectorize)} chunks (Hybrid Mode)...")
+            texts_to_vectorize.append(text_content)
+            payloads.append(payload)
 
-        # --- 2. EMBEDDING GENERATION ---
-        dense_embeddings = self.dense_model.encode(texts_to_vectorize)
-        sparse_embeddings = list(self.sparse_model.embed(texts_to_vectorize))
+        return texts_to_vectorize, payloads
 
-        points = []
+    def _embed_hybrid(self, texts: List[str]) -> Tuple[np.ndarray, List[SparseArrays]]:
+        """
+        Dense + sparse embeddings for `texts`, in order.
+        Texts embedded before (re-ingest, repeated slides) come from the
+        persistent cache; only the misses reach the encoders.
+        Dense runs on the encode pool while this thread does sparse.
+        """
+        dense_future = _ENCODE_EXECUTOR.submit(self._embed_dense_cached, texts)
+        sparse_embeddings = self._embed_sparse_cached(texts)
+        return dense_future.result(), sparse_embeddings
 
-        # --- 3. PAYLOAD CONSTRUCTION ---
-        for i, chunk in enumerate(chunks):
-            text_content = texts_to_vectorize[i]
-            if not text_content.strip():
-                continue
+    def _iter_points(
+        self,
+        payloads: List[Dict[str, Any]],
+        video_id: str,
+        dense_matrix: np.ndarray,
+        sparse_embeddings: List[SparseArrays],
+        start: int = 0,
+    ) -> Iterator[models.PointStruct]:
+        """
+        Yields one Qdrant point per payload, zipped with its vectors by index
+        (`start`: global index of the first payload, for the point id).
+        """
+        for i, payload in enumerate(payloads):
+            indices, values = sparse_embeddings[i]
+            # model_construct skips pydantic re-validating every float of
+            # vectors that are already plain lists (~2x faster per point).
+            # Raw ndarrays are NOT an option: the gRPC converter drops them.
+            yield models.PointStruct.model_construct(
+                id=self._point_id(video_id, start + i, payload),
+                payload=payload,
+                vector={
+                    "text-dense": dense_matrix[i].tolist(),
+                    "text-sparse": models.SparseVector.model_construct(
+                        indices=indices.tolist(), values=values.tolist()
+                    ),
+                },
+            )
 
-            # Base Payload
-            payload = {
-                "video_id": video_id,
-                "text": text_content,
-                "type": "unknown",  # Default
-            }
+    @staticmethod
+    def _point_id(video_id: str, index: int, payload: Dict[str, Any]) -> int:
+        """
+        Deterministic 64-bit point id. Re-ingesting a video overwrites its
+        points instead of duplicating them, and integer ids are cheaper to
+        store and send than UUID strings.
+        """
+        key = (
+            f"{video_id}|{payload['type']}|{index}|"
+            f"{float(payload.get('start', 0.0)):.3f}|{payload.get('frame_path', '')}"
+        )
+        return xxhash.xxh3_64_intdigest(key.encode("utf-8"))
 
-            # Map specific fields based on source type
-            if "page_content" in chunk:
-                # IS VISUAL
-                meta = chunk["metadata"]
-                payload["type"] = "visual"  # <--- ESTO ES LA CLAVE
-                payload["start"] = meta.get("timestamp", 0.0)
-                payload["end"] = meta.get("timestamp", 0.0)
-                payload["frame_path"] = meta.get("frame_path", "")  # <--- Y ESTO
+    def _embed_dense_cached(self, texts: List[str]) -> np.ndarray:
+        """Dense embeddings in input order, encoding only persistent-cache misses."""
+        if self.embedding_cache is None:
+            return self._embed_dense_bucketed(texts, self.embed_parallel)
 
-            elif "text" in chunk:
-                # IS AUDIO
-                payload["type"] = "audio"
-                payload["start"] = chunk.get("start", 0.0)
-                payload["end"] = chunk.get("end", 0.0)
-
-            points.append(
-                models.PointStruct(
-                    id=str(uuid.uuid4()),
-                    payload=payload,
-                    vector={
-                        "text-dense": dense_embeddings[i].tolist(),
-                        "text-sparse": models.SparseVector(
-                            indices=sparse_embeddings[i].indices.tolist(),
-                            values=sparse_embeddings[i].values.tolist(),
-                        ),
-                    },
-                )
-            )
+        vectors = self.embedding_cache.get_dense(self.dense_cache_key, texts)
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        if misses:
+            miss_texts = [texts[i] for i in misses]
+            fresh = self._embed_dense_bucketed(miss_texts, self.embed_parallel)
+            self.embedding_cache.put_dense(self.dense_cache_key, miss_texts, fresh)
+            for i, vector in zip(misses, fresh):
+                vectors[i] = vector
+        print(f"🗃️ Dense embedding cache: {len(texts) - len(misses)}/{len(texts)} hits")
+        return np.vstack([vector for vector in vectors if vector is not None])
+
+    def _embed_sparse_cached(self, texts: List[str]) -> List[SparseArrays]:
+        """BM25 (indices, values) in input order, encoding only cache misses."""
+        if self.embedding_cache is None:
+            return self._embed_sparse(texts)
+
+        vectors = self.embedding_cache.get_sparse(SPARSE_MODEL_ID, texts)
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        if misses:
+            miss_texts = [texts[i] for i in misses]
+            fresh = self._embed_sparse(miss_texts)
+            self.embedding_cache.put_sparse(SPARSE_MODEL_ID, miss_texts, fresh)
+            for i, vector in zip(misses, fresh):
+                vectors[i] = vector
+        return [vector for vector in vectors if vector is not None]
+
+    def _embed_sparse(self, texts: List[str]) -> List[SparseArrays]:
+        """
+        BM25 (indices, values) consumed straight off FastEmbed's generator and
+        narrowed to Qdrant's u32 / f32 (FastEmbed yields int64 / float64), so
+        the arrays held for the whole upsert take half the memory and match
+        what the persistent cache hands back on later runs.
+        """
+        return [
+            (embedding.indices.astype(np.uint32), embedding.values.astype(np.float32))
+            for embedding in self.sparse_model.embed(texts, batch_size=EMBED_BATCH_SIZE)
+        ]
+
+    def _embed_dense_bucketed(
+        self, texts: List[str], parallel: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Dense embeddings in input order, computed over length-sorted batches.
+        Each batch is padded to its longest member, so grouping short OCR
+        snippets apart from long transcript chunks avoids padded attention work.
+        `parallel` is forwarded to FastEmbed (its ordered map keeps the order).
+        """
+        embed_kwargs: Dict[str, Any] = {"batch_size": EMBED_BATCH_SIZE}
+        if parallel is not None:
+            embed_kwargs["parallel"] = parallel
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        sorted_vectors = np.vstack(
+            list(self.dense_model.embed([texts[i] for i in order], **embed_kwargs))
+        )
+        vectors = np.empty_like(sorted_vectors)
+        vectors[order] = sorted_vectors
+        return vectors
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Dense embedding of a query (shared by search and the semantic cache)."""
+        return self.encode_queries([query])[0]
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Dense embeddings for several queries, shape (len(queries), dim).
+        Cached queries are reused; all misses go through ONE batched,
+        length-sorted forward pass instead of one pass per question.
+        """
+        vectors: Dict[str, np.ndarray] = {}
+        misses = []
+        for query in dict.fromkeys(queries):
+            cached = self._cached_embedding((self.dense_model_id, query))
+            if cached is not None:
+                vectors[query] = cached
+            else:
+                misses.append(query)
+
+        if misses:
+            for query, vector in zip(misses, self._embed_dense_bucketed(misses)):
+                vectors[query] = vector
+                self._remember_embedding((self.dense_model_id, query), vector)
 
-        if points:
-            self.client.upsert(collection_name=self.collection_name, points=points)
-            print(f"✅ Indexed {len(points)} hybrid vectors for video {video_id}.")
+        return np.vstack([vectors[query] for query in queries])
+
+    def _encode_sparse_query(self, query: str) -> models.SparseVector:
+        """BM25 query vector, cached like the dense one."""
+        cache_key = (SPARSE_MODEL_ID, query)
+        cached = self._cached_embedding(cache_key)
+        if cached is not None:
+            return cached
+
+        # query_embed: unique terms at weight 1.0 (no TF/length normalization),
+        # which with the IDF modifier yields standard BM25 scoring
+        embedding = next(iter(self.sparse_model.query_embed(query)))
+        sparse = models.SparseVector(
+            indices=embedding.indices.tolist(), values=embedding.values.tolist()
+        )
+        self._remember_embedding(cache_key, sparse)
+        return sparse
+
+    # The query cache is touched from the encode pool and the RAG engine's
+    # worker threads at once, so reads and writes take a lock.
+    @staticmethod
+    def _cached_embedding(cache_key: Tuple[str, str]) -> Any:
+        with _QUERY_EMBEDDING_LOCK:
+            cached = _QUERY_EMBEDDING_CACHE.get(cache_key)
+            if cached is not None:
+                _QUERY_EMBEDDING_CACHE.move_to_end(cache_key)
+            return cached
+
+    @staticmethod
+    def _remember_embedding(cache_key: Tuple[str, str], value: Any) -> None:
+        with _QUERY_EMBEDDING_LOCK:
+            _QUERY_EMBEDDING_CACHE[cache_key] = value
+            if len(_QUERY_EMBEDDING_CACHE) > QUERY_EMBEDDING_CACHE_SIZE:
+                _QUERY_EMBEDDING_CACHE.popitem(last=False)
 
     def search(
-        self, query: str, limit: int = 5, video_id: Optional[str] = None
+        self,
+        query: str,
+        limit: int = 5,
+        video_id: Optional[str] = None,
+        query_vector: Optional[np.ndarray] = None,
+        score_threshold: Optional[float] = None,
     ) -> List[Dict[str, Any]]:
-        query_dense = self.dense_model.encode(query).tolist()
-        query_sparse = list(self.sparse_model.embed([query]))[0]
+        """
+        Hybrid (Dense + Sparse, RRF) search.
+        Pass `query_vector` to reuse a dense embedding computed by the caller.
+        `score_threshold` is a minimum cosine for dense candidates; it is not
+        applied to the fused result because RRF scores are rank-based.
+        """
+        cache_key = self._search_cache_key(query, limit, video_id, score_threshold)
+        cached = self._cached_search(cache_key)
+        if cached is not None:
+            return cached
+
+        if query_vector is None:
+            # Dense on the encode pool, BM25 on this thread
+            dense_future = _ENCODE_EXECUTOR.submit(self.encode_query, query)
+            query_sparse = self._encode_sparse_query(query)
+            query_vector = dense_future.result()
+        else:
+            query_sparse = self._encode_sparse_query(query)
+
+        search_result = self.client.query_points(
+            collection_name=self.collection_name,
+            prefetch=self._hybrid_prefetch(
+                query_vector, query_sparse, limit, video_id, score_threshold
+            ),
+            query=models.RrfQuery(rrf=models.Rrf(weights=self.rrf_weights)),
+            limit=limit,
+            with_payload=models.PayloadSelectorInclude(include=_PAYLOAD_FIELDS),
+            with_vectors=False,
+        )
+        results: List[Dict[str, Any]] = [hit.payload for hit in search_result.points]
+        self._remember_search(cache_key, results)
+        return list(results)
+
+    def search_many(
+        self,
+        queries: List[str],
+        limit: int = 5,
+        video_id: Optional[str] = None,
+        query_vectors: Optional[np.ndarray] = None,
+        score_threshold: Optional[float] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Hybrid search for several queries in ONE Qdrant round-trip
+        (query_batch_points), results aligned with `queries`.
+        Cached results are reused; only the misses are sent. Pass
+        `query_vectors` (one row per query) to reuse dense embeddings.
+        """
+        results: List[Optional[List[Dict[str, Any]]]] = []
+        misses: List[int] = []
+        for i, query in enumerate(queries):
+            cached = self._cached_search(
+                self._search_cache_key(query, limit, video_id, score_threshold)
+            )
+            results.append(cached)
+            if cached is None:
+                misses.append(i)
 
+        if misses:
+            if query_vectors is None:
+                miss_queries = [queries[i] for i in misses]
+                dense_future = _ENCODE_EXECUTOR.submit(
+                    self.encode_queries, miss_queries
+                )
+                sparse = [self._encode_sparse_query(q) for q in miss_queries]
+                dense = dense_future.result()
+            else:
+                sparse = [self._encode_sparse_query(queries[i]) for i in misses]
+                dense = np.asarray(query_vectors)[misses]
+
+            requests = [
+                models.QueryRequest(
+                    prefetch=self._hybrid_prefetch(
+                        dense[j], sparse[j], limit, video_id, score_threshold
+                    ),
+                    query=models.RrfQuery(rrf=models.Rrf(weights=self.rrf_weights)),
+                    limit=limit,
+                    with_payload=models.PayloadSelectorInclude(include=_PAYLOAD_FIELDS),
+                    with_vector=False,
+                )
+                for j in range(len(misses))
+            ]
+            responses = self.client.query_batch_points(
+                collection_name=self.collection_name, requests=requests
+            )
+            for i, response in zip(misses, responses):
+                payloads = [hit.payload or {} for hit in response.points]
+                self._remember_search(
+                    self._search_cache_key(
+                        queries[i], limit, video_id, score_threshold
+                    ),
+                    payloads,
+                )
+                results[i] = list(payloads)
+
+        return [result or [] for result in results]
+
+    def _search_cache_key(
+        self,
+        query: str,
+        limit: int,
+        video_id: Optional[str],
+        score_threshold: Optional[float],
+    ) -> Tuple[Any, ...]:
+        return (
+            self.collection_name,
+            self.dense_model_id,
+            query,
+            limit,
+            video_id,
+            score_threshold,
+        )
+
+    @staticmethod
+    def _hybrid_prefetch(
+        query_vector: np.ndarray,
+        query_sparse: models.SparseVector,
+        limit: int,
+        video_id: Optional[str],
+        score_threshold: Optional[float],
+    ) -> List[models.Prefetch]:
+        """Dense + sparse candidate sets (2x limit each) fused by weighted RRF."""
         # Construct Filter if video_id provided
         query_filter = None
         if video_id:
@@ -147,26 +837,45 @@ class VectorDatabase:
                 ]
             )
 
-        search_result = self.client.query_points(
-            collection_name=self.collection_name,
-            prefetch=[
-                models.Prefetch(
-                    query=query_dense,
-                    using="text-dense",
-                    limit=limit * 2,
-                    filter=query_filter,
-                ),
-                models.Prefetch(
-                    query=models.SparseVector(
-                        indices=query_sparse.indices.tolist(),
-                        values=query_sparse.values.tolist(),
-                    ),
-                    using="text-sparse",
-                    limit=limit * 2,
-                    filter=query_filter,
-                ),
-            ],
-            query=models.FusionQuery(fusion=models.Fusion.RRF),
-            limit=limit,
-        )
-        return [hit.payload for hit in search_result.points]
+        return [
+            models.Prefetch(
+                query=query_vector.tolist(),
+                using="text-dense",
+                limit=limit * 2,
+                filter=query_filter,
+                params=DENSE_SEARCH_PARAMS,
+                score_threshold=score_threshold,
+            ),
+            models.Prefetch(
+                query=query_sparse,
+                using="text-sparse",
+                limit=limit * 2,
+                filter=query_filter,
+            ),
+        ]
+
+    @staticmethod
+    def _cached_search(cache_key: Tuple[Any, ...]) -> Optional[List[Dict[str, Any]]]:
+        with _SEARCH_RESULT_LOCK:
+            entry = _SEARCH_RESULT_CACHE.get(cache_key)
+            if entry is None:
+                return None
+            expires_at, results = entry
+            if expires_at < time.monotonic():
+                del _SEARCH_RESULT_CACHE[cache_key]
+                return None
+            _SEARCH_RESULT_CACHE.move_to_end(cache_key)
+            # Shallow copy: callers may reorder/filter their list
+            return list(results)
+
+    @staticmethod
+    def _remember_search(
+        cache_key: Tuple[Any, ...], results: List[Dict[str, Any]]
+    ) -> None:
+        with _SEARCH_RESULT_LOCK:
+            _SEARCH_RESULT_CACHE[cache_key] = (
+                time.monotonic() + SEARCH_RESULT_TTL_S,
+                results,
+            )
+            if len(_SEARCH_RESULT_CACHE) > SEARCH_RESULT_CACHE_SIZE:
+                _SEARCH_RESULT_CACHE.popitem(last=False)
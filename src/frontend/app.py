@@ -1,8 +1,13 @@
 import streamlit as st
-import uuid
+import streamlit.components.v1 as components
 import os
+import subprocess
 import sys
 import yt_dlp
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Tuple
 
 # --- PATH CONFIGURATION ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -11,11 +16,14 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 # --- IMPORTS ---
-# Añadimos '# noqa: E402' para decir al linter: "Ignora esto, sé lo que hago"
-from src.core.transcriber import VideoTranscriber  # noqa: E402
-from src.database.vector_store import VectorDatabase  # noqa: E402
-from src.core.rag_engine import RAGEngine  # noqa: E402
-from src.services.visual_ingestion import VisualIngestionService  # noqa: E402
+# The core modules (Whisper, FastEmbed/ONNX, Qdrant, OpenCV, OpenAI; ~2 s of
+# imports) are imported lazily inside the cached factories below, so the UI
+# renders before they load. Names here are for type annotations only.
+if TYPE_CHECKING:
+    from src.core.transcriber import VideoTranscriber
+    from src.database.vector_store import VectorDatabase
+    from src.core.rag_engine import RAGEngine
+    from src.services.visual_ingestion import VisualIngestionService
 
 # --- CONFIGURATION ---
 st.set_page_config(
@@ -29,15 +37,38 @@ st.set_page_config(
 # --- HELPER FUNCTIONS ---
 def format_time(seconds: float) -> str:
     """Converts seconds to MM:SS format."""
-    minutes = int(seconds // 60)
-    secs = int(seconds % 60)
+    # Labels only depend on the whole second, so float starts share entries
+    return _format_whole_seconds(int(seconds))
+
+
+@lru_cache(maxsize=4096)
+def _format_whole_seconds(seconds: int) -> str:
+    minutes, secs = divmod(seconds, 60)
     return f"{minutes:02d}:{secs:02d}"
 
 
+@st.cache_data(show_spinner=False, ttl=3600)
+def load_frame_preview(frame_path: str) -> Optional[bytes]:
+    """
+    Bytes of the frame's WebP thumbnail (written by VisualIngestionService),
+    falling back to the full frame for sources indexed before thumbnails.
+    Cached, so history reruns don't hit the disk per visual source.
+    """
+    thumb_path = os.path.splitext(frame_path)[0] + ".thumb.webp"
+    for path in (thumb_path, frame_path):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+    return None
+
+
+@st.cache_data(show_spinner=False, ttl=3600)
 def download_video_files(url: str, video_id: str) -> tuple[str, str, str]:
     """
     Downloads BOTH Video (.mp4) and Audio (.mp3).
     Includes Anti-Bot measures.
+    Cached per (url, video_id) for an hour; on a cold cache, a title sidecar
+    next to an existing MP4 still skips the YouTube metadata request.
     """
     video_dir = "data/videos"
     audio_dir = "data/tmp"
@@ -67,31 +98,30 @@ def download_video_files(url: str, video_id: str) -> tuple[str, str, str]:
         "outtmpl": video_path,
     }
 
-    # 2. Download Audio (MP3)
+    # 2. Audio (MP3) is extracted locally from the MP4's own audio track
     audio_path = f"{audio_dir}/{video_id}.mp3"
-    ydl_opts_audio = {
-        **common_opts,
-        "format": "bestaudio/best",
-        "postprocessors": [
-            {
-                "key": "FFmpegExtractAudio",
-                "preferredcodec": "mp3",
-                "preferredquality": "192",
-            }
-        ],
-        "outtmpl": f"{audio_dir}/{video_id}.%(ext)s",
-    }
+
+    # Sidecar: "<url>\n<title>". The URL is checked because web downloads
+    # all share one video_id, so the MP4 on disk may belong to another video.
+    title_path = f"{video_dir}/{video_id}.title"
+    title = None
+    if os.path.exists(video_path) and os.path.exists(title_path):
+        with open(title_path, encoding="utf-8") as f:
+            cached_url, _, cached_title = f.read().partition("\n")
+        if cached_url == url:
+            title = cached_title
 
     try:
-        with yt_dlp.YoutubeDL(ydl_opts_video) as ydl:
-            if not os.path.exists(video_path):
-                ydl.download([url])
-            info = ydl.extract_info(url, download=False)
-            title = info.get("title", "Video")
+        if title is None:
+            with yt_dlp.YoutubeDL(ydl_opts_video) as ydl:
+                # One extractor call for metadata + download (no second round-trip)
+                info = ydl.extract_info(url, download=not os.path.exists(video_path))
+                title = info.get("title", "Video")
+            with open(title_path, "w", encoding="utf-8") as f:
+                f.write(f"{url}\n{title}")
 
-        with yt_dlp.YoutubeDL(ydl_opts_audio) as ydl:
-            if not os.path.exists(audio_path):
-                ydl.download([url])
+        if not os.path.exists(audio_path):
+            extract_audio(video_path, audio_path)
 
         return video_path, audio_path, title
 
@@ -99,24 +129,216 @@ def download_video_files(url: str, video_id: str) -> tuple[str, str, str]:
         raise e
 
 
+def extract_audio(video_path: str, audio_path: str) -> None:
+    """
+    Transcodes the MP4's audio track to MP3 with ffmpeg (already required by
+    yt-dlp to merge streams) instead of fetching the audio from YouTube again.
+    """
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-y",
+            "-loglevel",
+            "error",
+            "-i",
+            video_path,
+            "-vn",
+            "-codec:a",
+            "libmp3lame",
+            "-b:a",
+            "192k",
+            audio_path,
+        ],
+        check=True,
+    )
+
+
+def file_signature(path: str) -> Tuple[int, int]:
+    """(size, mtime_ns): changes whenever the file is rewritten."""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+# Persisted to disk (pickled under ~/.streamlit/cache) so a server restart
+# or a page refresh doesn't redo OCR on an unchanged file. Streamlit ignores
+# ttl for persisted caches, so it is bounded by entry count. Transcripts use
+# VideoTranscriber's own disk cache instead (see `get_transcriber`).
+@st.cache_data(show_spinner=False, persist="disk", max_entries=32)
+def process_video_cached(
+    _visual_service: "VisualIngestionService",
+    video_path: str,
+    video_id: str,
+    file_sig: Tuple[int, int],
+    interval: int,
+) -> List[Dict[str, Any]]:
+    """Re-processing an unchanged video skips frame extraction + OCR entirely."""
+    return _visual_service.process_video(video_path, video_id, interval=interval)
+
+
+def index_audio(
+    transcriber: "VideoTranscriber",
+    db: "VectorDatabase",
+    audio_path: str,
+    video_id: str,
+) -> list[dict[str, Any]]:
+    """Whisper + audio upsert; runs off the script thread (no st.* calls here)."""
+    # Unchanged audio (same bytes + Whisper settings) skips Whisper entirely
+    audio_chunks = transcriber.transcribe_cached(audio_path)
+    db.upsert_chunks(audio_chunks, video_id)
+    return audio_chunks
+
+
+@st.cache_resource(show_spinner=False)
+def get_transcriber() -> "VideoTranscriber":
+    """Whisper weights are loaded once per process, not on every ingest click."""
+    from src.core.transcriber import VideoTranscriber
+
+    # Always cache transcripts in the app, like the OCR pass below
+    return VideoTranscriber(transcript_cache=True)
+
+
+@st.cache_resource(show_spinner=False)
+def get_visual_service() -> "VisualIngestionService":
+    """Keeps the RapidOCR ONNX sessions alive across reruns."""
+    from src.services.visual_ingestion import VisualIngestionService
+
+    return VisualIngestionService()
+
+
+@st.cache_resource(show_spinner=False)
+def get_vector_db() -> "VectorDatabase":
+    """Shared across reruns and sessions (Qdrant client + loaded encoders)."""
+    from src.database.vector_store import VectorDatabase
+
+    return VectorDatabase()
+
+
+@st.cache_resource(show_spinner=False)
+def get_rag_engine() -> "RAGEngine":
+    """Built once per process; avoids re-warming models on every question."""
+    from src.core.rag_engine import RAGEngine
+
+    return RAGEngine()
+
+
+# Runs once per seek: the iframe is only rendered on the rerun that follows
+# the click, so each seek mounts (and executes) a fresh copy.
+SEEK_SCRIPT = """<script>
+const video = window.parent.document.querySelector(
+  '[data-testid="stSidebar"] video'
+);
+if (video) {{
+  video.currentTime = {seconds};
+  video.play().catch(() => {{}});
+}}
+</script>"""
+
+# Messages drawn on every rerun; older ones sit behind a toggle
+HISTORY_WINDOW = 50
+
 # --- SESSION STATE ---
 if "video_start_time" not in st.session_state:
     st.session_state.video_start_time = 0
 if "should_autoplay" not in st.session_state:
     st.session_state.should_autoplay = False
 if "video_key" not in st.session_state:
-    st.session_state.video_key = str(uuid.uuid4())
+    st.session_state.video_key = 0
+if "pending_seek" not in st.session_state:
+    st.session_state.pending_seek = False
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "full_transcript" not in st.session_state:
     st.session_state.full_transcript = ""
 
 
+@st.fragment
+def transcript_viewer() -> None:
+    """
+    Own rerun scope: toggling it doesn't rerun the whole app, and the
+    (potentially hundreds of KB) transcript is only sent to the browser
+    while shown instead of inside a collapsed expander on every rerun.
+    """
+    if st.toggle("📄 Ver Transcripción", key="show_transcript"):
+        st.text_area("Texto Completo", st.session_state.full_transcript, height=400)
+
+
 def seek_video(seconds):
+    # Runs as an on_click callback, i.e. before the rerun the click already
+    # triggers, so no extra st.rerun() pass over the whole script is needed.
     st.session_state.video_start_time = int(seconds)
-    st.session_state.video_key = str(uuid.uuid4())
+    st.session_state.pending_seek = True
     st.session_state.should_autoplay = True
-    st.rerun()
+
+
+class Sources(NamedTuple):
+    """
+    Column layout of an answer's sources as kept in the chat history: only the
+    fields the grid renders, instead of one full payload dict per source.
+    """
+
+    starts: "array[float]"
+    # Display strings, truncated once here rather than sliced on every rerun
+    labels: Tuple[str, ...]
+    types: Tuple[str, ...]
+    frame_paths: Tuple[Optional[str], ...]
+    # Seek-button widget keys, built once per message instead of per rerun
+    button_keys: Tuple[str, ...]
+
+
+def _source_label(source: Dict[str, Any]) -> str:
+    text = source.get("text", "")
+    if source.get("type", "audio") == "visual":
+        return text[:60] + "..."
+    return f'"{text[:80]}..."'
+
+
+def pack_sources(sources: List[Dict[str, Any]], message_index: int) -> Sources:
+    """
+    Args:
+        sources (List[Dict]): Segments returned by the RAG engine.
+        message_index (int): Position of the answer in the chat history; the
+            button keys derive from it, so they stay the same between the
+            answer's first render and later history renders.
+    """
+    return Sources(
+        starts=array("d", (float(s["start"]) for s in sources)),
+        labels=tuple(_source_label(s) for s in sources),
+        types=tuple(s.get("type", "audio") for s in sources),
+        frame_paths=tuple(s.get("frame_path") for s in sources),
+        button_keys=tuple(
+            sys.intern(f"src_btn_{message_index}_{j}") for j in range(len(sources))
+        ),
+    )
+
+
+def render_sources(sources: Sources, caption: str) -> None:
+    """Source grid shared by the chat history and the freshly generated answer."""
+    st.divider()
+    st.caption(caption)
+    cols = st.columns(3)
+    for j, (start, label, source_type, frame_path, button_key) in enumerate(
+        zip(*sources)
+    ):
+        with cols[j % 3]:
+            time_label = format_time(start)
+
+            if source_type == "visual":
+                st.markdown(f"**📸 Visual ({time_label})**")
+                preview = load_frame_preview(frame_path) if frame_path else None
+                if preview:
+                    st.image(preview, use_container_width=True)
+                st.code(label, language="text")
+            else:
+                st.markdown(f"**🎙️ Audio ({time_label})**")
+                st.info(label)
+
+            st.button(
+                f"▶ Ir al min {time_label}",
+                key=button_key,
+                use_container_width=True,
+                on_click=seek_video,
+                args=(start,),
+            )
 
 
 # --- MAIN LAYOUT ---
@@ -140,9 +362,9 @@ with st.sidebar:
                 "🏗️ Iniciando Pipeline Multimodal...", expanded=True
             ) as status:
                 # A. SETUP
-                transcriber = VideoTranscriber()
-                visual_service = VisualIngestionService()
-                db = VectorDatabase()
+                transcriber = get_transcriber()
+                visual_service = get_visual_service()
+                db = get_vector_db()
 
                 if input_id.startswith("http"):
                     target_url = input_id
@@ -167,37 +389,51 @@ with st.sidebar:
                     st.error(f"No encuentro {video_path} o {audio_path}.")
                     st.stop()
 
-                # C. AUDIO PROCESSING
-                status.write("🎙️ Transcribiendo Audio (Whisper)...")
-                audio_chunks = transcriber.transcribe(audio_path)
-                st.session_state.full_transcript = " ".join(
-                    [s["text"] for s in audio_chunks]
-                )
+                # C. AUDIO PROCESSING (background)
+                # Whisper + audio upsert run on a worker thread while this
+                # thread does the OCR pass, so the two pipelines overlap
+                # instead of adding up. st.* calls stay on the script thread.
+                status.write("🎙️ Transcribiendo Audio (Whisper) en segundo plano...")
+                with ThreadPoolExecutor(max_workers=1) as audio_pool:
+                    audio_future = audio_pool.submit(
+                        index_audio, transcriber, db, audio_path, process_id
+                    )
+
+                    # D. VISUAL PROCESSING
+                    status.write("👁️ Analizando Vídeo (OCR / Pantalla)...")
+                    # Interval 5s for HIGH RESOLUTION scanning
+                    # (Fixes the missed code issue)
+                    visual_chunks = process_video_cached(
+                        visual_service,
+                        video_path,
+                        process_id,
+                        file_signature(video_path),
+                        interval=5,
+                    )
+
+                    if visual_chunks:
+                        status.write(
+                            f"💾 Guardando {len(visual_chunks)} "
+                            "fragmentos visuales en Qdrant..."
+                        )
+                        db.upsert_chunks(visual_chunks, process_id)
+                    else:
+                        status.write("⚠️ No se detectó texto relevante en el vídeo.")
+
+                    audio_chunks = audio_future.result()
 
                 status.write(
-                    f"💾 Guardando {len(audio_chunks)} fragmentos de audio en Qdrant..."
+                    f"💾 {len(audio_chunks)} fragmentos de audio guardados en Qdrant."
                 )
-                db.upsert_chunks(audio_chunks, process_id)
-
-                # D. VISUAL PROCESSING
-                status.write("👁️ Analizando Vídeo (OCR / Pantalla)...")
-                # Interval 5s for HIGH RESOLUTION scanning (Fixes the missed code issue)
-                visual_chunks = visual_service.process_video(
-                    video_path, process_id, interval=5
+                # Joined once per ingest and kept as one immutable str
+                st.session_state.full_transcript = " ".join(
+                    s["text"] for s in audio_chunks
                 )
 
-                if visual_chunks:
-                    status.write(
-                        f"💾 Guardando {len(visual_chunks)} fragmentos visuales en Qdrant..."
-                    )
-                    db.upsert_chunks(visual_chunks, process_id)
-                else:
-                    status.write("⚠️ No se detectó texto relevante en el vídeo.")
-
                 status.update(
                     label="✅ Ingesta Multimodal Completada", state="complete"
                 )
-                st.session_state.video_key = str(uuid.uuid4())
+                st.session_state.video_key += 1
 
         else:
             st.error("Por favor, introduce una URL o ID.")
@@ -218,12 +454,26 @@ with st.sidebar:
 
         st.subheader("Reproductor")
         if player_source:
-            with st.container(key=st.session_state.video_key):
+            # Local files are seeked in the browser on the mounted <video>;
+            # a remount (new container key) would re-fetch and re-buffer the
+            # whole MP4. Remote embeds have no JS handle, so they remount.
+            seek_in_place = (
+                st.session_state.pending_seek and player_source == video_file_path
+            )
+            if st.session_state.pending_seek and not seek_in_place:
+                st.session_state.video_key += 1
+            with st.container(key=f"player_{st.session_state.video_key}"):
                 st.video(
                     player_source,
                     start_time=st.session_state.video_start_time,
                     autoplay=st.session_state.should_autoplay,
                 )
+            if seek_in_place:
+                components.html(
+                    SEEK_SCRIPT.format(seconds=st.session_state.video_start_time),
+                    height=0,
+                )
+            st.session_state.pending_seek = False
         else:
             st.info("Esperando vídeo...")
 
@@ -231,42 +481,26 @@ with st.sidebar:
             st.session_state.should_autoplay = False
 
     if st.session_state.full_transcript:
-        with st.expander("📄 Ver Transcripción"):
-            st.text_area("Texto Completo", st.session_state.full_transcript, height=400)
+        transcript_viewer()
 
 # 2. MAIN CHAT AREA
 st.title("🧠 Asistente Multimodal")
 
-for i, message in enumerate(st.session_state.messages):
+# Only the tail of a long conversation is rendered on each rerun; the rest
+# stays in session_state and is drawn on demand.
+history = st.session_state.messages
+hidden = max(0, len(history) - HISTORY_WINDOW)
+if hidden and not st.toggle(
+    f"📜 Mostrar {hidden} mensajes anteriores", key="show_older_messages"
+):
+    history = history[hidden:]
+
+for message in history:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
-        if "sources" in message and message["sources"]:
-            st.divider()
-            st.caption("🔍 Fuentes Consultadas:")
-            cols = st.columns(3)
-            for j, seg in enumerate(message["sources"]):
-                col = cols[j % 3]
-                with col:
-                    time_label = format_time(seg["start"])
-                    source_type = seg.get("type", "audio")
-
-                    if source_type == "visual":
-                        st.markdown(f"**📸 Visual ({time_label})**")
-                        frame_path = seg.get("frame_path")
-                        if frame_path and os.path.exists(frame_path):
-                            st.image(frame_path, use_container_width=True)
-                        st.code(seg.get("text", "")[:60] + "...", language="text")
-                    else:
-                        st.markdown(f"**🎙️ Audio ({time_label})**")
-                        st.info(f"\"{seg.get('text', '')[:80]}...\"")
-
-                    if st.button(
-                        f"▶ Ir al min {time_label}",
-                        key=f"hist_btn_{i}_{j}",
-                        use_container_width=True,
-                    ):
-                        seek_video(seg["start"])
+        if message.get("sources"):
+            render_sources(message["sources"], "🔍 Fuentes Consultadas:")
 
 # Chat Input
 if prompt := st.chat_input("Pregunta sobre el vídeo..."):
@@ -284,41 +518,17 @@ if prompt := st.chat_input("Pregunta sobre el vídeo..."):
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        engine = RAGEngine()
+        engine = get_rag_engine()
         with st.chat_message("assistant"):
             with st.spinner("🧠 Cerebro Multimodal Pensando..."):
                 answer, sources = engine.answer_question(prompt, query_id)
                 st.markdown(answer)
 
-                if sources:
-                    st.divider()
-                    st.caption("🔍 Fuentes encontradas:")
-                    cols = st.columns(3)
-                    for j, seg in enumerate(sources):
-                        col = cols[j % 3]
-                        with col:
-                            time_label = format_time(seg["start"])
-                            source_type = seg.get("type", "audio")
-
-                            if source_type == "visual":
-                                st.markdown(f"**📸 Visual ({time_label})**")
-                                frame_path = seg.get("frame_path")
-                                if frame_path and os.path.exists(frame_path):
-                                    st.image(frame_path, use_container_width=True)
-                                st.code(
-                                    seg.get("text", "")[:60] + "...", language="text"
-                                )
-                            else:
-                                st.markdown(f"**🎙️ Audio ({time_label})**")
-                                st.info(f"\"{seg.get('text', '')[:80]}...\"")
-
-                            if st.button(
-                                f"▶ Ir al min {time_label}",
-                                key=f"new_btn_{j}",
-                                use_container_width=True,
-                            ):
-                                seek_video(seg["start"])
+                message_index = len(st.session_state.messages)
+                packed = pack_sources(sources, message_index) if sources else None
+                if packed:
+                    render_sources(packed, "🔍 Fuentes encontradas:")
 
         st.session_state.messages.append(
-            {"role": "assistant", "content": answer, "sources": sources}
+            {"role": "assistant", "content": answer, "sources": packed}
         )
@@ -1,6 +1,7 @@
 import os
 import argparse
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 # Pointing to the correct location in src/core
 from src.core.transcriber import VideoTranscriber
@@ -14,26 +15,14 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def main(video_url: str, video_id: str):
-    """
-    Main Orchestration Pipeline for Multimodal RAG Ingestion.
-    """
-    logger.info(f"🚀 STARTING MULTIMODAL INGESTION PIPELINE FOR: {video_id}")
-
-    # 1. Initialize Components
-    transcriber = VideoTranscriber()
-    visual_service = VisualIngestionService()
-    db = VectorDatabase()
-
-    # Define Paths
-    video_path = f"data/videos/{video_id}.mp4"
-    audio_path = f"data/tmp/{video_id}.mp3"
-
-    # Ensure directories exist
-    os.makedirs("data/videos", exist_ok=True)
-    os.makedirs("data/tmp", exist_ok=True)
-
-    # --- PHASE 1: AUDIO PROCESSING ---
+def run_audio_phase(
+    transcriber: VideoTranscriber,
+    db: VectorDatabase,
+    video_url: str,
+    video_id: str,
+    audio_path: str,
+) -> None:
+    """Download -> Whisper -> Qdrant for the audio track."""
     logger.info("\n--- 🔊 PHASE 1: AUDIO PROCESSING ---")
 
     # A. Download Audio
@@ -56,40 +45,80 @@ def main(video_url: str, video_id: str):
     else:
         logger.info("⏩ Audio file already exists. Skipping download.")
 
-    # B. Transcribe Audio
-    logger.info(f"🎙️ Transcribing audio from {audio_path}...")
+    # B. Transcribe + Index Audio, fused: segments are embedded and upserted
+    # in batches while Whisper keeps decoding the rest of the file.
+    logger.info(f"🎙️ Transcribing and indexing audio from {audio_path}...")
     try:
         # Now it will definitely find the file
-        audio_chunks = transcriber.transcribe(audio_path)
-        logger.info(f"✅ Generated {len(audio_chunks)} audio segments.")
-
-        # C. Index Audio
-        logger.info("💾 Indexing Audio Chunks into Qdrant...")
-        db.upsert_chunks(audio_chunks, video_id)
+        audio_chunks = transcriber.transcribe_stream_cached(audio_path)
+        indexed = db.upsert_stream(audio_chunks, video_id)
+        logger.info(f"✅ Indexed {indexed} audio segments into Qdrant.")
     except Exception as e:
         logger.error(f"❌ Audio processing failed: {e}")
 
-    # --- PHASE 2: VISUAL PROCESSING ---
-    logger.info("\n--- 👁️ PHASE 2: VISUAL PROCESSING ---")
 
-    if os.path.exists(video_path):
-        logger.info(f"🎞️ Processing video file: {video_path}")
-        try:
-            visual_chunks = visual_service.process_video(
-                video_path, video_id, interval=30
-            )
+def run_visual_phase(
+    visual_service: VisualIngestionService,
+    db: VectorDatabase,
+    video_path: str,
+    video_id: str,
+) -> None:
+    """Frames -> OCR -> Qdrant for the video track."""
+    logger.info("\n--- 👁️ PHASE 2: VISUAL PROCESSING ---")
 
-            if visual_chunks:
-                logger.info(f"✅ Generated {len(visual_chunks)} visual chunks.")
-                logger.info("💾 Indexing Visual Chunks into Qdrant...")
-                db.upsert_chunks(visual_chunks, video_id)
-            else:
-                logger.warning("⚠️ No text found in video frames.")
-        except Exception as e:
-            logger.error(f"❌ Visual processing failed: {e}")
-    else:
+    if not os.path.exists(video_path):
         logger.warning(f"⚠️ VIDEO FILE NOT FOUND: {video_path}")
         logger.warning("Skipping visual ingestion.")
+        return
+
+    logger.info(f"🎞️ Processing video file: {video_path}")
+    try:
+        visual_chunks = visual_service.process_video(video_path, video_id, interval=30)
+
+        if visual_chunks:
+            logger.info(f"✅ Generated {len(visual_chunks)} visual chunks.")
+            logger.info("💾 Indexing Visual Chunks into Qdrant...")
+            db.upsert_chunks(visual_chunks, video_id)
+        else:
+            logger.warning("⚠️ No text found in video frames.")
+    except Exception as e:
+        logger.error(f"❌ Visual processing failed: {e}")
+
+
+def main(video_url: str, video_id: str):
+    """
+    Main Orchestration Pipeline for Multimodal RAG Ingestion.
+    """
+    logger.info(f"🚀 STARTING MULTIMODAL INGESTION PIPELINE FOR: {video_id}")
+
+    # 1. Initialize Components
+    transcriber = VideoTranscriber()
+    visual_service = VisualIngestionService()
+    db = VectorDatabase()
+
+    # Define Paths
+    video_path = f"data/videos/{video_id}.mp4"
+    audio_path = f"data/tmp/{video_id}.mp3"
+
+    # Ensure directories exist
+    os.makedirs("data/videos", exist_ok=True)
+    os.makedirs("data/tmp", exist_ok=True)
+
+    # No HNSW rebuilds while both phases upsert; the graph is built once at
+    # the end (in `finally`, so a crash never leaves indexing switched off).
+    db.prepare_bulk_mode()
+    try:
+        # 2. Both phases share no data: the audio phase (download + Whisper,
+        # the longest stage) runs on a worker thread while this thread does
+        # the frames/OCR pass, so the total is max(audio, visual), not the sum.
+        with ThreadPoolExecutor(max_workers=1) as audio_pool:
+            audio_future = audio_pool.submit(
+                run_audio_phase, transcriber, db, video_url, video_id, audio_path
+            )
+            run_visual_phase(visual_service, db, video_path, video_id)
+            audio_future.result()
+    finally:
+        db.finalize_bulk_mode()
 
     logger.info(f"\n✅ PIPELINE FINISHED FOR {video_id}")
 
@@ -1,10 +1,19 @@
 import os
 import logging
-import re
-from typing import List, Dict, Any
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+import cv2
+import numpy as np
 
 # Import existing components
-from src.video_processing.frame_extractor import extract_frames
+from src.video_processing.frame_extractor import (
+    JPEG_PARAMS,
+    frame_filename,
+    frames_dir,
+    iter_distinct_frames,
+)
 from src.video_processing.ocr_service import OCRService
 
 # Configure logging
@@ -13,12 +22,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# UI preview for visual sources: the chat renders them three per row, so a
+# 320px-wide WebP is legible there while being a fraction of the full JPEG.
+THUMBNAIL_MAX_SIZE = (320, 180)
+THUMBNAIL_SUFFIX = ".thumb.webp"
+THUMBNAIL_WEBP_QUALITY = 60
+
 
 class VisualIngestionService:
     """
     Orchestrator service that manages the full visual indexing pipeline:
-    1. Extracts frames from video.
-    2. Runs OCR on frames.
+    1. Extracts frames from video (in memory).
+    2. Runs OCR on frames; only frames with text are saved to disk.
     3. Structures data for Qdrant ingestion.
     """
 
@@ -26,12 +41,24 @@ class VisualIngestionService:
         """
         Initializes the service with necessary sub-components.
         """
-        self.ocr_service = OCRService()
+        # Frames are OCR'd concurrently; split the cores between the calls
+        # so each ONNX session's intra-op pool doesn't oversubscribe the CPU.
+        cpu_count = os.cpu_count() or 4
+        self.ocr_workers = int(
+            os.getenv("OCR_CONCURRENCY", str(max(2, cpu_count // 2)))
+        )
+        self.ocr_service = OCRService(
+            intra_op_num_threads=max(1, cpu_count // self.ocr_workers)
+        )
         # Base directory for temporary frame storage
         self.frames_base_dir = "data/frames"
 
     def process_video(
-        self, video_path: str, video_id: str, interval: int = 30
+        self,
+        video_path: str,
+        video_id: str,
+        interval: int = 30,
+        keyframes_only: bool = False,
     ) -> List[Dict[str, Any]]:
         """
         Runs the visual pipeline and returns a list of 'documents' ready for embedding.
@@ -40,6 +67,8 @@ class VisualIngestionService:
             video_path (str): Path to the .mp4 file.
             video_id (str): Unique identifier for the video (to link in Qdrant).
             interval (int): Seconds between frames.
+            keyframes_only (bool): Sample the video's keyframes instead of
+                fixed intervals (`interval` is then ignored).
 
         Returns:
             List[Dict]: A list of payloads ready for the Vector Store.
@@ -50,6 +79,7 @@ class VisualIngestionService:
                     "metadata": {
                         "video_id": "123",
                         "timestamp": 30.0,
+                        "end_timestamp": 60.0,
                         "source_type": "visual",
                         "frame_path": "data/frames/..."
                     }
@@ -59,30 +89,61 @@ class VisualIngestionService:
         """
         logger.info(f"🎬 Starting visual ingestion for video: {video_id}")
 
-        # 1. Extraction Phase: Get images from video
-        frame_paths = extract_frames(
-            video_path, self.frames_base_dir, interval_seconds=interval
-        )
-
-        if not frame_paths:
+        video_frames_dir = frames_dir(video_path, self.frames_base_dir)
+        os.makedirs(video_frames_dir, exist_ok=True)
+
+        # Per kept frame: its OCR future and the last sampled second the same
+        # content was on screen (grows while duplicates keep coming).
+        ocr_futures: List[Future[Any]] = []
+        end_timestamps: List[int] = []
+        sampled = 0
+
+        # Bounded hand-off between decode and OCR (as in RAGEngine): decode
+        # stalls once this many frames are queued/running, so in-memory frames
+        # stay capped while both stages overlap.
+        in_flight = threading.BoundedSemaphore(self.ocr_workers * 2)
+
+        # 1. Extraction + 2. Analysis Phases, fused: decoded frames go straight
+        # to OCR as ndarrays, no JPEG encode -> disk -> decode round-trip.
+        with ThreadPoolExecutor(max_workers=self.ocr_workers) as pool:
+            for timestamp, frame in iter_distinct_frames(
+                video_path, interval_seconds=interval, keyframes_only=keyframes_only
+            ):
+                sampled += 1
+
+                # A slide often stays on screen for minutes: near-identical
+                # frames come back without pixels and only extend the run of
+                # the first one, the only frame OCR'd/indexed.
+                if frame is None:
+                    if end_timestamps:
+                        end_timestamps[-1] = timestamp
+                    continue
+
+                in_flight.acquire()
+                future = pool.submit(
+                    self._ocr_frame, frame, video_frames_dir, timestamp
+                )
+                future.add_done_callback(lambda _: in_flight.release())
+                ocr_futures.append(future)
+                end_timestamps.append(timestamp)
+
+        if not sampled:
             logger.warning("No frames extracted. Check video path or codec.")
             return []
 
-        visual_documents = []
-
-        # 2. Analysis Phase: Run OCR on each extracted frame
-        logger.info(f"👁️ Analyzing {len(frame_paths)} frames with OCR...")
+        logger.info(
+            f"👁️ Analyzed {len(ocr_futures)} distinct frames with OCR "
+            f"({sampled - len(ocr_futures)} duplicates skipped)"
+        )
 
-        for frame_path in frame_paths:
-            # Extract text using the OCR service
-            text = self.ocr_service.extract_text(frame_path)
+        visual_documents = []
 
+        for future, end_timestamp in zip(ocr_futures, end_timestamps):
+            result = future.result()
             # Optimization: Skip empty frames to save DB space and reduce noise
-            if not text.strip():
+            if result is None:
                 continue
-
-            # Calculate timestamp from filename (e.g., frame_00030.jpg -> 30.0)
-            timestamp = self._parse_timestamp_from_filename(frame_path)
+            frame_path, timestamp, text = result
 
             # 3. Structuring Phase: Create the payload
             # We create a dictionary compatible with LangChain/Qdrant schemas
@@ -91,6 +152,8 @@ class VisualIngestionService:
                 "metadata": {
                     "video_id": video_id,
                     "timestamp": float(timestamp),
+                    # Last sampled moment the same content was on screen
+                    "end_timestamp": float(end_timestamp),
                     "source_type": "visual",  # Crucial for filtering (Audio vs Visual)
                     "frame_path": frame_path,  # Useful for displaying the source image in the UI
                 },
@@ -102,20 +165,43 @@ class VisualIngestionService:
         )
         return visual_documents
 
-    def _parse_timestamp_from_filename(self, filename: str) -> float:
+    def _ocr_frame(
+        self, frame: np.ndarray, video_frames_dir: str, timestamp: int
+    ) -> Optional[Tuple[str, int, str]]:
+        """
+        OCR worker: runs OCR on the decoded frame and, only if it holds text,
+        persists the JPEG (and its thumbnail) the UI shows for the source.
+
+        Returns:
+            Optional[Tuple[str, int, str]]: (frame path, timestamp, text), or
+            None when the frame has no text.
         """
-        Helper method to extract seconds from filename 'frame_00030.jpg'.
-        Returns 0.0 if parsing fails.
+        text = self.ocr_service.extract_text(frame)
+        if not text.strip():
+            return None
+
+        frame_path = os.path.join(video_frames_dir, frame_filename(timestamp))
+        cv2.imwrite(frame_path, frame, JPEG_PARAMS)
+        self._write_thumbnail(frame_path, frame)
+        return frame_path, timestamp, text
+
+    def _write_thumbnail(self, frame_path: str, frame: np.ndarray) -> None:
         """
-        try:
-            basename = os.path.basename(filename)
-            # Regex to capture the digits after 'frame_'
-            match = re.search(r"frame_(\d+)", basename)
-            if match:
-                return float(match.group(1))
-            return 0.0
-        except Exception:
-            return 0.0
+        Writes a downscaled WebP sidecar next to the frame
+        ('frame_00030.jpg' -> 'frame_00030.thumb.webp') so the chat history
+        doesn't ship the full JPEG on every Streamlit rerun.
+        """
+        height, width = frame.shape[:2]
+        max_width, max_height = THUMBNAIL_MAX_SIZE
+        scale = min(max_width / width, max_height / height, 1.0)
+        if scale < 1.0:
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+        thumb_path = os.path.splitext(frame_path)[0] + THUMBNAIL_SUFFIX
+        cv2.imwrite(
+            thumb_path, frame, [int(cv2.IMWRITE_WEBP_QUALITY), THUMBNAIL_WEBP_QUALITY]
+        )
 
 
 # --- MAIN EXECUTION BLOCK (FOR TESTING PURPOSES) ---
@@ -1,7 +1,12 @@
+import av  # PyAV (FFmpeg bindings), for keyframe-only decoding
 import cv2  # OpenCV library for computer vision tasks
 import os  # Operating system interactions
 import logging  # Logging for debugging and monitoring
-from typing import List  # Type hinting for better code readability
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator, List, Optional, Tuple  # Type hinting
+
+import numpy as np
 
 # Setup logging configuration
 logging.basicConfig(
@@ -9,35 +14,112 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# JPEG Quality 80 is standard for ML
+JPEG_PARAMS = [int(cv2.IMWRITE_JPEG_QUALITY), 80]
+# Encoder threads: libjpeg releases the GIL, so writes overlap with decoding
+JPEG_WRITER_THREADS = 4
+# Decoded frames allowed to wait for their encode (~6MB each at 1080p)
+JPEG_QUEUE_DEPTH = 8
 
-def extract_frames(
-    video_path: str, output_dir: str, interval_seconds: int = 30
-) -> List[str]:
+# Frames whose 64-bit dHash differs in fewer bits are treated as duplicates
+DEDUP_HAMMING_THRESHOLD = 10
+# 8-bit planar/semi-planar YUV: plane 0 is the full-resolution luma image
+_LUMA_PLANE_FORMATS = {
+    "yuv420p",
+    "yuvj420p",
+    "yuv422p",
+    "yuvj422p",
+    "yuv444p",
+    "yuvj444p",
+    "nv12",
+    "nv21",
+}
+
+
+def dhash64(image: np.ndarray) -> int:
+    """
+    Perceptual difference hash of a BGR or grayscale frame.
+
+    9x8 tile -> 8 horizontal gradient bits per row, packed into one uint64;
+    similarity is a single XOR + popcount. Shrinks first so the gray
+    conversion touches 72 pixels instead of the whole frame (bilinear on
+    purpose: INTER_AREA would average every pixel again).
+    """
+    small = cv2.resize(image, (9, 8))
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view(np.uint64)[0])
+
+
+class _JpegWriter:
+    """
+    Writes frames as JPEGs on a small thread pool while the caller keeps
+    decoding. Submitting blocks once JPEG_QUEUE_DEPTH frames are pending;
+    leaving the `with` block waits for every write.
+    """
+
+    def __init__(self) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=JPEG_WRITER_THREADS)
+        self._pending = threading.BoundedSemaphore(JPEG_QUEUE_DEPTH)
+
+    def submit(self, file_path: str, frame: Any) -> None:
+        self._pending.acquire()
+        future = self._pool.submit(cv2.imwrite, file_path, frame, JPEG_PARAMS)
+        future.add_done_callback(lambda _: self._pending.release())
+
+    def __enter__(self) -> "_JpegWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._pool.shutdown(wait=True)
+
+
+def frames_dir(video_path: str, output_dir: str) -> str:
+    """Dedicated subfolder for a video's frames: <output_dir>/<video name>."""
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(output_dir, video_name)
+
+
+def frame_filename(timestamp_sec: int) -> str:
+    """Naming: frame_00030.jpg -> Easy to parse "30 seconds" later."""
+    return f"frame_{timestamp_sec:05d}.jpg"
+
+
+def iter_frames(
+    video_path: str, interval_seconds: int = 30, keyframes_only: bool = False
+) -> Iterator[Tuple[int, np.ndarray]]:
     """
-    Extracts frames from a video file at fixed intervals using a seeking strategy.
+    Decodes frames at fixed intervals and yields them in memory, so callers
+    can decide per frame whether it is worth a JPEG on disk at all.
 
-    Strategy: Pointer Hopping (Sparse Sampling).
-    Why: It provides O(1) performance relative to the skipped frames, avoiding
-    unnecessary decoding of the footage between intervals (it would add excessive computational cost).
+    Strategy: Selective Decoding (grab/retrieve).
+    Why: seeking with CAP_PROP_POS_FRAMES makes long-GOP codecs (H.264/H.265)
+    rewind to the previous keyframe and re-decode up to the target on every
+    sample, and can snap to that keyframe (wrong timestamps). Walking the
+    stream with grab() only advances the decoder; the BGR conversion and
+    ndarray copy in retrieve() are paid for the sampled frames alone.
 
     Args:
         video_path (str): Absolute or relative path to the input video file.
-        output_dir (str): Base directory to save the extracted images.
         interval_seconds (int): Time gap between extractions.
+        keyframes_only (bool): Yield the stream's keyframes (I-frames) instead
+            of sampling every `interval_seconds`; see `_iter_av_frames`.
 
-    Returns:
-        List[str]: List of file paths for the saved images.
+    Yields:
+        Tuple[int, np.ndarray]: (timestamp in whole seconds, HxWx3 BGR frame).
+        Each frame is a fresh array, safe to hand to other threads.
     """
 
     # 1. Basic Validations
     if not os.path.exists(video_path):
         logger.error(f"Video no encontrado: {video_path}")
-        return []
+        return
 
-    # Extract video name to create a dedicated subfolder
-    video_name = os.path.splitext(os.path.basename(video_path))[0]
-    video_output_dir = os.path.join(output_dir, video_name)
-    os.makedirs(video_output_dir, exist_ok=True)
+    if keyframes_only:
+        for timestamp_sec, av_frame in _iter_av_frames(video_path, 0, True):
+            yield timestamp_sec, av_frame.to_ndarray(format="bgr24")
+        return
 
     # 2. Load Video Resource
     cap = cv2.VideoCapture(video_path)
@@ -45,63 +127,208 @@ def extract_frames(
         logger.error(
             "No se pudo abrir el archivo de video (Codec error o archivo corrupto)."
         )
-        return []
+        return
 
-    # 3. Key Metadata Extraction
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    duration = total_frames / fps if fps > 0 else 0
+    try:
+        # 3. Key Metadata Extraction
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        duration = total_frames / fps if fps > 0 else 0
 
-    # Calculate the jump step in frames
-    # Logic: 30 FPS * 30 seconds = 900 frames to skip per iteration
-    frame_step = int(fps * interval_seconds)
+        # Calculate the jump step in frames
+        # Logic: 30 FPS * 30 seconds = 900 frames to skip per iteration
+        frame_step = int(fps * interval_seconds)
 
-    if frame_step == 0:
-        logger.error("Error matemático: frame_step es 0. Revisa los FPS del video.")
-        cap.release()
-        return []
+        if frame_step == 0:
+            logger.error("Error matemático: frame_step es 0. Revisa los FPS del video.")
+            return
 
-    logger.info(f"Procesando: {video_name} | Duración: {duration/60:.2f} min")
-    logger.info(
-        f"Estrategia: Extracción cada {interval_seconds}s (salto de {frame_step} frames)"
-    )
+        video_name = os.path.splitext(os.path.basename(video_path))[0]
+        logger.info(f"Procesando: {video_name} | Duración: {duration / 60:.2f} min")
+        logger.info(
+            f"Estrategia: Extracción cada {interval_seconds}s "
+            f"(salto de {frame_step} frames)"
+        )
 
-    saved_files = []
-    current_frame = 0
+        current_frame = -1
 
-    # 4. Fast Extraction Loop
-    while current_frame < total_frames:
-        # Manually set the video pointer to the desired frame (Seeking). As i said
-        # This is much faster than reading frames sequentially (excessive computational cost)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, current_frame)
+        # 4. Fast Extraction Loop
+        # Bounded by grab() rather than CAP_PROP_FRAME_COUNT, which is only an
+        # estimate for many containers.
+        while cap.grab():
+            current_frame += 1
+            if current_frame % frame_step != 0:
+                continue
 
-        success, frame = cap.read()
+            # retrieve() returns a fresh array, so it can be handed off as is
+            success, frame = cap.retrieve()
 
-        # If read fails (e.g., end of file or corrupted frame), stop
-        if not success:
-            break
+            # If decoding fails (e.g., corrupted frame), stop
+            if not success:
+                break
 
-        # Calculate exact timestamp for filename (Synchronization Key)
-        timestamp_sec = int(current_frame / fps)
+            # Calculate exact timestamp for filename (Synchronization Key)
+            yield int(current_frame / fps), frame
+    finally:
+        cap.release()
 
-        # Naming: frame_00030.jpg -> Easy to parse "30 seconds" later
-        filename = f"frame_{timestamp_sec:05d}.jpg"
-        file_path = os.path.join(video_output_dir, filename)
 
-        # Save with compression optimization (JPEG Quality 80 is standard for ML)
-        cv2.imwrite(file_path, frame, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
-        saved_files.append(file_path)
+def extract_frames(
+    video_path: str,
+    output_dir: str,
+    interval_seconds: int = 30,
+    keyframes_only: bool = False,
+) -> List[str]:
+    """
+    Extracts frames from a video file (see `iter_frames`) and saves them as
+    JPEGs under <output_dir>/<video name>/.
 
-        # Jump to the next interval
-        current_frame += frame_step
+    Args:
+        video_path (str): Absolute or relative path to the input video file.
+        output_dir (str): Base directory to save the extracted images.
+        interval_seconds (int): Time gap between extractions.
+        keyframes_only (bool): Save the stream's keyframes instead of
+            sampling every `interval_seconds`.
+
+    Returns:
+        List[str]: List of file paths for the saved images.
+    """
+    video_output_dir = frames_dir(video_path, output_dir)
+    saved_files: List[str] = []
+
+    with _JpegWriter() as writer:
+        for timestamp_sec, frame in iter_frames(
+            video_path, interval_seconds, keyframes_only
+        ):
+            if not saved_files:
+                os.makedirs(video_output_dir, exist_ok=True)
+            file_path = os.path.join(video_output_dir, frame_filename(timestamp_sec))
+
+            # Encoded in the background while the next frames decode
+            writer.submit(file_path, frame)
+            saved_files.append(file_path)
 
-    cap.release()
     logger.info(
-        f"✅ Extracción completada: {len(saved_files)} imágenes guardadas en '{video_output_dir}'"
+        f"✅ Extracción completada: {len(saved_files)} imágenes guardadas "
+        f"en '{video_output_dir}'"
     )
     return saved_files
 
 
+def iter_distinct_frames(
+    video_path: str, interval_seconds: int = 30, keyframes_only: bool = False
+) -> Iterator[Tuple[int, Optional[np.ndarray]]]:
+    """
+    `iter_frames` with the near-duplicate check moved in front of the color
+    conversion: each sampled frame is hashed (dHash) straight from the
+    decoder's luma plane, and only frames whose content changed are converted
+    to BGR. On lecture videos most samples repeat the previous slide, so most
+    frames never pay for the full-resolution YUV -> BGR pass.
+
+    Args:
+        video_path (str): Absolute or relative path to the input video file.
+        interval_seconds (int): Time gap between extractions.
+        keyframes_only (bool): Sample the stream's keyframes instead.
+
+    Yields:
+        Tuple[int, Optional[np.ndarray]]: (timestamp in whole seconds, BGR
+        frame) when the content changed, or (timestamp, None) when the frame
+        is within DEDUP_HAMMING_THRESHOLD bits of the last frame yielded with
+        pixels, so callers can still tell how long that content stayed on.
+    """
+    if not os.path.exists(video_path):
+        logger.error(f"Video no encontrado: {video_path}")
+        return
+
+    last_hash: Optional[int] = None
+
+    for timestamp_sec, frame in _iter_av_frames(
+        video_path, interval_seconds, keyframes_only
+    ):
+        current_hash = dhash64(_luma(frame))
+        if (
+            last_hash is not None
+            and (current_hash ^ last_hash).bit_count() < DEDUP_HAMMING_THRESHOLD
+        ):
+            yield timestamp_sec, None
+            continue
+
+        last_hash = current_hash
+        yield timestamp_sec, frame.to_ndarray(format="bgr24")
+
+
+def _iter_av_frames(
+    video_path: str, interval_seconds: int, keyframes_only: bool
+) -> Iterator[Tuple[int, av.VideoFrame]]:
+    """
+    PyAV sampling, yielding decoded frames before any pixel-format conversion.
+
+    Interval mode keeps every frame_step-th frame, the same sampling as the
+    OpenCV path of `iter_frames`.
+
+    Keyframe mode: with skip_frame="NONKEY" the decoder drops every P/B frame
+    before decoding it, so only self-contained I-frames (which is where slide
+    and scene changes land in lecture videos) are ever decoded. Keyframes less
+    than a second apart would share a filename, so only the first one of each
+    second is kept.
+
+    Yields:
+        Tuple[int, av.VideoFrame]: (timestamp in whole seconds, frame).
+    """
+    last_second = -1
+
+    try:
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            # Frame-threaded decode, as FFmpeg does behind cv2.VideoCapture
+            stream.thread_type = "AUTO"
+
+            fps = float(stream.average_rate or 0)
+            frame_step = 1
+            if keyframes_only:
+                stream.codec_context.skip_frame = "NONKEY"
+            else:
+                frame_step = int(fps * interval_seconds)
+                if frame_step == 0:
+                    logger.error(
+                        "Error matemático: frame_step es 0. Revisa los FPS del video."
+                    )
+                    return
+
+            for index, frame in enumerate(container.decode(stream)):
+                if keyframes_only:
+                    if frame.pts is None:
+                        continue
+                    timestamp_sec = int(frame.time)
+                    if timestamp_sec == last_second:
+                        continue
+                    last_second = timestamp_sec
+                else:
+                    if index % frame_step != 0:
+                        continue
+                    timestamp_sec = int(index / fps)
+
+                yield timestamp_sec, frame
+    except (av.error.FFmpegError, IndexError) as e:
+        # IndexError: the container has no video stream
+        logger.error(f"No se pudieron decodificar frames de {video_path}: {e}")
+
+
+def _luma(frame: av.VideoFrame) -> np.ndarray:
+    """
+    Grayscale image of a decoded frame. For planar YUV (what video codecs
+    output) that is plane 0 read in place, with no conversion at all.
+    """
+    if frame.format.name in _LUMA_PLANE_FORMATS:
+        plane = frame.planes[0]
+        rows = np.frombuffer(memoryview(plane), dtype=np.uint8).reshape(
+            plane.height, plane.line_size
+        )
+        # Rows are padded to line_size; keep only the visible pixels
+        return rows[:, : plane.width]
+    return frame.to_ndarray(format="gray")
+
+
 # --- Execution Block (Testing) ---
 if __name__ == "__main__":
     # Test configuration
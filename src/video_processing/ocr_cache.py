@@ -0,0 +1,55 @@
+"""
+Persistent (SQLite) OCR result cache.
+Keyed by (engine tag, blake2b(image bytes)) so re-ingesting a video, or any
+frame seen before, skips the detector/recognizer passes entirely. Frames are
+written once as JPEGs, so hashing the file bytes is stable across runs.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+
+class OCRCache:
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): SQLite file. Parent directories are created on demand.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # One shared connection; OCR calls run concurrently on pool threads,
+        # so access is serialized with a lock.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr ("
+                "engine TEXT, h BLOB, text TEXT, PRIMARY KEY (engine, h)"
+                ") WITHOUT ROWID"
+            )
+
+    @staticmethod
+    def hash_image(data: bytes) -> bytes:
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def get(self, engine: str, key: bytes) -> Optional[str]:
+        """Cached text for an image hash, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM ocr WHERE engine = ? AND h = ?", (engine, key)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, engine: str, key: bytes, text: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr VALUES (?, ?, ?)", (engine, key, text)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
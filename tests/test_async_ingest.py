@@ -14,6 +14,12 @@ class TestAsyncIngest(unittest.TestCase):
         self.patcher_db = patch("src.core.rag_engine.VectorDatabase")
         self.mock_db_class = self.patcher_db.start()
 
+        # No persistent OCR cache file from the engine's OCRService
+        self.patcher_env = patch.dict("os.environ", {"OCR_CACHE_PATH": ""})
+        self.patcher_env.start()
+        # setUp may skip below, in which case tearDown never runs
+        self.addCleanup(self.patcher_env.stop)
+
         # We need a real RAGEngine but with mocked internal components where possible
         # to avoid huge downloads.
         # But we DO want to test the orchestration.
@@ -45,7 +51,7 @@ class TestAsyncIngest(unittest.TestCase):
         ):
             pass  # better to set side_effect or return_value on the instance
 
-        self.rag.transcriber.transcribe = MagicMock(
+        self.rag.transcriber.transcribe_cached = MagicMock(
             return_value=[{"start": 0.0, "end": 2.0, "text": "Hello world"}]
         )
 
@@ -54,7 +60,9 @@ class TestAsyncIngest(unittest.TestCase):
         self.rag._download_video_best = MagicMock(return_value=self.test_video_path)
 
         # 4. Mock OCR
-        self.rag.ocr_service.extract_text = MagicMock(return_value="Slide Text Content")
+        self.rag.ocr_service.extract_text_from_array = MagicMock(
+            return_value="Slide Text Content"
+        )
 
         # 5. Mock DB Upsert to avoid actual DB calls
         self.rag.db.upsert_chunks = MagicMock()
@@ -83,8 +91,7 @@ class TestAsyncIngest(unittest.TestCase):
 
         if not has_visual:
             print(
-                "⚠️ Warning: No visual chunks found."
-                "Check loop logic or video content."
+                "⚠️ Warning: No visual chunks found.Check loop logic or video content."
             )
 
         self.assertTrue(has_audio, "Should contain audio chunks")
@@ -103,7 +110,7 @@ class TestAsyncIngest(unittest.TestCase):
         self.rag.transcriber.download_audio = MagicMock(
             return_value=("data/videos/test_audio.mp3", "Test Title")
         )
-        self.rag.transcriber.transcribe = MagicMock(
+        self.rag.transcriber.transcribe_cached = MagicMock(
             return_value=[{"start": 0.0, "end": 2.0, "text": "Hello Audio"}]
         )
 
@@ -111,7 +118,7 @@ class TestAsyncIngest(unittest.TestCase):
         self.rag._download_video_best = MagicMock()
 
         # 3. Mock OCR (Should NOT be called)
-        self.rag.ocr_service.extract_text = MagicMock()
+        self.rag.ocr_service.extract_text_from_array = MagicMock()
 
         # 4. Mock DB
         self.rag.db.upsert_chunks = MagicMock()
@@ -124,7 +131,7 @@ class TestAsyncIngest(unittest.TestCase):
         # 6. Assertions
         self.rag.transcriber.download_audio.assert_called_once()
         self.rag._download_video_best.assert_not_called()
-        self.rag.ocr_service.extract_text.assert_not_called()
+        self.rag.ocr_service.extract_text_from_array.assert_not_called()
 
         # Check DB upsert content
         call_args = self.rag.db.upsert_chunks.call_args
@@ -22,3 +22,27 @@ class TestChunkingProcessor(unittest.TestCase):
     def test_create_chunks_empty(self):
         chunks = self.chunker.create_chunks([])
         self.assertEqual(len(chunks), 0)
+
+    def test_create_chunks_single_segment_chunks_terminate(self):
+        # Every segment alone exceeds min_chunk_size, so each chunk holds one
+        # segment; the overlap step-back must still move forward.
+        segments = [
+            {"start": float(i), "end": float(i + 1), "text": "long segment text"}
+            for i in range(50)
+        ]
+
+        chunks = self.chunker.create_chunks(segments)
+
+        self.assertEqual(len(chunks), 50)
+        self.assertEqual(chunks[-1]["end"], 50.0)
+
+    def test_create_chunks_overlap(self):
+        segments = [
+            {"start": float(i), "end": float(i + 1), "text": "abcd"} for i in range(6)
+        ]
+
+        chunks = self.chunker.create_chunks(segments)
+
+        # Chunks close after 3 segments (12 chars) and re-use the last 2
+        self.assertEqual(chunks[0]["end"], 3.0)
+        self.assertEqual(chunks[1]["start"], 1.0)
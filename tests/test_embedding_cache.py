@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.database.embedding_cache import EmbeddingCache
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = EmbeddingCache(os.path.join(self.tmp.name, "nested", "e.db"))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_dense_roundtrip_is_per_model(self):
+        self.cache.put_dense("m1", ["hello"], [np.array([0.1, -0.5], np.float32)])
+
+        hit, miss = self.cache.get_dense("m1", ["hello", "other"])
+        self.assertIsNone(miss)
+        self.assertEqual(hit.dtype, np.float32)
+        np.testing.assert_allclose(hit, [0.1, -0.5], atol=1e-3)
+        self.assertEqual(self.cache.get_dense("m2", ["hello"]), [None])
+
+    def test_sparse_roundtrip(self):
+        self.cache.put_sparse(
+            "bm25", ["a b"], [(np.array([4, 9]), np.array([1.5, 0.2]))]
+        )
+
+        ((indices, values),) = self.cache.get_sparse("bm25", ["a b"])
+        self.assertEqual(indices.tolist(), [4, 9])
+        np.testing.assert_allclose(values, [1.5, 0.2], rtol=1e-6)
+
+    def test_bulk_lookup_beyond_sqlite_variable_limit(self):
+        texts = [f"chunk {i}" for i in range(2000)]
+        self.cache.put_dense("m", texts, np.ones((2000, 4), np.float32))
+
+        vectors = self.cache.get_dense("m", texts)
+        self.assertTrue(all(v is not None for v in vectors))
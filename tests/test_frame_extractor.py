@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+
+import av
+import cv2
+import numpy as np
+
+from src.video_processing.frame_extractor import extract_frames, iter_distinct_frames
+
+
+class TestExtractFrames(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.video_path = os.path.join(self.tmp_dir.name, "clip.avi")
+
+        # 10 fps, 25 frames: each frame's gray level encodes its index
+        writer = cv2.VideoWriter(
+            self.video_path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48)
+        )
+        for i in range(25):
+            writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+        writer.release()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_samples_every_interval_with_matching_timestamps(self):
+        paths = extract_frames(self.video_path, self.tmp_dir.name, interval_seconds=1)
+
+        names = [os.path.basename(p) for p in paths]
+        self.assertEqual(
+            names, ["frame_00000.jpg", "frame_00001.jpg", "frame_00002.jpg"]
+        )
+
+        # The frame written for second N (index N*10) is the one saved
+        for second, path in enumerate(paths):
+            level = cv2.imread(path).mean()
+            self.assertAlmostEqual(level, second * 100, delta=8)
+
+    def test_keyframes_only_decodes_one_frame_per_gop(self):
+        # 10 fps, keyframe every 15 frames -> I-frames at 0s, 1.5s, 3s, 4.5s
+        # (a full decode would also produce a frame for second 2)
+        gop_path = os.path.join(self.tmp_dir.name, "gop.mp4")
+        with av.open(gop_path, "w") as container:
+            # No scene-cut detection: keyframes only where the GOP ends
+            stream = container.add_stream(
+                "libx264", rate=10, options={"sc_threshold": "0"}
+            )
+            stream.width, stream.height = 64, 48
+            stream.pix_fmt = "yuv420p"
+            stream.codec_context.gop_size = 15
+            for i in range(50):
+                image = np.full((48, 64, 3), i * 5, dtype=np.uint8)
+                frame = av.VideoFrame.from_ndarray(image, format="bgr24")
+                container.mux(stream.encode(frame))
+            container.mux(stream.encode())
+
+        paths = extract_frames(gop_path, self.tmp_dir.name, keyframes_only=True)
+
+        names = [os.path.basename(p) for p in paths]
+        self.assertEqual(
+            names,
+            [
+                "frame_00000.jpg",
+                "frame_00001.jpg",
+                "frame_00003.jpg",
+                "frame_00004.jpg",
+            ],
+        )
+        for keyframe_index, path in zip([0, 15, 30, 45], paths):
+            level = cv2.imread(path).mean()
+            self.assertAlmostEqual(level, keyframe_index * 5, delta=8)
+
+    def test_distinct_frames_skip_conversion_of_repeats(self):
+        # 10 fps: one slide for 2s, then a different one for 1s
+        slides_path = os.path.join(self.tmp_dir.name, "slides.avi")
+        writer = cv2.VideoWriter(
+            slides_path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48)
+        )
+        first = np.zeros((48, 64, 3), dtype=np.uint8)
+        first[:, 32:] = 255  # left/right split
+        second = np.zeros((48, 64, 3), dtype=np.uint8)
+        second[24:, :] = 255  # top/bottom split
+        for i in range(30):
+            writer.write(first if i < 20 else second)
+        writer.release()
+
+        frames = list(iter_distinct_frames(slides_path, interval_seconds=1))
+
+        self.assertEqual([t for t, _ in frames], [0, 1, 2])
+        self.assertIsNone(frames[1][1])
+        self.assertEqual(frames[0][1].shape, (48, 64, 3))
+        self.assertGreater(frames[0][1][:, 40:].mean(), 200)
+        self.assertGreater(frames[2][1][30:, :].mean(), 200)
+
+    def test_missing_video_returns_empty(self):
+        missing = os.path.join(self.tmp_dir.name, "missing.mp4")
+        self.assertEqual(extract_frames(missing, self.tmp_dir.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,8 @@
+import os
+import tempfile
 import unittest
+
+import numpy as np
 from unittest.mock import MagicMock, patch
 from src.video_processing.ocr_service import OCRService
 
@@ -8,15 +12,17 @@ class TestOCRService(unittest.TestCase):
         # Patch RapidOCR initialization
         self.patcher = patch("src.video_processing.ocr_service.RapidOCR")
         self.MockRapidOCR = self.patcher.start()
+        # Cache off by default; the cache tests opt in with a temp file
+        self.patcher_env = patch.dict("os.environ", {"OCR_CACHE_PATH": ""})
+        self.patcher_env.start()
 
         self.ocr_service = OCRService()
 
     def tearDown(self):
         self.patcher.stop()
+        self.patcher_env.stop()
 
-    @patch("src.video_processing.ocr_service.os.path.exists")
-    def test_extract_text_success(self, mock_exists):
-        mock_exists.return_value = True
+    def test_extract_text_success(self):
         mock_instance = self.MockRapidOCR.return_value
 
         # Mock prediction result structure (Object with txts and scores attributes)
@@ -26,12 +32,156 @@ class TestOCRService(unittest.TestCase):
 
         mock_instance.return_value = MockPrediction
 
-        text = self.ocr_service.extract_text("dummy.jpg")
+        with tempfile.TemporaryDirectory() as tmp:
+            image_path = os.path.join(tmp, "frame.jpg")
+            with open(image_path, "wb") as f:
+                f.write(b"jpeg bytes")
+            text = self.ocr_service.extract_text(image_path)
 
         self.assertIn("Detected Text", text)
         self.assertIn("Line 2", text)
+        # The file is read once here and handed over as bytes
+        mock_instance.assert_called_once_with(b"jpeg bytes")
 
     def test_extract_text_empty(self):
         self.MockRapidOCR.return_value.return_value = None
         text = self.ocr_service.extract_text("dummy.jpg")
         self.assertEqual(text, "")
+
+    def test_extract_text_from_array(self):
+        """In-memory frames go straight to the engine, no filesystem check."""
+        MockPrediction = MagicMock()
+        MockPrediction.txts = ["Slide Title", "x"]
+        MockPrediction.scores = [0.9, 0.99]
+        self.MockRapidOCR.return_value.return_value = MockPrediction
+
+        frame = np.zeros((32, 32, 3), dtype=np.uint8)
+        text = self.ocr_service.extract_text_from_array(frame)
+
+        self.assertEqual(text, "Slide Title")
+        self.MockRapidOCR.return_value.assert_called_once_with(frame)
+
+    def test_large_frames_shrunk_to_detector_size(self):
+        """A 1080p frame reaches the engine with a 736px short side."""
+        self.MockRapidOCR.return_value.return_value = None
+
+        self.ocr_service.extract_text_from_array(
+            np.zeros((1080, 1920, 3), dtype=np.uint8)
+        )
+
+        passed = self.MockRapidOCR.return_value.call_args[0][0]
+        self.assertEqual(passed.shape, (736, 1308, 3))
+
+    def test_extract_text_accepts_array(self):
+        MockPrediction = MagicMock()
+        MockPrediction.txts = ["Slide Title"]
+        MockPrediction.scores = [0.9]
+        self.MockRapidOCR.return_value.return_value = MockPrediction
+
+        frame = np.zeros((32, 32, 3), dtype=np.uint8)
+
+        self.assertEqual(self.ocr_service.extract_text(frame), "Slide Title")
+        self.MockRapidOCR.return_value.assert_called_once_with(frame)
+
+    def test_intra_op_threads_forwarded_to_engine(self):
+        """A thread cap is passed to RapidOCR's ONNX Runtime session config."""
+        OCRService(intra_op_num_threads=2)
+        params = self.MockRapidOCR.call_args[1]["params"]
+        self.assertEqual(params["EngineConfig.onnxruntime.intra_op_num_threads"], 2)
+
+    def test_int8_models_opt_in(self):
+        """OCR_MODEL_INT8_DIR swaps in the quantized det/rec models."""
+        self.assertNotIn(
+            "Det.model_path", self.MockRapidOCR.call_args[1]["params"] or {}
+        )
+
+        with patch.dict("os.environ", {"OCR_MODEL_INT8_DIR": "models/ocr-int8"}):
+            service = OCRService()
+
+        params = self.MockRapidOCR.call_args[1]["params"]
+        self.assertEqual(
+            params["Det.model_path"], os.path.join("models/ocr-int8", "det_int8.onnx")
+        )
+        self.assertEqual(
+            params["Rec.model_path"], os.path.join("models/ocr-int8", "rec_int8.onnx")
+        )
+        self.assertNotEqual(service.cache_engine, self.ocr_service.cache_engine)
+
+    def test_extract_text_batch_keeps_input_order(self):
+        """Concurrent calls still return one result per path, in order."""
+
+        def predict(data):
+            prediction = MagicMock()
+            prediction.txts = [f"text of {data.decode()}"]
+            prediction.scores = [0.9]
+            return prediction
+
+        self.MockRapidOCR.return_value.side_effect = predict
+
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for name in ["a", "missing", "b", "c"]:
+                path = os.path.join(tmp, f"{name}.jpg")
+                if name != "missing":
+                    with open(path, "wb") as f:
+                        f.write(name.encode())
+                paths.append(path)
+
+            texts = self.ocr_service.extract_text_batch(paths, max_workers=3)
+
+        self.assertEqual(texts, ["text of a", "", "text of b", "text of c"])
+
+
+class TestOCRServiceCache(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch("src.video_processing.ocr_service.RapidOCR")
+        self.MockRapidOCR = self.patcher.start()
+        prediction = MagicMock()
+        prediction.txts = ["print('hi')"]
+        prediction.scores = [0.95]
+        self.MockRapidOCR.return_value.return_value = prediction
+
+        self.tmp = tempfile.TemporaryDirectory()
+        cache_path = os.path.join(self.tmp.name, "cache", "ocr.sqlite3")
+        with patch.dict("os.environ", {"OCR_CACHE_PATH": cache_path}):
+            self.ocr_service = OCRService()
+
+        self.image_path = os.path.join(self.tmp.name, "frame_00010.jpg")
+        with open(self.image_path, "wb") as f:
+            f.write(b"jpeg bytes")
+
+    def tearDown(self):
+        self.ocr_service.cache.close()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def test_same_image_bytes_skip_the_engine(self):
+        engine = self.MockRapidOCR.return_value
+
+        first = self.ocr_service.extract_text(self.image_path)
+        # Same content under another name (e.g. a re-extracted video)
+        copy_path = os.path.join(self.tmp.name, "copy.jpg")
+        with open(copy_path, "wb") as f:
+            f.write(b"jpeg bytes")
+        second = self.ocr_service.extract_text(copy_path)
+
+        self.assertEqual(first, "print('hi')")
+        self.assertEqual(second, first)
+        # The engine got the bytes read for hashing, once
+        engine.assert_called_once_with(b"jpeg bytes")
+
+    def test_empty_results_are_cached_but_failures_are_not(self):
+        engine = self.MockRapidOCR.return_value
+        engine.return_value = None
+        self.assertEqual(self.ocr_service.extract_text(self.image_path), "")
+        self.assertEqual(self.ocr_service.extract_text(self.image_path), "")
+        self.assertEqual(engine.call_count, 1)
+
+        frame = np.ones((4, 4, 3), dtype=np.uint8)
+        engine.side_effect = RuntimeError("onnx failure")
+        self.assertEqual(self.ocr_service.extract_text_from_array(frame), "")
+        engine.side_effect = None
+        engine.return_value = MagicMock(txts=["Slide"], scores=[0.9])
+        self.assertEqual(self.ocr_service.extract_text_from_array(frame), "Slide")
+        self.assertEqual(self.ocr_service.extract_text_from_array(frame), "Slide")
+        self.assertEqual(engine.call_count, 3)
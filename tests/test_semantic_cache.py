@@ -0,0 +1,56 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+from src.core.semantic_cache import SemanticQueryCache
+
+
+class TestSemanticQueryCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticQueryCache(threshold=0.95, max_entries=2)
+
+    def test_similar_query_hits(self):
+        self.cache.add("vid", np.array([1.0, 0.0, 0.0]), "answer")
+        # Same direction, different magnitude -> cosine 1.0
+        self.assertEqual(self.cache.lookup("vid", np.array([2.0, 0.01, 0.0])), "answer")
+
+    def test_dissimilar_query_or_other_video_misses(self):
+        self.cache.add("vid", np.array([1.0, 0.0, 0.0]), "answer")
+        self.assertIsNone(self.cache.lookup("vid", np.array([0.0, 1.0, 0.0])))
+        self.assertIsNone(self.cache.lookup("other", np.array([1.0, 0.0, 0.0])))
+
+    def test_fifo_eviction(self):
+        self.cache.add("vid", np.array([1.0, 0.0, 0.0]), "a")
+        self.cache.add("vid", np.array([0.0, 1.0, 0.0]), "b")
+        self.cache.add("vid", np.array([0.0, 0.0, 1.0]), "c")
+        self.assertIsNone(self.cache.lookup("vid", np.array([1.0, 0.0, 0.0])))
+        self.assertEqual(self.cache.lookup("vid", np.array([0.0, 0.0, 1.0])), "c")
+
+    def test_other_index_generation_misses_and_drops_entries(self):
+        self.cache.add("vid", np.array([1.0, 0.0, 0.0]), "old", generation=1)
+        self.assertIsNone(self.cache.lookup("vid", np.array([1.0, 0.0, 0.0]), 2))
+        # Dropped on sight, even for a lookup back at the old generation
+        self.assertIsNone(self.cache.lookup("vid", np.array([1.0, 0.0, 0.0]), 1))
+
+    def test_answer_from_older_generation_is_not_stored(self):
+        self.cache.add("vid", np.array([1.0, 0.0, 0.0]), "new", generation=2)
+        self.cache.add("vid", np.array([0.0, 1.0, 0.0]), "stale", generation=1)
+        self.assertIsNone(self.cache.lookup("vid", np.array([0.0, 1.0, 0.0]), 2))
+        self.assertEqual(self.cache.lookup("vid", np.array([1.0, 0.0, 0.0]), 2), "new")
+
+    def test_expired_entries_miss(self):
+        cache = SemanticQueryCache(threshold=0.95, ttl_s=60.0)
+        with patch("src.core.semantic_cache.time.monotonic", return_value=100.0):
+            cache.add("vid", np.array([1.0, 0.0, 0.0]), "answer")
+        with patch("src.core.semantic_cache.time.monotonic", return_value=150.0):
+            self.assertEqual(cache.lookup("vid", np.array([1.0, 0.0, 0.0])), "answer")
+        with patch("src.core.semantic_cache.time.monotonic", return_value=161.0):
+            self.assertIsNone(cache.lookup("vid", np.array([1.0, 0.0, 0.0])))
+
+    def test_invalidate_one_video_or_all(self):
+        self.cache.add("vid", np.array([1.0, 0.0, 0.0]), "a")
+        self.cache.add("other", np.array([1.0, 0.0, 0.0]), "b")
+        self.cache.invalidate("vid")
+        self.assertIsNone(self.cache.lookup("vid", np.array([1.0, 0.0, 0.0])))
+        self.assertEqual(self.cache.lookup("other", np.array([1.0, 0.0, 0.0])), "b")
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.lookup("other", np.array([1.0, 0.0, 0.0])))
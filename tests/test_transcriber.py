@@ -1,24 +1,35 @@
+import os
+import tempfile
+import threading
 import unittest
-from unittest.mock import MagicMock, patch
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import patch
+from src.core import transcriber
 from src.core.transcriber import VideoTranscriber
 
 
 class TestVideoTranscriber(unittest.TestCase):
-    def setUp(self):
+    @classmethod
+    def setUpClass(cls):
         # We patch the WhisperModel class where it is IMPORTED in the transcriber
-        self.patcher = patch("src.core.transcriber.WhisperModel")
-        self.MockWhisperModel = self.patcher.start()
+        cls.patcher = patch.object(transcriber, "WhisperModel")
+        cls.MockWhisperModel = cls.patcher.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.patcher.stop()
+
+    def setUp(self):
+        self.MockWhisperModel.reset_mock(return_value=True, side_effect=True)
 
         # Instantiate transcriber
         self.transcriber = VideoTranscriber()
 
-    def tearDown(self):
-        self.patcher.stop()
-
-    @patch("src.core.transcriber.yt_dlp.YoutubeDL")
+    @patch.object(transcriber.yt_dlp, "YoutubeDL")
     def test_download_audio_success(self, mock_ytdl):
         # Setup mock behavior
-        mock_instance = mock_ytdl.return_value.__enter__.return_value
+        mock_instance = mock_ytdl.return_value
         mock_instance.extract_info.return_value = {
             "id": "test_id",
             "title": "Test Title",
@@ -37,15 +48,44 @@ class TestVideoTranscriber(unittest.TestCase):
         # The transcriber returns f"{output_path}/{info['id']}.mp3"
         self.assertTrue(path.endswith("test_id.mp3"))
 
+    @patch.object(transcriber.yt_dlp, "YoutubeDL")
+    def test_download_audio_reuses_ydl_instance(self, mock_ytdl):
+        """The YoutubeDL instance is built once and reused across downloads."""
+        mock_ytdl.return_value.extract_info.return_value = {"id": "x", "title": "T"}
+
+        self.transcriber.download_audio("http://youtube.com/a")
+        self.transcriber.download_audio("http://youtube.com/b")
+
+        self.assertEqual(mock_ytdl.call_count, 1)
+        self.assertEqual(mock_ytdl.return_value.extract_info.call_count, 2)
+
+    @patch.object(transcriber.yt_dlp, "YoutubeDL")
+    def test_concurrent_downloads_do_not_queue_on_one_instance(self, mock_ytdl):
+        """Each thread gets its own YoutubeDL, so downloads overlap."""
+        both_downloading = threading.Barrier(2, timeout=5)
+
+        def extract_info(url, download):
+            both_downloading.wait()  # Breaks if the second one is held back
+            return {"id": "x", "title": "T"}
+
+        mock_ytdl.return_value.extract_info.side_effect = extract_info
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [
+                pool.submit(self.transcriber.download_audio, f"http://youtube.com/{c}")
+                for c in "ab"
+            ]
+            for future in futures:
+                future.result()
+
+        self.assertEqual(mock_ytdl.call_count, 2)
+
     def test_transcribe_segments(self):
         # Logic:
         # 1. Mock self.transcriber.model.transcribe
         # 2. It returns (segments, info)
 
-        MockSegment = MagicMock()
-        MockSegment.start = 0.0
-        MockSegment.end = 5.0
-        MockSegment.text = "Hello world"
+        MockSegment = SimpleNamespace(start=0.0, end=5.0, text="Hello world")
 
         self.transcriber.model.transcribe.return_value = ([MockSegment], None)
 
@@ -54,3 +94,78 @@ class TestVideoTranscriber(unittest.TestCase):
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]["text"], "Hello world")
         self.assertEqual(results[0]["start"], 0.0)
+
+    def test_transcribe_stream_is_lazy(self):
+        """Segments are pulled from Whisper one at a time, not all up front."""
+        pulled = []
+
+        def whisper_segments():
+            for i in range(3):
+                pulled.append(i)
+                yield SimpleNamespace(start=float(i), end=float(i + 1), text=f"seg {i}")
+
+        self.transcriber.model.transcribe.return_value = (whisper_segments(), None)
+
+        stream = self.transcriber.transcribe_stream("dummy/path.mp3")
+        first = next(stream)
+
+        self.assertEqual(first, {"start": 0.0, "end": 1.0, "text": "seg 0"})
+        self.assertEqual(pulled, [0])
+        self.assertEqual([s["text"] for s in stream], ["seg 1", "seg 2"])
+
+    def test_transcribe_decoding_options(self):
+        """Tiny model decodes greedily and without cross-window conditioning."""
+        self.transcriber.model.transcribe.return_value = ([], None)
+
+        self.transcriber.transcribe("dummy/path.mp3")
+
+        kwargs = self.transcriber.model.transcribe.call_args[1]
+        self.assertEqual(kwargs["beam_size"], 1)
+        self.assertFalse(kwargs["condition_on_previous_text"])
+
+    def test_transcribe_cached_reuses_transcript_for_same_audio(self):
+        """With TRANSCRIPT_CACHE on, Whisper runs once per audio content."""
+        segment = SimpleNamespace(start=0.0, end=2.5, text="Hola")
+        self.transcriber.model.transcribe.return_value = ([segment], None)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            audio_path = os.path.join(tmp, "video.mp3")
+            with open(audio_path, "wb") as f:
+                f.write(b"fake mp3 bytes")
+            self.transcriber.transcript_cache = True
+            self.transcriber.transcript_cache_dir = os.path.join(tmp, "transcripts")
+
+            first = self.transcriber.transcribe_cached(audio_path)
+            second = self.transcriber.transcribe_cached(audio_path)
+
+            with open(audio_path, "wb") as f:
+                f.write(b"other mp3 bytes")
+            self.transcriber.transcribe_cached(audio_path)
+
+        self.assertEqual(first, [{"start": 0.0, "end": 2.5, "text": "Hola"}])
+        self.assertEqual(second, first)
+        self.assertEqual(self.transcriber.model.transcribe.call_count, 2)
+
+    def test_transcript_cache_flag_overrides_environment(self):
+        """The app turns the cache on regardless of TRANSCRIPT_CACHE."""
+        with patch.dict(os.environ, {"TRANSCRIPT_CACHE": "0"}):
+            self.assertFalse(VideoTranscriber().transcript_cache)
+            self.assertTrue(VideoTranscriber(transcript_cache=True).transcript_cache)
+
+    def test_transcribe_stream_cached_stores_after_full_consumption(self):
+        segment = SimpleNamespace(start=0.0, end=1.0, text="Hola")
+        self.transcriber.model.transcribe.return_value = ([segment], None)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            audio_path = os.path.join(tmp, "video.mp3")
+            with open(audio_path, "wb") as f:
+                f.write(b"fake mp3 bytes")
+            self.transcriber.transcript_cache = True
+            self.transcriber.transcript_cache_dir = os.path.join(tmp, "transcripts")
+
+            streamed = list(self.transcriber.transcribe_stream_cached(audio_path))
+            replayed = list(self.transcriber.transcribe_stream_cached(audio_path))
+
+        self.assertEqual(streamed, [{"start": 0.0, "end": 1.0, "text": "Hola"}])
+        self.assertEqual(replayed, streamed)
+        self.assertEqual(self.transcriber.model.transcribe.call_count, 1)
@@ -1,45 +1,94 @@
+import copy
+import os
+import struct
+import tempfile
+import threading
 import unittest
-from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+from unittest.mock import patch
 import numpy as np
+from src.core.semantic_cache import SemanticQueryCache
+from src.database import vector_store
 from src.database.vector_store import VectorDatabase
 
 
+# Canned encoder outputs shared by every test. Each array views immutable
+# packed bytes, so it is read-only and built without parsing a Python list.
+# float64 keeps exact equality with the [0.1, 0.2, 0.3] literals asserted below.
+_DENSE_VEC = np.frombuffer(struct.pack("<3d", 0.1, 0.2, 0.3), dtype="<f8")
+_SPARSE_IDX = np.frombuffer(struct.pack("<2q", 0, 1), dtype="<i8")
+_SPARSE_VALS = np.frombuffer(struct.pack("<2d", 0.5, 0.8), dtype="<f8")
+_UNIT_SPARSE = SimpleNamespace(
+    indices=np.frombuffer(struct.pack("<q", 0), dtype="<i8"),
+    values=np.frombuffer(struct.pack("<d", 1.0), dtype="<f8"),
+)
+
+
 class TestVectorDatabase(unittest.TestCase):
-    def setUp(self):
-        # Patch the dependencies: QdrantClient, FastEmbed, SentenceTransformer
-        # We need to patch where they are used.
-        self.patcher_qdrant = patch("src.database.vector_store.QdrantClient")
-        self.MockQdrant = self.patcher_qdrant.start()
-        self.MockQdrant.return_value.query_points.return_value.points = []
+    @classmethod
+    def setUpClass(cls):
+        # Patch the dependencies once per class: QdrantClient, FastEmbed
+        # (Sparse + Dense). We need to patch where they are used.
+        cls.patcher_qdrant = patch.object(vector_store, "QdrantClient")
+        cls.MockQdrant = cls.patcher_qdrant.start()
 
-        self.patcher_fastembed = patch("src.database.vector_store.SparseTextEmbedding")
-        self.MockFastEmbed = patch(
-            "src.database.vector_store.SparseTextEmbedding"
-        ).start()
+        cls.patcher_fastembed = patch.object(vector_store, "SparseTextEmbedding")
+        cls.MockFastEmbed = cls.patcher_fastembed.start()
 
-        self.patcher_sentence = patch("src.database.vector_store.SentenceTransformer")
-        self.MockSentence = self.patcher_sentence.start()
+        cls.patcher_dense = patch.object(vector_store, "TextEmbedding")
+        cls.MockDense = cls.patcher_dense.start()
 
-        # Initialize DB with mocks
-        self.db = VectorDatabase()
+        # Keep the persistent document cache and warm-up off unless a test
+        # opts in
+        cls.patcher_env = patch.dict(
+            "os.environ", {"EMBEDDING_CACHE_PATH": "", "VECTOR_WARMUP": "0"}
+        )
+        cls.patcher_env.start()
 
-    def tearDown(self):
-        self.patcher_qdrant.stop()
-        self.patcher_fastembed.stop()
-        self.patcher_sentence.stop()
+        # Canned BM25 output, built once; tests take a shallow copy
+        cls._mock_sparse_template = SimpleNamespace(
+            indices=_SPARSE_IDX, values=_SPARSE_VALS
+        )
 
-    def test_upsert_chunks(self):
-        # Setup mocks
-        mock_client = self.MockQdrant.return_value
+        # One instance for the whole class; it holds the patched client and
+        # model instances, which setUp resets in place
+        cls._db = VectorDatabase()
 
-        # Mock embedding generation
-        self.MockSentence.return_value.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+    @classmethod
+    def tearDownClass(cls):
+        cls.patcher_qdrant.stop()
+        cls.patcher_fastembed.stop()
+        cls.patcher_dense.stop()
+        cls.patcher_env.stop()
 
-        mock_sparse_vec = MagicMock()
-        mock_sparse_vec.indices = np.array([0, 1])
-        mock_sparse_vec.values = np.array([0.5, 0.8])
+    def setUp(self):
+        # Fresh return values (and no leftover side effects) for every test,
+        # without re-patching the modules. The instances stay the same objects
+        # so the shared VectorDatabase keeps pointing at them.
+        for mock in (self.MockQdrant, self.MockFastEmbed, self.MockDense):
+            mock.reset_mock()
+            mock.return_value.reset_mock(return_value=True, side_effect=True)
+        self.MockQdrant.return_value.query_points.return_value.points = []
+
+        # Models, query embeddings and results are cached module-wide; start cold
+        vector_store._load_dense_model.cache_clear()
+        vector_store._load_sparse_model.cache_clear()
+        vector_store._dense_cache_model_key.cache_clear()
+        vector_store._QUERY_EMBEDDING_CACHE.clear()
+        vector_store._SEARCH_RESULT_CACHE.clear()
+
+        self.db = self._db
 
-        self.MockFastEmbed.return_value.embed.return_value = [mock_sparse_vec]
+    def _prime_embeddings(self):
+        """Single-vector dense and BM25 outputs for one chunk or one query."""
+        self.MockDense.return_value.embed.return_value = [_DENSE_VEC]
+        sparse = self.MockFastEmbed.return_value
+        sparse.embed.return_value = [copy.copy(self._mock_sparse_template)]
+        sparse.query_embed.return_value = [copy.copy(self._mock_sparse_template)]
+
+    def test_upsert_chunks(self):
+        mock_client = self.MockQdrant.return_value
+        self._prime_embeddings()
 
         chunks = [{"text": "Test chunk", "metadata": {"source": "audio"}}]
 
@@ -52,62 +101,598 @@ class TestVectorDatabase(unittest.TestCase):
         call_args = mock_client.upsert.call_args
         self.assertEqual(call_args[1]["collection_name"], "video_knowledge_hybrid")
 
-    def test_search_filtering(self):
-        """Verify that search passes the video_id filter to Qdrant."""
+    def test_point_ids_are_deterministic_integers(self):
+        """Re-ingesting the same chunks reuses ids, so Qdrant overwrites them."""
         mock_client = self.MockQdrant.return_value
+        self.MockDense.return_value.embed.side_effect = lambda batch, batch_size: [
+            np.array([0.1, 0.2]) for _ in batch
+        ]
+        self.MockFastEmbed.return_value.embed.side_effect = lambda batch, batch_size: [
+            _UNIT_SPARSE for _ in batch
+        ]
+        chunks = [
+            {"text": "first", "start": 0.0, "end": 2.0},
+            {"text": "second", "start": 2.0, "end": 4.0},
+        ]
 
-        # Mock embeddings for search query
-        self.MockSentence.return_value.encode.return_value = np.array([0.1, 0.2, 0.3])
+        self.db.upsert_chunks(chunks, "vid")
+        first_ids = [p.id for p in mock_client.upsert.call_args[1]["points"]]
+        self.db.upsert_chunks(chunks, "vid")
+        second_ids = [p.id for p in mock_client.upsert.call_args[1]["points"]]
 
-        mock_sparse_vec = MagicMock()
-        mock_sparse_vec.indices = np.array([0, 1])
-        mock_sparse_vec.values = np.array([0.5, 0.8])
-        self.MockFastEmbed.return_value.embed.return_value = [mock_sparse_vec]
+        self.assertEqual(first_ids, second_ids)
+        self.assertTrue(all(isinstance(point_id, int) for point_id in first_ids))
+        self.assertEqual(len(set(first_ids)), 2)
 
-        # Call search with video_id
-        target_video_id = "test_vid_abc"
-        self.db.search("test query", limit=5, video_id=target_video_id)
+    def test_upserted_points_keep_both_vectors_over_grpc(self):
+        """Unvalidated points still convert to protobuf with dense + sparse."""
+        from qdrant_client.conversions.conversion import RestToGrpc
 
-        # Check query_points call
-        self.assertTrue(mock_client.query_points.called)
-        call_kwargs = mock_client.query_points.call_args[1]
+        self.MockDense.return_value.embed.return_value = [np.array([0.5, 0.25])]
+        self.MockFastEmbed.return_value.embed.return_value = [
+            SimpleNamespace(indices=np.array([4, 9]), values=np.array([0.5, 0.75]))
+        ]
 
-        # Inspect prefetch filters
-        prefetches = call_kwargs.get("prefetch", [])
-        self.assertTrue(len(prefetches) > 0)
+        self.db.upsert_chunks([{"text": "chunk", "start": 1.0}], "vid")
 
-        # Retrieve the filter from the first prefetch
-        actual_filter = prefetches[0].filter
-        self.assertIsNotNone(
-            actual_filter, "Filter should not be None when video_id is provided"
+        point = self.MockQdrant.return_value.upsert.call_args[1]["points"][0]
+        vectors = RestToGrpc.convert_point_struct(point).vectors.vectors.vectors
+        self.assertEqual(list(vectors["text-dense"].dense.data), [0.5, 0.25])
+        self.assertEqual(list(vectors["text-sparse"].sparse.indices), [4, 9])
+
+    def test_upsert_builds_audio_and_visual_payloads(self):
+        """Both chunk shapes map to the payload fields the engine reads."""
+        self.MockDense.return_value.embed.side_effect = lambda batch, batch_size: [
+            np.array([0.1, 0.2]) for _ in batch
+        ]
+        self.MockFastEmbed.return_value.embed.side_effect = lambda batch, batch_size: [
+            _UNIT_SPARSE for _ in batch
+        ]
+        chunks = [
+            {"text": "spoken", "start": 1.0, "end": 3.0},
+            {"page_content": "   ", "metadata": {"timestamp": 4.0}},
+            {
+                "page_content": "SELECT *",
+                "metadata": {"timestamp": 5.0, "frame_path": "data/tmp/f.jpg"},
+            },
+            {
+                "page_content": "Slide 2",
+                "metadata": {
+                    "timestamp": 10.0,
+                    "end_timestamp": 40.0,
+                    "frame_path": "data/tmp/g.jpg",
+                },
+            },
+        ]
+
+        self.db.upsert_chunks(chunks, "vid")
+
+        points = self.MockQdrant.return_value.upsert.call_args[1]["points"]
+        self.assertEqual(
+            [p.payload for p in points],
+            [
+                {
+                    "video_id": "vid",
+                    "text": "spoken",
+                    "type": "audio",
+                    "start": 1.0,
+                    "end": 3.0,
+                },
+                {
+                    "video_id": "vid",
+                    "text": "SELECT *",
+                    "type": "visual",
+                    "start": 5.0,
+                    "end": 5.0,
+                    "frame_path": "data/tmp/f.jpg",
+                },
+                {
+                    "video_id": "vid",
+                    "text": "Slide 2",
+                    "type": "visual",
+                    "start": 10.0,
+                    "end": 40.0,
+                    "frame_path": "data/tmp/g.jpg",
+                },
+            ],
         )
 
-        # We can inspect the filter structure if we want deep verification,
-        # but verifying it's not None and passed is a good start.
-        # Structure: Filter(must=[FieldCondition(key='video_id',
-        #   match=MatchValue(value='test_vid_abc'))])
+    def test_upsert_skips_blank_chunks_before_embedding(self):
+        """Blank chunks are dropped before the single batched encoder call."""
+        mock_client = self.MockQdrant.return_value
+        self._prime_embeddings()
+
+        chunks = [
+            {"text": "   "},
+            {"text": None},
+            {"page_content": "", "metadata": {}},
+            {"text": "Real content"},
+        ]
+        self.db.upsert_chunks(chunks, "video_123")
+
+        embed_args = self.MockDense.return_value.embed.call_args[0]
+        self.assertEqual(embed_args[0], ["Real content"])
+        points = mock_client.upsert.call_args[1]["points"]
+        self.assertEqual(len(points), 1)
+        self.assertEqual(points[0].vector["text-dense"], [0.1, 0.2, 0.3])
 
-        must_conditions = actual_filter.must
-        self.assertTrue(len(must_conditions) > 0)
-        self.assertEqual(must_conditions[0].key, "video_id")
-        self.assertEqual(must_conditions[0].match.value, target_video_id)
+    def test_upsert_batches_and_waits_on_last(self):
+        """Points are sent in batches; only the final batch waits for the flush."""
+        mock_client = self.MockQdrant.return_value
+        self.MockDense.return_value.embed.return_value = [_DENSE_VEC] * 5
+        mock_sparse_vec = copy.copy(self._mock_sparse_template)
+        self.MockFastEmbed.return_value.embed.return_value = [mock_sparse_vec] * 5
+
+        chunks = [{"text": f"chunk {i}"} for i in range(5)]
+        self.db.upsert_chunks(chunks, "video_123", batch_size=2)
 
-    def test_search_no_filter(self):
-        """Verify that search works without video_id (no filter applied)."""
+        calls = mock_client.upsert.call_args_list
+        self.assertEqual([len(c[1]["points"]) for c in calls], [2, 2, 1])
+        self.assertEqual([c[1]["wait"] for c in calls], [False, False, True])
+        # Lazily built batches still cover every chunk exactly once
+        texts = [p.payload["text"] for c in calls for p in c[1]["points"]]
+        self.assertEqual(texts, [c["text"] for c in chunks])
+
+    def test_upsert_stream_batches_a_generator_with_stable_ids(self):
+        """Streamed chunks are indexed batch by batch with the same ids."""
         mock_client = self.MockQdrant.return_value
+        self.MockDense.return_value.embed.side_effect = lambda texts, **_: [
+            _DENSE_VEC for _ in texts
+        ]
+        mock_sparse_vec = copy.copy(self._mock_sparse_template)
+        self.MockFastEmbed.return_value.embed.side_effect = lambda texts, **_: [
+            mock_sparse_vec for _ in texts
+        ]
+        chunks = [{"text": f"chunk {i}", "start": float(i)} for i in range(5)]
+
+        indexed = self.db.upsert_stream(iter(chunks), "video_123", batch_size=2)
+
+        calls = mock_client.upsert.call_args_list
+        self.assertEqual(indexed, 5)
+        self.assertEqual([len(c[1]["points"]) for c in calls], [2, 2, 1])
+        self.assertEqual([c[1]["wait"] for c in calls], [False, False, True])
+        streamed_ids = [p.id for c in calls for p in c[1]["points"]]
+
+        mock_client.upsert.reset_mock()
+        self.db.upsert_chunks(chunks, "video_123")
+        self.assertEqual(
+            [p.id for p in mock_client.upsert.call_args[1]["points"]], streamed_ids
+        )
+
+    def test_upsert_makes_cached_paraphrases_miss(self):
+        """Answers cached before a re-index are not served after it."""
+        cache = SemanticQueryCache(threshold=0.95)
+        question = np.array([1.0, 0.0, 0.0])
+        before = vector_store.index_generation()
+        cache.add("video_123", question, "old answer", before)
+        self._prime_embeddings()
+
+        self.db.upsert_chunks([{"text": "Re-indexed chunk"}], "video_123")
+
+        after = vector_store.index_generation()
+        self.assertNotEqual(after, before)
+        paraphrase = np.array([1.0, 0.02, 0.0])
+        self.assertIsNone(cache.lookup("video_123", paraphrase, after))
+
+    def test_search_filter_follows_video_id(self):
+        """search() filters the prefetches by video_id only when one is given."""
+        query_points = self.MockQdrant.return_value.query_points
+        self._prime_embeddings()
+
+        for video_id in (None, "test_vid_abc"):
+            with self.subTest(video_id=video_id):
+                self.db.search("test query", limit=5, video_id=video_id)
+
+                # Bind the recorded call once; the rest are plain qdrant models
+                kwargs = query_points.call_args.kwargs
+                prefetches = kwargs["prefetch"]
+                self.assertTrue(len(prefetches) > 0)
+                flt = prefetches[0].filter
+
+                # Fusion is weighted RRF over [dense, sparse]
+                self.assertEqual(kwargs["query"].rrf.weights, self.db.rrf_weights)
+
+                if video_id is None:
+                    self.assertIsNone(flt)
+                    continue
+
+                # A real Filter(must=[FieldCondition(key='video_id',
+                #   match=MatchValue(value='test_vid_abc'))]), not a Mock tree
+                self.assertIsInstance(flt, vector_store.models.Filter)
+                self.assertTrue(len(flt.must) > 0)
+                must0 = flt.must[0]
+                self.assertIsInstance(must0, vector_store.models.FieldCondition)
+                self.assertEqual(must0.key, "video_id")
+                self.assertEqual(must0.match.value, video_id)
+
+    def test_search_encodes_dense_and_sparse_on_separate_threads(self):
+        """The dense forward pass overlaps with BM25 on the calling thread."""
+        threads = {}
+
+        def dense_embed(batch, batch_size):
+            threads["dense"] = threading.current_thread()
+            return [_DENSE_VEC for _ in batch]
+
+        def sparse_embed(query):
+            threads["sparse"] = threading.current_thread()
+            return [_UNIT_SPARSE]
+
+        self.MockDense.return_value.embed.side_effect = dense_embed
+        self.MockFastEmbed.return_value.query_embed.side_effect = sparse_embed
+
+        self.db.search("parallel query")
+
+        self.assertIs(threads["sparse"], threading.current_thread())
+        self.assertIsNot(threads["dense"], threading.current_thread())
+        prefetches = self.MockQdrant.return_value.query_points.call_args[1]["prefetch"]
+        self.assertEqual(prefetches[0].query, [0.1, 0.2, 0.3])
+
+    def test_repeat_query_reuses_cached_embeddings(self):
+        """The second identical search skips both query encoders."""
+        self._prime_embeddings()
+
+        # Different limits: the result cache misses, the embedding cache hits
+        self.db.search("same question", limit=5, video_id="vid")
+        self.db.search("same question", limit=3, video_id="vid")
+
+        self.assertEqual(self.MockDense.return_value.embed.call_count, 1)
+        self.assertEqual(self.MockFastEmbed.return_value.query_embed.call_count, 1)
+        self.assertEqual(self.MockQdrant.return_value.query_points.call_count, 2)
+
+    def test_search_many_sends_misses_in_one_batch(self):
+        """Several queries share one query_batch_points call; hits are reused."""
+        mock_client = self.MockQdrant.return_value
+        self.MockDense.return_value.embed.side_effect = lambda batch, batch_size: [
+            np.array([0.0, 1.0]) for _ in batch
+        ]
+        self.MockFastEmbed.return_value.query_embed.side_effect = lambda q: [
+            SimpleNamespace(indices=np.array([len(q)]), values=np.array([1.0]))
+        ]
+        mock_client.query_points.return_value.points = [
+            SimpleNamespace(payload={"text": "cached", "start": 0.0})
+        ]
+        self.db.search("first", video_id="vid")
+
+        mock_client.query_batch_points.return_value = [
+            SimpleNamespace(
+                points=[SimpleNamespace(payload={"text": "b", "start": 1.0})]
+            ),
+            SimpleNamespace(points=[]),
+        ]
+        vectors = np.array([[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]])
+        results = self.db.search_many(
+            ["first", "second", "third"], video_id="vid", query_vectors=vectors
+        )
+
+        self.assertEqual(
+            [[p["text"] for p in r] for r in results], [["cached"], ["b"], []]
+        )
+        mock_client.query_batch_points.assert_called_once()
+        requests = mock_client.query_batch_points.call_args[1]["requests"]
+        self.assertEqual(len(requests), 2)
+        self.assertEqual(requests[0].prefetch[0].query, [0.3, 0.4])
+        self.assertEqual(requests[1].prefetch[1].query.indices, [5])
+        self.assertEqual(requests[0].prefetch[0].filter.must[0].match.value, "vid")
+
+    def test_search_results_cached_until_upsert_or_ttl(self):
+        """Identical searches reuse results; upserts and the TTL expire them."""
+        mock_client = self.MockQdrant.return_value
+        self.MockDense.return_value.embed.side_effect = lambda batch, batch_size: [
+            np.array([0.1, 0.2]) for _ in batch
+        ]
+        mock_sparse_vec = _UNIT_SPARSE
+        self.MockFastEmbed.return_value.query_embed.return_value = [mock_sparse_vec]
+        self.MockFastEmbed.return_value.embed.side_effect = lambda batch, batch_size: [
+            mock_sparse_vec for _ in batch
+        ]
+        mock_client.query_points.return_value.points = [
+            SimpleNamespace(payload={"text": "hit", "start": 1.0})
+        ]
+
+        first = self.db.search("q", video_id="vid")
+        second = self.db.search("q", video_id="vid")
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+        self.assertEqual(mock_client.query_points.call_count, 1)
+
+        self.db.upsert_chunks([{"text": "new chunk"}], "vid")
+        self.db.search("q", video_id="vid")
+        self.assertEqual(mock_client.query_points.call_count, 2)
+
+        with patch.object(vector_store, "SEARCH_RESULT_TTL_S", -1.0):
+            self.db.search("q", limit=2, video_id="vid")
+        self.db.search("q", limit=2, video_id="vid")
+        self.assertEqual(mock_client.query_points.call_count, 4)
+
+    @patch.dict("os.environ", {"QDRANT_GRPC_PORT": "7334"})
+    def test_client_prefers_grpc(self):
+        """Data-plane calls go over gRPC on the configured port."""
+        VectorDatabase()
+        client_kwargs = self.MockQdrant.call_args[1]
+        self.assertTrue(client_kwargs["prefer_grpc"])
+        self.assertEqual(client_kwargs["grpc_port"], 7334)
+
+    @patch.dict("os.environ", {"VECTOR_WARMUP": "1"})
+    def test_encoders_warmed_once_when_loaded(self):
+        """Each encoder runs one dummy encode at load time, not per instance."""
+        vector_store._load_dense_model.cache_clear()
+        vector_store._load_sparse_model.cache_clear()
+        self.MockDense.return_value.embed.reset_mock()
+        self.MockFastEmbed.return_value.embed.reset_mock()
+
+        VectorDatabase()
+        VectorDatabase()
+
+        self.MockDense.return_value.embed.assert_called_once_with(
+            ["warmup"], batch_size=1
+        )
+        self.MockFastEmbed.return_value.embed.assert_called_once_with(
+            ["warmup"], batch_size=1
+        )
+        self.assertEqual(len(vector_store._QUERY_EMBEDDING_CACHE), 0)
+
+    def test_models_are_loaded_once_per_process(self):
+        """A second VectorDatabase reuses the already loaded encoders."""
+        second = VectorDatabase()
+        self.assertIs(second.dense_model, self.db.dense_model)
+        self.assertIs(second.sparse_model, self.db.sparse_model)
+        self.assertEqual(self.MockDense.call_count, 1)
+        self.assertEqual(self.MockFastEmbed.call_count, 1)
+
+    def test_new_collection_is_quantized_with_pinned_hnsw(self):
+        """Dense vectors get INT8 quantization and an explicit HNSW graph."""
+        self.MockQdrant.return_value.collection_exists.return_value = False
+        VectorDatabase()
+
+        kwargs = self.MockQdrant.return_value.create_collection.call_args[1]
+        dense = kwargs["vectors_config"]["text-dense"]
+        self.assertEqual(
+            (dense.hnsw_config.m, dense.hnsw_config.ef_construct), (16, 128)
+        )
+        self.assertEqual(dense.datatype, vector_store.models.Datatype.FLOAT16)
+        self.assertEqual(dense.distance, vector_store.models.Distance.COSINE)
+        self.assertTrue(dense.on_disk)
+        self.assertEqual(
+            kwargs["sparse_vectors_config"]["text-sparse"].modifier,
+            vector_store.models.Modifier.IDF,
+        )
+        self.assertEqual(
+            kwargs["quantization_config"].scalar.type,
+            vector_store.models.ScalarType.INT8,
+        )
+
+    @patch.dict("os.environ", {"DENSE_MODEL_INT8": "true"})
+    def test_int8_dense_model_opt_in(self):
+        """DENSE_MODEL_INT8 registers and loads the quantized ONNX MiniLM."""
+        self.MockDense.list_supported_models.return_value = []
+        db = VectorDatabase()
+
+        register_kwargs = self.MockDense.add_custom_model.call_args[1]
+        self.assertEqual(register_kwargs["model_file"], "onnx/model_quantized.onnx")
+        self.assertEqual(db.dense_model_id, vector_store.DENSE_MODEL_INT8_ID)
+        self.assertEqual(
+            self.MockDense.call_args[1]["model_name"], vector_store.DENSE_MODEL_INT8_ID
+        )
+
+    def test_payload_indexes_created_once(self):
+        """Filterable payload fields are backed by payload indexes."""
+        schema = vector_store.models.PayloadSchemaType
+        mock_client = self.MockQdrant.return_value
+        mock_client.get_collection.return_value.payload_schema = {}
+        VectorDatabase()
+        created = {
+            c[1]["field_name"]: c[1]["field_schema"]
+            for c in mock_client.create_payload_index.call_args_list
+        }
+        self.assertEqual(
+            created,
+            {
+                "video_id": schema.KEYWORD,
+                "type": schema.KEYWORD,
+                "start": schema.FLOAT,
+            },
+        )
+
+        # Only the missing ones are backfilled
+        mock_client.create_payload_index.reset_mock()
+        mock_client.get_collection.return_value.payload_schema = {
+            "video_id": "idx",
+            "type": "idx",
+        }
+        VectorDatabase()
+        mock_client.create_payload_index.assert_called_once()
+        self.assertEqual(
+            mock_client.create_payload_index.call_args[1]["field_name"], "start"
+        )
+
+    def test_sparse_idf_backfilled_on_existing_collection(self):
+        """Collections created without the IDF modifier get it enabled once."""
+        mock_client = self.MockQdrant.return_value
+        info = mock_client.get_collection.return_value
+        info.config.params.sparse_vectors = {
+            "text-sparse": vector_store.models.SparseVectorParams()
+        }
+        mock_client.update_collection.reset_mock()
+        VectorDatabase()
+        sparse = mock_client.update_collection.call_args[1]["sparse_vectors_config"]
+        self.assertEqual(
+            sparse["text-sparse"].modifier, vector_store.models.Modifier.IDF
+        )
+
+        mock_client.update_collection.reset_mock()
+        info.config.params.sparse_vectors = {
+            "text-sparse": vector_store.models.SparseVectorParams(
+                modifier=vector_store.models.Modifier.IDF
+            )
+        }
+        VectorDatabase()
+        mock_client.update_collection.assert_not_called()
+
+    def test_bulk_mode_pauses_and_restores_indexing(self):
+        """The collection's own threshold comes back, not Qdrant's default."""
+        mock_client = self.MockQdrant.return_value
+        config = mock_client.get_collection.return_value.config
+        config.optimizer_config.indexing_threshold = 50000
+        mock_client.update_collection.reset_mock()
+
+        self.db.prepare_bulk_mode()
+        optimizers = mock_client.update_collection.call_args[1]["optimizers_config"]
+        self.assertEqual(optimizers.indexing_threshold, 0)
+
+        self.db.finalize_bulk_mode()
+        optimizers = mock_client.update_collection.call_args[1]["optimizers_config"]
+        self.assertEqual(optimizers.indexing_threshold, 50000)
+
+    def test_bulk_mode_leaves_overlapping_load_to_restore(self):
+        """A load that finds indexing already paused never restores it."""
+        mock_client = self.MockQdrant.return_value
+        config = mock_client.get_collection.return_value.config
+        config.optimizer_config.indexing_threshold = 0
+        mock_client.update_collection.reset_mock()
+
+        self.db.prepare_bulk_mode()
+        self.db.finalize_bulk_mode()
+
+        mock_client.update_collection.assert_not_called()
+
+    def test_dense_originals_moved_on_disk_for_existing_collection(self):
+        """In-RAM dense originals are switched to on-disk storage once."""
+        mock_client = self.MockQdrant.return_value
+        info = mock_client.get_collection.return_value
+        info.config.params.sparse_vectors = {}
+        info.config.params.vectors = {
+            "text-dense": vector_store.models.VectorParams(
+                size=384, distance=vector_store.models.Distance.COSINE
+            )
+        }
+        mock_client.update_collection.reset_mock()
+        VectorDatabase()
+        dense = mock_client.update_collection.call_args[1]["vectors_config"]
+        self.assertTrue(dense["text-dense"].on_disk)
+
+        mock_client.update_collection.reset_mock()
+        info.config.params.vectors["text-dense"].on_disk = True
+        VectorDatabase()
+        mock_client.update_collection.assert_not_called()
+
+    def test_dense_embedding_is_length_bucketed_but_order_preserving(self):
+        """Texts are encoded shortest-first and mapped back to input order."""
+        texts = ["a much longer transcript chunk", "ok", "medium text"]
+
+        def fake_embed(batch, batch_size):
+            return [np.array([float(len(t))]) for t in batch]
+
+        self.MockDense.return_value.embed.side_effect = fake_embed
+
+        vectors = self.db._embed_dense_bucketed(texts)
+
+        embedded = self.MockDense.return_value.embed.call_args[0][0]
+        self.assertEqual(embedded, ["ok", "medium text", texts[0]])
+        self.assertEqual(vectors[:, 0].tolist(), [float(len(t)) for t in texts])
+
+    @patch.dict("os.environ", {"EMBED_PARALLEL": "0"})
+    def test_embed_parallel_applies_to_documents_only(self):
+        """EMBED_PARALLEL fans out ingestion encoding but never query encoding."""
+        db = VectorDatabase()
+        dense_embed = self.MockDense.return_value.embed
+        dense_embed.side_effect = lambda batch, **kwargs: [
+            np.array([0.1, 0.2]) for _ in batch
+        ]
+        self.MockFastEmbed.return_value.embed.side_effect = lambda batch, **kwargs: [
+            _UNIT_SPARSE for _ in batch
+        ]
+
+        db.upsert_chunks([{"text": "doc"}], "vid")
+        self.assertEqual(dense_embed.call_args[1]["parallel"], 0)
+
+        db.encode_query("question")
+        self.assertNotIn("parallel", dense_embed.call_args[1])
+
+    def test_encode_queries_batches_misses_only(self):
+        """Cached queries are reused; the rest share one encoder call."""
+        self.MockDense.return_value.embed.side_effect = lambda batch, batch_size: [
+            np.array([float(len(q)), 1.0]) for q in batch
+        ]
+        self.db.encode_query("cached")
+        self.MockDense.return_value.embed.reset_mock()
+
+        vectors = self.db.encode_queries(["cached", "new one", "x", "new one"])
+
+        self.MockDense.return_value.embed.assert_called_once()
+        self.assertEqual(
+            self.MockDense.return_value.embed.call_args[0][0], ["x", "new one"]
+        )
+        self.assertEqual(vectors[:, 0].tolist(), [6.0, 7.0, 1.0, 7.0])
+
+    def test_reingest_hits_persistent_embedding_cache(self):
+        """Chunks embedded once are served from SQLite on the next upsert."""
+        self.MockDense.return_value.embed.side_effect = lambda batch, batch_size: [
+            np.array([0.25, 0.5]) for _ in batch
+        ]
+        mock_sparse_vec = SimpleNamespace(
+            indices=np.array([3, 7]), values=np.array([0.5, 0.8])
+        )
+        self.MockFastEmbed.return_value.embed.side_effect = lambda batch, batch_size: [
+            mock_sparse_vec for _ in batch
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = os.path.join(tmp, "emb.sqlite3")
+            with patch.dict("os.environ", {"EMBEDDING_CACHE_PATH": cache_path}):
+                db = VectorDatabase()
+            chunks = [{"text": "Cached chunk"}]
+            db.upsert_chunks(chunks, "vid")
+            fresh = self.MockQdrant.return_value.upsert.call_args[1]["points"][0]
+            self.MockDense.return_value.embed.reset_mock()
+            self.MockFastEmbed.return_value.embed.reset_mock()
+
+            db.upsert_chunks(chunks, "vid")
+            db.embedding_cache.close()
+
+        self.MockDense.return_value.embed.assert_not_called()
+        self.MockFastEmbed.return_value.embed.assert_not_called()
+        point = self.MockQdrant.return_value.upsert.call_args[1]["points"][0]
+        self.assertEqual(point.vector["text-dense"], [0.25, 0.5])
+        self.assertEqual(point.vector["text-sparse"].indices, [3, 7])
+        # Fresh and cached sparse vectors are bit-identical (both u32 / f32)
+        self.assertEqual(
+            point.vector["text-sparse"].values, fresh.vector["text-sparse"].values
+        )
+
+    @patch.dict(
+        "os.environ", {"DENSE_MODEL_INT8": "true", "DENSE_MODEL_PATH": "models/x"}
+    )
+    def test_int8_dense_model_from_local_export(self):
+        """DENSE_MODEL_PATH loads a locally quantized export instead of the hub."""
+        self.MockDense.list_supported_models.return_value = []
+        VectorDatabase()
+        dense_kwargs = self.MockDense.call_args[1]
+        self.assertEqual(dense_kwargs["model_name"], vector_store.DENSE_MODEL_INT8_ID)
+        self.assertEqual(dense_kwargs["specific_model_path"], "models/x")
 
-        # Mock embeddings
-        self.MockSentence.return_value.encode.return_value = np.array([0.1, 0.2, 0.3])
-        mock_sparse_vec = MagicMock()
-        mock_sparse_vec.indices = np.array([0, 1])
-        mock_sparse_vec.values = np.array([0.5, 0.8])
-        self.MockFastEmbed.return_value.embed.return_value = [mock_sparse_vec]
+    def test_local_int8_export_gets_its_own_embedding_cache_key(self):
+        """Hub and local INT8 weights, or two exports, never share cached vectors."""
+        self.MockDense.list_supported_models.return_value = []
+        with patch.dict("os.environ", {"DENSE_MODEL_INT8": "true"}):
+            hub_key = VectorDatabase().dense_cache_key
 
-        self.db.search("test query", limit=5, video_id=None)
+        keys = []
+        with tempfile.TemporaryDirectory() as tmp:
+            onnx_file = os.path.join(tmp, vector_store.DENSE_MODEL_INT8_FILE)
+            os.makedirs(os.path.dirname(onnx_file))
+            env = {"DENSE_MODEL_INT8": "true", "DENSE_MODEL_PATH": tmp}
+            for weights in (b"first export", b"second export"):
+                with open(onnx_file, "wb") as f:
+                    f.write(weights)
+                vector_store._dense_cache_model_key.cache_clear()
+                with patch.dict("os.environ", env):
+                    keys.append(VectorDatabase().dense_cache_key)
 
-        self.assertTrue(mock_client.query_points.called)
-        call_kwargs = mock_client.query_points.call_args[1]
-        prefetches = call_kwargs.get("prefetch", [])
+        self.assertEqual(hub_key, vector_store.DENSE_MODEL_INT8_ID)
+        self.assertEqual(len({hub_key, *keys}), 3)
 
-        # Filter should be None
-        self.assertIsNone(prefetches[0].filter)
+    @patch.dict("os.environ", {"EMBED_THREADS": "3"})
+    def test_dense_model_thread_budget(self):
+        """EMBED_THREADS caps the ONNX Runtime threads of the dense encoder."""
+        VectorDatabase()
+        self.assertEqual(self.MockDense.call_args[1]["threads"], 3)
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from services.visual_ingestion import (
+    VisualIngestionService as LegacyVisualIngestionService,
+)
+from src.services.visual_ingestion import VisualIngestionService
+
+
+class TestVisualIngestionThumbnails(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch("src.services.visual_ingestion.OCRService")
+        self.MockOCR = self.patcher.start()
+        self.service = VisualIngestionService()
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.service.frames_base_dir = self.tmp_dir.name
+        self.frame = np.full((720, 1280, 3), 200, dtype=np.uint8)
+        self.frame_dir = os.path.join(self.tmp_dir.name, "video")
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmp_dir.cleanup()
+
+    @patch("src.services.visual_ingestion.iter_distinct_frames")
+    def test_text_frames_get_jpeg_and_downscaled_webp_sidecar(self, mock_iter):
+        mock_iter.return_value = iter([(30, self.frame)])
+        self.MockOCR.return_value.extract_text.return_value = "def main(): pass"
+
+        docs = self.service.process_video("video.mp4", "vid1", interval=5)
+
+        frame_path = os.path.join(self.frame_dir, "frame_00030.jpg")
+        thumb_path = os.path.join(self.frame_dir, "frame_00030.thumb.webp")
+        self.assertEqual(docs[0]["metadata"]["frame_path"], frame_path)
+        self.assertEqual(docs[0]["metadata"]["timestamp"], 30.0)
+        self.assertTrue(os.path.exists(frame_path))
+        self.assertTrue(os.path.exists(thumb_path))
+
+        thumb = cv2.imread(thumb_path)
+        self.assertEqual(thumb.shape[:2], (180, 320))
+        self.assertLess(os.path.getsize(thumb_path), os.path.getsize(frame_path))
+
+    @patch("src.services.visual_ingestion.iter_distinct_frames")
+    def test_frames_without_text_never_touch_disk(self, mock_iter):
+        mock_iter.return_value = iter([(30, self.frame)])
+        self.MockOCR.return_value.extract_text.return_value = "   "
+
+        docs = self.service.process_video("video.mp4", "vid1", interval=5)
+
+        self.assertEqual(docs, [])
+        self.assertEqual(os.listdir(self.frame_dir), [])
+
+
+class TestVisualIngestionDedup(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch("src.services.visual_ingestion.OCRService")
+        self.MockOCR = self.patcher.start()
+        self.service = VisualIngestionService()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.service.frames_base_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmp_dir.cleanup()
+
+    @patch("src.services.visual_ingestion.iter_distinct_frames")
+    def test_repeated_slide_is_ocrd_once_and_spans_its_run(self, mock_iter):
+        slide = np.zeros((90, 160, 3), dtype=np.uint8)
+        other = np.full((90, 160, 3), 255, dtype=np.uint8)
+        # Near-duplicates come back from the decoder without pixels
+        mock_iter.return_value = iter([(0, slide), (5, None), (10, None), (15, other)])
+        ocr = self.MockOCR.return_value
+        ocr.extract_text.side_effect = lambda frame: (
+            "Slide 2" if frame is other else "Slide 1"
+        )
+
+        docs = self.service.process_video("video.mp4", "vid1", interval=5)
+
+        self.assertEqual(ocr.extract_text.call_count, 2)
+        self.assertEqual(
+            [
+                (
+                    d["page_content"],
+                    d["metadata"]["timestamp"],
+                    d["metadata"]["end_timestamp"],
+                )
+                for d in docs
+            ],
+            [("Slide 1", 0.0, 10.0), ("Slide 2", 15.0, 15.0)],
+        )
+
+
+class TestTimestampParsing(unittest.TestCase):
+    def test_frame_filenames(self):
+        # Only the legacy pipeline still reads timestamps back from filenames
+        with patch("services.visual_ingestion.OCRService"):
+            service = LegacyVisualIngestionService()
+        parse = service._parse_timestamp_from_filename
+
+        self.assertEqual(parse("data/frames/video/frame_00030.jpg"), 30.0)
+        self.assertEqual(parse("frame_123456.jpg"), 123456.0)
+        self.assertEqual(parse("temp_frame_45.jpg"), 45.0)
+        self.assertEqual(parse("cover.jpg"), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,27 +1,94 @@
+import os
+import tempfile
 import unittest
-from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import DEFAULT, AsyncMock, MagicMock, Mock, patch
+import numpy as np
+from src.core import rag_engine
+from src.database import vector_store
 from src.core.rag_engine import RAGEngine
 
 
+# Search hits where the answer is ONLY in the visual context. A tuple so no
+# test can append to it; search() hands out a fresh list of the same dicts.
+_VISUAL_ONLY_RESULTS = (
+    {
+        "id": "chunk_1",
+        "text": "In this video we are configuring the retry logic.",
+        "start": 10.0,
+        "end": 15.0,
+        "type": "audio",
+    },
+    {
+        "id": "chunk_2",
+        "text": "const MAX_RETRIES = 5;",
+        "start": 12.0,
+        "end": 12.0,
+        "type": "visual",
+    },
+)
+
+
+def _chat_response(content: str) -> SimpleNamespace:
+    """Plain stand-in for a completion: only choices[0].message.content."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+    )
+
+
+def _stream_chunk(content):
+    """Plain stand-in for a streamed chunk: only choices[0].delta.content."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=content))]
+    )
+
+
 class TestVisualPrompt(unittest.TestCase):
-    def setUp(self):
+    @classmethod
+    def setUpClass(cls):
         # Patch environment variables to avoid real API keys if needed,
         # though RAGEngine loads them in __init__.
         # We will mock the OpenAI client anyway.
-        self.patcher_openai = patch("src.core.rag_engine.OpenAI")
-        self.mock_openai = self.patcher_openai.start()
+        # One patcher on the already-imported module for all three names
+        cls.patcher_engine = patch.multiple(
+            rag_engine,
+            OpenAI=DEFAULT,
+            AsyncOpenAI=DEFAULT,
+            VectorDatabase=DEFAULT,
+        )
+        mocks = cls.patcher_engine.start()
+        cls.mock_openai = mocks["OpenAI"]
+        cls.mock_async_openai = mocks["AsyncOpenAI"]
+        cls.mock_db_class = mocks["VectorDatabase"]
+
+        # No persistent OCR cache file from the engine's OCRService
+        cls.patcher_env = patch.dict("os.environ", {"OCR_CACHE_PATH": ""})
+        cls.patcher_env.start()
 
-        self.patcher_db = patch("src.core.rag_engine.VectorDatabase")
-        self.mock_db_class = self.patcher_db.start()
+    @classmethod
+    def tearDownClass(cls):
+        cls.patcher_engine.stop()
+        cls.patcher_env.stop()
+
+    def setUp(self):
+        # Fresh client/DB mocks for every test, without re-patching the module
+        for mock in (self.mock_openai, self.mock_async_openai, self.mock_db_class):
+            mock.reset_mock(return_value=True, side_effect=True)
+        self.async_create = AsyncMock()
+        self.mock_async_openai.return_value.chat.completions.create = self.async_create
+
+        # Start every test with cold answer caches
+        rag_engine._ANSWER_CACHE.clear()
+        rag_engine._SEMANTIC_CACHE.clear()
 
         # Setup RAGEngine
         self.rag = RAGEngine()
         # self.rag.db is now the return value of the mocked VectorDatabase class
-        # We can configure it if needed, but for now it's a MagicMock
-
-    def tearDown(self):
-        self.patcher_openai.stop()
-        self.patcher_db.stop()
+        # The semantic cache needs a real vector for the question embedding
+        self.rag.db.encode_query.return_value = np.array([0.1, 0.2, 0.3])
 
     def test_visual_context_extraction(self):
         """
@@ -29,32 +96,16 @@ class TestVisualPrompt(unittest.TestCase):
         the system prompt encourages code formatting.
         """
         # 1. Mock Database Search Results
-        # Simulating a scenario where the answer is ONLY in the visual context
-        mock_results = [
-            {
-                "id": "chunk_1",
-                "text": "In this video we are configuring the retry logic.",
-                "start": 10.0,
-                "end": 15.0,
-                "type": "audio",
-            },
-            {
-                "id": "chunk_2",
-                "text": "const MAX_RETRIES = 5;",
-                "start": 12.0,
-                "end": 12.0,
-                "type": "visual",
-            },
-        ]
-        self.rag.db.search.return_value = mock_results
+        # Only the two calls answer_question makes; anything else is an error.
+        # The canned hits are shared module-level data, built once at import.
+        self.rag.db = Mock(spec=["encode_query", "search"])
+        self.rag.db.encode_query.return_value = np.array([0.1, 0.2, 0.3])
+        self.rag.db.search.return_value = list(_VISUAL_ONLY_RESULTS)
 
         # 2. Mock OpenAI Response
         # We mock the response to avoid actual API calls,
         # but we check the call arguments
-        mock_response = MagicMock()
-        mock_response.choices[
-            0
-        ].message.content = "The variable is `MAX_RETRIES` set to 5."
+        mock_response = _chat_response("The variable is `MAX_RETRIES` set to 5.")
         self.rag.client.chat.completions.create.return_value = mock_response
 
         # 3. Method Call
@@ -68,34 +119,339 @@ class TestVisualPrompt(unittest.TestCase):
         _, kwargs = call_args
         messages = kwargs["messages"]
 
-        system_msg = next(m for m in messages if m["role"] == "system")["content"]
-        user_msg = next(m for m in messages if m["role"] == "user")["content"]
+        # The RAG prompt is always [system, user]
+        self.assertEqual([m["role"] for m in messages], ["system", "user"])
+        system_msg = messages[0]["content"]
+        user_msg = messages[-1]["content"]
+
+        checks = (
+            # System prompt upgrades
+            (
+                "Expert Technical Tutor",
+                system_msg,
+                "System prompt should have the new role",
+            ),
+            (
+                "Markdown code blocks",
+                system_msg,
+                "System prompt should enforce Markdown formatting",
+            ),
+            # Context injection formatting (XML-like)
+            (
+                "<context_slice",
+                user_msg,
+                "User prompt should use XML-like context tags",
+            ),
+            (
+                "<source_type>VISUAL</source_type>",
+                user_msg,
+                "Visual sources should be explicitly tagged",
+            ),
+            (
+                "const MAX_RETRIES = 5;",
+                user_msg,
+                "The visual content should be present",
+            ),
+        )
+        for needle, haystack, msg in checks:
+            with self.subTest(needle=needle):
+                self.assertIn(needle, haystack, msg)
+
+    def test_repeat_question_hits_answer_cache(self):
+        """A repeated question over the same context must not call OpenAI twice."""
+        self.rag.db.search.return_value = [
+            {"text": "Retries are configured here.", "start": 5.0, "type": "audio"}
+        ]
+        mock_response = _chat_response("Cached answer")
+        self.rag.client.chat.completions.create.return_value = mock_response
+
+        first, _ = self.rag.answer_question("How are retries set?", "test_vid")
+        second, sources = self.rag.answer_question("How are retries set?", "test_vid")
+
+        self.assertEqual(first, "Cached answer")
+        self.assertEqual(second, "Cached answer")
+        self.assertEqual(len(sources), 1)
+        self.assertEqual(self.rag.client.chat.completions.create.call_count, 1)
 
-        # Check System Prompt Upgrades
-        self.assertIn(
-            "Expert Technical Tutor",
-            system_msg,
-            "System prompt should have the new role",
+    @patch.object(rag_engine, "ANSWER_CACHE_SIZE", 4)
+    def test_answer_cache_survives_concurrent_hits_and_evictions(self):
+        """Hits racing evictions from other threads never raise KeyError."""
+        keys = [("test_vid", "model", str(i)) for i in range(8)]
+
+        def churn(offset):
+            for i in range(2000):
+                key = keys[(i + offset) % len(keys)]
+                if RAGEngine._lookup_answer(key) is None:
+                    RAGEngine._remember_answer(key, "answer")
+
+        with patch("builtins.print"), ThreadPoolExecutor(max_workers=4) as pool:
+            for future in [pool.submit(churn, offset) for offset in range(4)]:
+                future.result()
+
+        self.assertLessEqual(len(rag_engine._ANSWER_CACHE), 4)
+
+    def test_overlapping_questions_share_one_completion(self):
+        """Questions retrieving the same context are answered in a single call."""
+        segment = {"text": "const MAX_RETRIES = 5;", "start": 12.0, "type": "visual"}
+        self.rag.db.search_many.return_value = [[segment], [segment]]
+        mock_response = _chat_response('{"answers": ["A1", "A2"]}')
+        self.async_create.return_value = mock_response
+
+        results = asyncio.run(
+            self.rag.answer_questions(["Variable name?", "Its value?"], "test_vid")
         )
-        self.assertIn(
-            "Markdown code blocks",
-            system_msg,
-            "System prompt should enforce Markdown formatting",
+
+        self.assertEqual([answer for answer, _ in results], ["A1", "A2"])
+        # Both questions retrieved in one batched search round-trip
+        self.rag.db.search_many.assert_called_once()
+        self.assertEqual(
+            self.rag.db.search_many.call_args[0][0], ["Variable name?", "Its value?"]
         )
+        self.rag.db.search.assert_not_called()
+        self.assertEqual(self.async_create.await_count, 1)
+        kwargs = self.async_create.call_args[1]
+        self.assertEqual(kwargs["response_format"]["type"], "json_schema")
 
-        # Check Context Injection Formatting (XML-like)
-        self.assertIn(
-            "<context_slice", user_msg, "User prompt should use XML-like context tags"
+    def test_async_answer_shares_cache_with_sync_path(self):
+        """answer_question_async awaits the async client and fills the same cache."""
+        self.rag.db.search.return_value = [
+            {"text": "Retries are capped at five.", "start": 3.0, "type": "audio"}
+        ]
+        mock_response = _chat_response("Five retries.")
+        self.async_create.return_value = mock_response
+
+        answer, sources = asyncio.run(
+            self.rag.answer_question_async("How many retries?", "test_vid")
         )
-        self.assertIn(
-            "<source_type>VISUAL</source_type>",
-            user_msg,
-            "Visual sources should be explicitly tagged",
+        again, _ = self.rag.answer_question("How many retries?", "test_vid")
+
+        self.assertEqual((answer, again), ("Five retries.", "Five retries."))
+        self.assertEqual(len(sources), 1)
+        self.assertEqual(self.async_create.await_count, 1)
+        self.rag.client.chat.completions.create.assert_not_called()
+
+    def test_stream_yields_deltas_and_sources(self):
+        """Streaming returns sources up front and the answer as text deltas."""
+        self.rag.db.search.return_value = [
+            {"text": "const MAX_RETRIES = 5;", "start": 12.0, "type": "visual"}
+        ]
+        chunks = [_stream_chunk(delta) for delta in ["The ", "answer", None]]
+        self.rag.client.chat.completions.create.return_value = iter(chunks)
+
+        tokens, sources = self.rag.answer_question_stream("Variable?", "test_vid")
+
+        self.assertEqual(len(sources), 1)
+        self.assertEqual(list(tokens), ["The ", "answer"])
+        kwargs = self.rag.client.chat.completions.create.call_args[1]
+        self.assertTrue(kwargs["stream"])
+
+    def test_speculative_stream_keeps_confirmed_answer(self):
+        """Top hits confirmed by the full retrieval keep the speculative call."""
+        self.rag.db.search.return_value = [
+            {"text": "const MAX_RETRIES = 5;", "start": 12.0, "type": "visual"}
+        ]
+        chunk = _stream_chunk("MAX_RETRIES")
+        self.rag.client.chat.completions.create.return_value = iter([chunk])
+
+        tokens, sources = self.rag.answer_question_stream(
+            "Variable?", "test_vid", speculative=True
         )
-        self.assertIn(
-            "const MAX_RETRIES = 5;", user_msg, "The visual content should be present"
+
+        self.assertEqual(list(tokens), ["MAX_RETRIES"])
+        self.assertEqual(len(sources), 1)
+        self.assertEqual(self.rag.db.search.call_count, 2)
+        self.assertEqual(self.rag.client.chat.completions.create.call_count, 1)
+        # Full search added nothing: this is the full-context answer
+        self.assertEqual(
+            self._semantic_hit(np.array([0.1, 0.2, 0.3])), ("MAX_RETRIES", sources)
+        )
+
+    def _search_by_limit(self, head, full):
+        """search() returns `head` for the speculative top-k, `full` otherwise."""
+        self.rag.db.search.side_effect = lambda *args, limit, **kwargs: (
+            head if limit == 3 else full
+        )
+
+    def _semantic_hit(self, question_vector):
+        return rag_engine._SEMANTIC_CACHE.lookup(
+            "test_vid", question_vector, vector_store.index_generation()
         )
 
+    def test_speculative_stream_restarts_when_sources_go_beyond_top_hits(self):
+        """A selected source outside the top-k means the answer must be redone."""
+        first = {"text": "const MAX_RETRIES = 5;", "start": 12.0, "type": "visual"}
+        later = {"text": "Retries are logged.", "start": 40.0, "type": "audio"}
+        self._search_by_limit([first], [first, later])
+        speculative, restarted = MagicMock(), MagicMock()
+        restarted.__iter__.return_value = iter([_stream_chunk("Full answer")])
+        self.rag.client.chat.completions.create.side_effect = [speculative, restarted]
+
+        tokens, sources = self.rag.answer_question_stream(
+            "Variable?", "test_vid", speculative=True
+        )
+
+        self.assertEqual(list(tokens), ["Full answer"])
+        self.assertEqual(len(sources), 2)
+        speculative.close.assert_called_once()
+        full_prompt = self.rag.client.chat.completions.create.call_args[1]
+        self.assertIn("Retries are logged.", full_prompt["messages"][1]["content"])
+
+    def test_speculative_answer_skips_semantic_cache_without_full_context(self):
+        """Kept on top-k context, but the full hits had more: not a full answer."""
+        first = {"text": "const MAX_RETRIES = 5;", "start": 12.0, "type": "visual"}
+        # Same 10s window: never selected as a source, yet part of full context
+        nearby = {"text": "MAX_RETRIES bounds the loop.", "start": 13.0}
+        self._search_by_limit([first], [first, nearby])
+        chunk = _stream_chunk("MAX_RETRIES")
+        self.rag.client.chat.completions.create.return_value = iter([chunk])
+
+        tokens, sources = self.rag.answer_question_stream(
+            "Variable?", "test_vid", speculative=True
+        )
+
+        self.assertEqual(list(tokens), ["MAX_RETRIES"])
+        self.assertEqual(len(sources), 1)
+        self.assertEqual(self.rag.client.chat.completions.create.call_count, 1)
+        self.assertIsNone(self._semantic_hit(np.array([0.1, 0.2, 0.3])))
+
+    def test_clustered_hits_trigger_wider_search(self):
+        """A full page of hits inside one time window re-queries with a wider limit."""
+        self.rag.db.search.return_value = [
+            {"text": f"hit {i}", "start": 1.0 + i * 0.1, "type": "audio"}
+            for i in range(self.rag.search_limit)
+        ]
+        mock_response = _chat_response("answer")
+        self.rag.client.chat.completions.create.return_value = mock_response
+
+        self.rag.answer_question("Where?", "test_vid")
+
+        limits = [c.kwargs["limit"] for c in self.rag.db.search.call_args_list]
+        self.assertEqual(
+            limits, [self.rag.search_limit, rag_engine.FALLBACK_SEARCH_LIMIT]
+        )
+
+    @patch("yt_dlp.YoutubeDL")
+    def test_video_downloads_reuse_per_thread_instances_in_parallel(self, mock_ytdl):
+        """A thread reuses its YoutubeDL; other threads don't wait on it."""
+        both_downloading = threading.Barrier(2, timeout=5)
+
+        def extract_info(url, download):
+            both_downloading.wait()  # Breaks if the second one is held back
+            return {"id": url}
+
+        mock_ytdl.return_value.extract_info.side_effect = extract_info
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            for _ in range(2):
+                list(pool.map(self.rag._download_video_best, ["a", "b"]))
+
+        # Two threads, two rounds: one instance per thread, four downloads
+        self.assertEqual(mock_ytdl.call_count, 2)
+        self.assertEqual(mock_ytdl.return_value.extract_info.call_count, 4)
+
+    @patch.object(rag_engine.cv2, "imwrite")
+    def test_ocr_frame_saves_only_frames_with_text(self, mock_imwrite):
+        """Frames are OCR'd in memory; a JPEG is written only when text is found."""
+        frame = np.zeros((16, 16, 3), dtype=np.uint8)
+        self.rag.ocr_service = MagicMock()
+
+        self.rag.ocr_service.extract_text_from_array.return_value = ""
+        self.assertIsNone(self.rag._ocr_frame(frame, 15.0))
+        mock_imwrite.assert_not_called()
+
+        self.rag.ocr_service.extract_text_from_array.return_value = "SELECT *"
+        chunk = self.rag._ocr_frame(frame, 30.0)
+        self.assertEqual(chunk["page_content"], "SELECT *")
+        self.assertEqual(chunk["metadata"]["timestamp"], 30.0)
+        mock_imwrite.assert_called_once_with(
+            chunk["metadata"]["frame_path"],
+            frame,
+            [rag_engine.cv2.IMWRITE_JPEG_QUALITY, rag_engine.FRAME_JPEG_QUALITY],
+        )
+
+    def test_iter_unique_frames_samples_and_deduplicates(self):
+        """Only every step-th frame is retrieved, and repeats are dropped."""
+        blank = np.zeros((32, 32, 3), dtype=np.uint8)
+        stripes = blank.copy()
+        stripes[:, ::4] = 255
+
+        cap = MagicMock()
+        cap.grab.side_effect = [True] * 6 + [False]
+        cap.retrieve.side_effect = [(True, blank), (True, blank), (True, stripes)]
+
+        frames = list(RAGEngine._iter_unique_frames(cap, fps=1.0, step_frames=2))
+
+        self.assertEqual(cap.retrieve.call_count, 3)
+        self.assertEqual([ts for _, ts in frames], [0.0, 4.0])
+
+    def test_ingest_transcribes_before_video_download_finishes(self):
+        """Audio processing must not wait behind the video download."""
+        self.rag.executor = ThreadPoolExecutor(max_workers=4)
+        transcribing = threading.Event()
+
+        def slow_video_download(url):
+            # Only returns once transcription has started (or gives up)
+            transcribing.wait(timeout=5)
+            return None
+
+        def transcribe(path):
+            transcribing.set()
+            return [{"start": 0.0, "end": 1.0, "text": "hello"}]
+
+        self.rag.transcriber = MagicMock()
+        self.rag.transcriber.download_audio.return_value = ("a.mp3", "Title")
+        self.rag.transcriber.transcribe_cached.side_effect = transcribe
+        self.rag.chunker.create_chunks = MagicMock(return_value=[{"text": "hello"}])
+        self.rag._download_video_best = MagicMock(side_effect=slow_video_download)
+
+        result = asyncio.run(
+            self.rag.ingest_video("https://www.youtube.com/watch?v=abc")
+        )
+
+        self.assertTrue(transcribing.is_set())
+        self.assertEqual(result, (None, "a.mp3", "Title"))
+        self.rag.db.upsert_chunks.assert_called_once_with([{"text": "hello"}], "abc")
+
+    def test_reingest_reuses_cached_transcript(self):
+        """Processing the same audio twice runs Whisper only once."""
+        segment = SimpleNamespace(start=0.0, end=1.0, text="hola")
+        self.rag.transcriber.model = MagicMock()
+        self.rag.transcriber.model.transcribe.return_value = ([segment], None)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            audio_path = os.path.join(tmp, "abc.mp3")
+            with open(audio_path, "wb") as f:
+                f.write(b"fake mp3 bytes")
+            self.rag.transcriber.transcript_cache_dir = tmp
+
+            first = self.rag._process_audio_task(audio_path)
+            second = self.rag._process_audio_task(audio_path)
+
+        self.assertEqual(second, first)
+        self.assertEqual(self.rag.transcriber.model.transcribe.call_count, 1)
+
+    def test_extract_video_id_url_formats(self):
+        """Watch, short-link, shorts and embed URLs all map to the same id."""
+        for url in (
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42s",
+            "https://youtu.be/dQw4w9WgXcQ?si=abc",
+            "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+            "https://www.youtube.com/embed/dQw4w9WgXcQ",
+        ):
+            self.assertEqual(RAGEngine._extract_video_id(url), "dQw4w9WgXcQ")
+
+    @patch.object(rag_engine.cv2, "VideoCapture")
+    def test_open_video_falls_back_to_software_decode(self, mock_capture):
+        """If the hwaccel open fails, the plain constructor is used."""
+        hw_cap, sw_cap = MagicMock(), MagicMock()
+        hw_cap.isOpened.return_value = False
+        mock_capture.side_effect = [hw_cap, sw_cap]
+
+        cap = RAGEngine._open_video("clip.mp4")
+
+        self.assertIs(cap, sw_cap)
+        hw_cap.release.assert_called_once()
+        self.assertEqual(mock_capture.call_args_list[-1][0], ("clip.mp4",))
+
 
 if __name__ == "__main__":
     unittest.main()